@@ -11,8 +11,8 @@ st.set_page_config(
 # Import after page config
 from utils.container_database import ContainerDatabase
 from utils.calculations import StructuralCalculations
-from utils.database import DatabaseManager
-from utils.simple_storage import SimpleStorageManager
+from utils.database import get_database_manager
+from utils.simple_storage import get_local_storage
 from utils.translations import t, init_language, get_current_language, set_language
 from utils.groq_service import GroqService
 
@@ -21,10 +21,10 @@ from utils.groq_service import GroqService
 def get_storage_service():
     """Initialize storage service only when needed"""
     try:
-        db = DatabaseManager()
-        return db if db.engine else SimpleStorageManager()
+        db = get_database_manager()
+        return db if db.engine else get_local_storage()
     except Exception:
-        return SimpleStorageManager()
+        return get_local_storage()
 
 @st.cache_resource
 def get_container_db():
@@ -40,8 +40,8 @@ def get_calculations_service():
 def get_historical_service():
     """Initialize historical service only when needed"""
     try:
-        from utils.historical_data_service import HistoricalDataService
-        return HistoricalDataService()
+        from utils.historical_data_service import get_historical_data_service
+        return get_historical_data_service()
     except Exception:
         return None
 
@@ -70,6 +70,13 @@ def init_session_state():
 try:
     init_session_state()
     
+    # Start loading historical projects in the background so the first pricing page finds them cached
+    try:
+        from utils.historical_cache import get_historical_frame_cache
+        get_historical_frame_cache()
+    except Exception:
+        pass
+    
     # Load animations and micro-interactions
     from utils.animations import add_hover_animations, add_page_transition
     add_hover_animations()
@@ -0,0 +1,281 @@
+"""
+Query Plan Benchmark for KAN-BUD Container Calculator
+Seeds a local Postgres and records EXPLAIN ANALYZE timings before and after the index migrations
+
+Usage:
+    BENCHMARK_DATABASE_URL=postgresql://localhost/kanbud_bench \
+        python benchmarks/query_plans.py --seed --output bench_query_plans.json
+
+The target database is wiped and re-seeded when --seed is given, so never
+point this at a shared or production database. DATABASE_URL is deliberately
+not used.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from datetime import date, timedelta
+from typing import Dict, List, Any
+
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The schema as it was before migrations; every index revision is applied on top of it
+BASELINE_REVISION = '0001'
+
+CONTAINER_TYPES = ['20ft Standard', '40ft Standard', '40ft High Cube', '20ft Refrigerated', '45ft High Cube']
+USE_CASES = ['Office Space', 'Workshop', 'Residential', 'Storage', 'Retail', 'Medical', 'Laboratory', 'Classroom']
+LOCATIONS = ['Kąkolewo', 'Poznań', 'Warszawa', 'Kraków', 'Gdańsk', 'Wrocław', 'Berlin', 'Praha']
+REGIONS = ['PL-West', 'PL-Central', 'PL-South', 'PL-North', 'DE-East', 'CZ']
+SKILL_LEVELS = ['basic_worker', 'skilled_worker', 'specialist']
+MARKET_DATA_TYPES = ['steel_price', 'container_price', 'insulation_price', 'fuel_price', 'labor_index',
+                     'shipping_index', 'timber_price', 'electrical_price', 'plumbing_price', 'hvac_price']
+
+SEED_DAYS = 8 * 365
+
+
+def _sql_array(values: List[str]) -> str:
+    return "ARRAY[" + ", ".join("'" + value.replace("'", "''") + "'" for value in values) + "]"
+
+
+def _pick(values: List[str], seed_expression: str = "random()") -> str:
+    return f"({_sql_array(values)})[1 + floor({seed_expression} * {len(values)})::int]"
+
+
+SEED_SQL = {
+    'historical_projects': f"""
+        INSERT INTO historical_projects (
+            project_date, container_type, use_case, location, actual_cost, estimated_cost,
+            materials_cost, labor_cost, delivery_cost, project_duration_days, customer_satisfaction
+        )
+        SELECT
+            DATE '2018-01-01' + floor(random() * {SEED_DAYS})::int,
+            {_pick(CONTAINER_TYPES)},
+            {_pick(USE_CASES)},
+            {_pick(LOCATIONS)},
+            cost,
+            cost * (0.85 + random() * 0.3),
+            cost * 0.6,
+            cost * 0.28,
+            cost * 0.07,
+            20 + floor(random() * 70)::int,
+            3 + floor(random() * 3)::int
+        FROM (SELECT 15000 + random() * 60000 AS cost FROM generate_series(1, :rows)) seeded
+    """,
+    'material_prices': f"""
+        INSERT INTO material_prices (material_name, price_per_unit, unit, supplier, price_date, region)
+        SELECT
+            'material_' || (g % 300),
+            1 + random() * 200,
+            (ARRAY['kg', 'm2', 'm', 'pcs'])[1 + g % 4],
+            'Supplier ' || (g % 12),
+            DATE '2018-01-01' + floor(random() * {SEED_DAYS})::int,
+            {_pick(REGIONS)}
+        FROM generate_series(1, :rows) g
+    """,
+    'market_data': f"""
+        INSERT INTO market_data (data_type, value, unit, region, data_date, source)
+        SELECT
+            {_pick(MARKET_DATA_TYPES)},
+            50 + random() * 100,
+            'index',
+            {_pick(REGIONS)},
+            DATE '2018-01-01' + floor(random() * {SEED_DAYS})::int,
+            'benchmark'
+        FROM generate_series(1, :rows)
+    """,
+    'labor_rates': f"""
+        INSERT INTO labor_rates (skill_level, hourly_rate, region, effective_date)
+        SELECT
+            {_pick(SKILL_LEVELS)},
+            10 + random() * 20,
+            {_pick(REGIONS)},
+            DATE '2018-01-01' + floor(random() * {SEED_DAYS})::int
+        FROM generate_series(1, :rows)
+    """
+}
+
+# The access paths used by DatabaseManager and the historical services
+BENCHMARK_QUERIES = {
+    'historical_estimate_scan': ("""
+        SELECT actual_cost, estimated_cost, materials_cost, labor_cost
+        FROM historical_projects
+        WHERE container_type = :container_type
+        AND use_case = :use_case
+        AND project_date >= :cutoff_date
+    """, lambda: {
+        'container_type': '40ft High Cube',
+        'use_case': 'Office Space',
+        'cutoff_date': date.today() - timedelta(days=24 * 30)
+    }),
+    'historical_rollup_group': ("""
+        SELECT COUNT(*), SUM(actual_cost), MIN(actual_cost), MAX(actual_cost),
+               SUM(materials_cost), SUM(labor_cost), SUM(project_duration_days)
+        FROM historical_projects
+        WHERE container_type = :container_type
+        AND use_case = :use_case
+        AND project_date >= :month
+        AND project_date < CAST(:month AS DATE) + INTERVAL '1 month'
+    """, lambda: {
+        'container_type': '20ft Standard',
+        'use_case': 'Workshop',
+        'month': date(2023, 6, 1)
+    }),
+    'current_material_prices': ("""
+        SELECT DISTINCT ON (material_name)
+            material_name, price_per_unit, unit
+        FROM material_prices
+        ORDER BY material_name, price_date DESC
+    """, lambda: {}),
+    'market_trends': ("""
+        SELECT value, data_date, region, unit
+        FROM market_data
+        WHERE data_type = :data_type
+        AND data_date >= :cutoff_date
+        ORDER BY data_date DESC
+    """, lambda: {
+        'data_type': 'steel_price',
+        'cutoff_date': date.today() - timedelta(days=12 * 30)
+    }),
+    'labor_rate_lookup': ("""
+        SELECT hourly_rate
+        FROM labor_rates
+        WHERE skill_level = :skill_level
+        AND region = :region
+        AND effective_date <= :as_of
+        ORDER BY effective_date DESC
+        LIMIT 1
+    """, lambda: {
+        'skill_level': 'skilled_worker',
+        'region': 'PL-West',
+        'as_of': date.today()
+    })
+}
+
+
+def alembic_config(database_url: str):
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'migrations'))
+    config.set_main_option('sqlalchemy.url', database_url.replace('%', '%%'))
+    return config
+
+
+def migrate(database_url: str, revision: str):
+    """Move the schema to an exact revision, up or down"""
+    from alembic import command
+
+    config = alembic_config(database_url)
+    command.upgrade(config, revision)
+    if revision != 'head':
+        command.downgrade(config, revision)
+
+
+def seed(engine, volumes: Dict[str, int]):
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE " + ", ".join(SEED_SQL) + " RESTART IDENTITY CASCADE"))
+        for table, statement in SEED_SQL.items():
+            print(f"Seeding {volumes[table]:,} rows into {table}...", file=sys.stderr)
+            conn.execute(text(statement), {'rows': volumes[table]})
+
+
+def vacuum_analyze(engine):
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for table in SEED_SQL:
+            conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+
+def explain(engine, runs: int) -> Dict[str, Any]:
+    """Median EXPLAIN ANALYZE timings and the chosen plan for each benchmark query"""
+    results = {}
+    with engine.connect() as conn:
+        for name, (query, params) in BENCHMARK_QUERIES.items():
+            timings = []
+            plan = None
+            for _ in range(runs):
+                rows = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query), params()).scalar()
+                plan = rows[0] if isinstance(rows, list) else json.loads(rows)[0]
+                timings.append(plan['Execution Time'])
+
+            results[name] = {
+                'execution_ms': statistics.median(timings),
+                'planning_ms': plan['Planning Time'],
+                'root_node': plan['Plan']['Node Type'],
+                'plan_nodes': _node_types(plan['Plan']),
+                'shared_buffers_hit': plan['Plan'].get('Shared Hit Blocks', 0),
+                'shared_buffers_read': plan['Plan'].get('Shared Read Blocks', 0)
+            }
+    return results
+
+
+def _node_types(node: Dict[str, Any]) -> List[str]:
+    label = node['Node Type']
+    if 'Index Name' in node:
+        label += f" using {node['Index Name']}"
+    labels = [label]
+    for child in node.get('Plans', []):
+        labels.extend(_node_types(child))
+    return labels
+
+
+def print_comparison(before: Dict[str, Any], after: Dict[str, Any]):
+    print(f"{'query':<28} {'before ms':>12} {'after ms':>12} {'speedup':>9}  plan after")
+    for name in BENCHMARK_QUERIES:
+        before_ms = before[name]['execution_ms']
+        after_ms = after[name]['execution_ms']
+        speedup = before_ms / after_ms if after_ms else float('inf')
+        print(f"{name:<28} {before_ms:>12.2f} {after_ms:>12.2f} {speedup:>8.1f}x  "
+              f"{' > '.join(after[name]['plan_nodes'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--database-url', default=os.environ.get('BENCHMARK_DATABASE_URL'),
+                        help="Local Postgres to benchmark (default: BENCHMARK_DATABASE_URL)")
+    parser.add_argument('--seed', action='store_true', help="Wipe and re-seed the benchmark tables")
+    parser.add_argument('--historical-rows', type=int, default=500000)
+    parser.add_argument('--material-price-rows', type=int, default=300000)
+    parser.add_argument('--market-rows', type=int, default=200000)
+    parser.add_argument('--labor-rate-rows', type=int, default=50000)
+    parser.add_argument('--runs', type=int, default=5, help="EXPLAIN ANALYZE runs per query (median is kept)")
+    parser.add_argument('--output', help="Write before/after results as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("Set --database-url or BENCHMARK_DATABASE_URL to a local benchmark database")
+
+    database_url = args.database_url
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    engine = create_engine(database_url)
+
+    migrate(database_url, BASELINE_REVISION)
+
+    if args.seed:
+        seed(engine, {
+            'historical_projects': args.historical_rows,
+            'material_prices': args.material_price_rows,
+            'market_data': args.market_rows,
+            'labor_rates': args.labor_rate_rows
+        })
+
+    vacuum_analyze(engine)
+    before = explain(engine, args.runs)
+
+    migrate(database_url, 'head')
+    vacuum_analyze(engine)
+    after = explain(engine, args.runs)
+
+    print_comparison(before, after)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'before': before, 'after': after}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
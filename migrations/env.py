@@ -0,0 +1,67 @@
+"""
+Alembic Environment for KAN-BUD Container Calculator
+Runs schema migrations against the database in DATABASE_URL
+"""
+
+import os
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+config = context.config
+
+# Leave the host application's logging alone when migrations run in-process
+if config.config_file_name is not None and 'connection' not in config.attributes:
+    fileConfig(config.config_file_name)
+
+# Migrations are written as plain SQL, there is no ORM metadata to compare against
+target_metadata = None
+
+
+def get_database_url() -> str:
+    """Database URL from the Alembic config or DATABASE_URL"""
+    database_url = config.get_main_option('sqlalchemy.url') or os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise RuntimeError("DATABASE_URL is not set")
+
+    # Fix common URL issues
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    return database_url
+
+
+def run_migrations_offline():
+    """Emit the migration SQL without connecting"""
+    context.configure(
+        url=get_database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run migrations on a live connection"""
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        # Called programmatically with an existing connection
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(get_database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
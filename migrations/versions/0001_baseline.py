@@ -0,0 +1,126 @@
+"""Baseline KAN-BUD schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Captures the schema DatabaseManager.initialize_tables created before
+migrations existed, so the index benchmark can compare against it. Every
+statement is idempotent so existing deployments can be stamped or
+upgraded in place.
+"""
+
+from alembic import op
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BASELINE_SQL = """
+-- Historical project data table
+CREATE TABLE IF NOT EXISTS historical_projects (
+    id SERIAL PRIMARY KEY,
+    project_date DATE NOT NULL,
+    container_type VARCHAR(50) NOT NULL,
+    use_case VARCHAR(100) NOT NULL,
+    location VARCHAR(100),
+    actual_cost DECIMAL(12,2) NOT NULL,
+    estimated_cost DECIMAL(12,2),
+    materials_cost DECIMAL(12,2),
+    labor_cost DECIMAL(12,2),
+    delivery_cost DECIMAL(12,2),
+    modifications JSONB,
+    project_duration_days INTEGER,
+    customer_satisfaction INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Material pricing history
+CREATE TABLE IF NOT EXISTS material_prices (
+    id SERIAL PRIMARY KEY,
+    material_name VARCHAR(100) NOT NULL,
+    price_per_unit DECIMAL(10,4) NOT NULL,
+    unit VARCHAR(20) NOT NULL,
+    supplier VARCHAR(100),
+    price_date DATE NOT NULL,
+    region VARCHAR(50),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Labor rates by region and skill
+CREATE TABLE IF NOT EXISTS labor_rates (
+    id SERIAL PRIMARY KEY,
+    skill_level VARCHAR(50) NOT NULL,
+    hourly_rate DECIMAL(8,2) NOT NULL,
+    region VARCHAR(50) NOT NULL,
+    effective_date DATE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- User projects and configurations
+CREATE TABLE IF NOT EXISTS user_projects (
+    id SERIAL PRIMARY KEY,
+    user_id VARCHAR(100),
+    project_name VARCHAR(200) NOT NULL,
+    container_config JSONB NOT NULL,
+    cost_estimate JSONB,
+    technical_analysis JSONB,
+    quote_data JSONB,
+    status VARCHAR(50) DEFAULT 'draft',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Customer data
+CREATE TABLE IF NOT EXISTS customers (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    company VARCHAR(200),
+    email VARCHAR(150),
+    phone VARCHAR(50),
+    address TEXT,
+    preferred_language VARCHAR(10) DEFAULT 'en',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Quotes and proposals
+CREATE TABLE IF NOT EXISTS quotes (
+    id SERIAL PRIMARY KEY,
+    quote_number VARCHAR(50) UNIQUE NOT NULL,
+    customer_id INTEGER REFERENCES customers(id),
+    project_id INTEGER REFERENCES user_projects(id),
+    total_amount DECIMAL(12,2) NOT NULL,
+    status VARCHAR(50) DEFAULT 'pending',
+    valid_until DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Market data and trends
+CREATE TABLE IF NOT EXISTS market_data (
+    id SERIAL PRIMARY KEY,
+    data_type VARCHAR(50) NOT NULL,
+    value DECIMAL(12,4) NOT NULL,
+    unit VARCHAR(20),
+    region VARCHAR(50),
+    data_date DATE NOT NULL,
+    source VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_historical_projects_date ON historical_projects(project_date);
+CREATE INDEX IF NOT EXISTS idx_material_prices_date ON material_prices(price_date);
+CREATE INDEX IF NOT EXISTS idx_user_projects_user ON user_projects(user_id);
+CREATE INDEX IF NOT EXISTS idx_quotes_customer ON quotes(customer_id);
+"""
+
+
+def upgrade():
+    op.execute(BASELINE_SQL)
+
+
+def downgrade():
+    for table in ('market_data', 'quotes', 'customers', 'user_projects', 'labor_rates',
+                  'material_prices', 'historical_projects'):
+        op.execute(f"DROP TABLE IF EXISTS {table}")
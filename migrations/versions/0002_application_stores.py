@@ -0,0 +1,78 @@
+"""Pricing settings, quoting and historical rollup stores
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Tables added by the versioned pricing settings, quote numbering, quote
+templates and historical rollups. Indexes on the original tables come in
+the next revision.
+"""
+
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+STORES_SQL = """
+-- Pre-aggregated historical pricing, maintained on every import
+CREATE TABLE IF NOT EXISTS historical_rollups (
+    container_type VARCHAR(50) NOT NULL,
+    use_case VARCHAR(100) NOT NULL,
+    month DATE NOT NULL,
+    location VARCHAR(100) NOT NULL DEFAULT '',
+    project_count INTEGER NOT NULL,
+    sum_actual DECIMAL(16,2) NOT NULL,
+    min_actual DECIMAL(12,2),
+    max_actual DECIMAL(12,2),
+    sum_materials DECIMAL(16,2),
+    count_materials INTEGER,
+    sum_labor DECIMAL(16,2),
+    count_labor INTEGER,
+    sum_duration BIGINT,
+    count_duration INTEGER,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (container_type, use_case, month, location)
+);
+CREATE INDEX IF NOT EXISTS idx_historical_rollups_month ON historical_rollups(month);
+
+-- Versioned Admin Panel pricing settings
+CREATE TABLE IF NOT EXISTS pricing_settings (
+    version SERIAL PRIMARY KEY,
+    settings JSONB NOT NULL,
+    saved_by VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Per-month quote number counters
+CREATE TABLE IF NOT EXISTS quote_number_counters (
+    period CHAR(6) PRIMARY KEY,
+    last_value BIGINT NOT NULL
+);
+
+-- Saved quote templates
+CREATE TABLE IF NOT EXISTS quote_templates (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(200) UNIQUE NOT NULL,
+    customer_name VARCHAR(200),
+    container_type VARCHAR(100),
+    quote_data JSONB NOT NULL,
+    cost_breakdown JSONB,
+    rates_hash CHAR(64),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_quote_templates_customer ON quote_templates(customer_name);
+CREATE INDEX IF NOT EXISTS idx_quote_templates_container ON quote_templates(container_type);
+"""
+
+
+def upgrade():
+    op.execute(STORES_SQL)
+
+
+def downgrade():
+    for table in ('quote_templates', 'quote_number_counters', 'pricing_settings', 'historical_rollups'):
+        op.execute(f"DROP TABLE IF EXISTS {table}")
@@ -0,0 +1,70 @@
+"""Composite and covering indexes for the hot query paths
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+- historical_projects filtered by (container_type, use_case, project_date),
+  covering the cost columns read by estimates and the rollup recompute
+- historical_projects matched on the natural key by the bulk import upsert
+- material_prices read with DISTINCT ON (material_name) ORDER BY price_date DESC
+- market_data filtered by (data_type, data_date)
+- labor_rates looked up by skill and region, latest effective date first
+- user_projects listed per user, newest first
+
+Indexes are built CONCURRENTLY so upgrading a live database does not block writes.
+"""
+
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# name -> (table, definition)
+INDEXES = {
+    'idx_historical_projects_type_use_date': (
+        'historical_projects',
+        "(container_type, use_case, project_date) "
+        "INCLUDE (actual_cost, estimated_cost, materials_cost, labor_cost, project_duration_days)"
+    ),
+    'idx_historical_projects_natural_key': (
+        'historical_projects',
+        "(project_date, container_type, use_case, location)"
+    ),
+    'idx_material_prices_name_date': (
+        'material_prices',
+        "(material_name, price_date DESC) INCLUDE (price_per_unit, unit)"
+    ),
+    'idx_market_data_type_date': (
+        'market_data',
+        "(data_type, data_date DESC) INCLUDE (value, region, unit)"
+    ),
+    'idx_labor_rates_skill_region_date': (
+        'labor_rates',
+        "(skill_level, region, effective_date DESC) INCLUDE (hourly_rate)"
+    ),
+    'idx_user_projects_user_created': (
+        'user_projects',
+        "(user_id, created_at DESC)"
+    )
+}
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        # Databases set up by initialize_tables before migrations existed may have
+        # a plain version of this index; rebuild it as covering
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_historical_projects_type_use_date")
+        for name, (table, definition) in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+    for table in sorted({table for table, _ in INDEXES.values()}):
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
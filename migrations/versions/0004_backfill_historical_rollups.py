@@ -0,0 +1,50 @@
+"""Backfill historical rollups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Fills historical_rollups from historical_projects once per deployment.
+Imports keep the rollups current from then on.
+"""
+
+from alembic import op
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BACKFILL_SQL = """
+INSERT INTO historical_rollups (
+    container_type, use_case, month, location, project_count,
+    sum_actual, min_actual, max_actual, sum_materials, count_materials,
+    sum_labor, count_labor, sum_duration, count_duration
+)
+SELECT
+    h.container_type,
+    h.use_case,
+    CAST(date_trunc('month', h.project_date) AS DATE) AS month,
+    COALESCE(h.location, '') AS location,
+    COUNT(*) AS project_count,
+    SUM(h.actual_cost) AS sum_actual,
+    MIN(h.actual_cost) AS min_actual,
+    MAX(h.actual_cost) AS max_actual,
+    SUM(h.materials_cost) AS sum_materials,
+    COUNT(h.materials_cost) AS count_materials,
+    SUM(h.labor_cost) AS sum_labor,
+    COUNT(h.labor_cost) AS count_labor,
+    SUM(h.project_duration_days) AS sum_duration,
+    COUNT(h.project_duration_days) AS count_duration
+FROM historical_projects h
+GROUP BY 1, 2, 3, 4
+ON CONFLICT DO NOTHING
+"""
+
+
+def upgrade():
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade():
+    op.execute("DELETE FROM historical_rollups")
@@ -0,0 +1,32 @@
+"""Track when historical projects change
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Adds historical_projects.updated_at so the shared historical cache can
+pick up rows changed in place by re-imports, not only new rows. Existing
+rows take their created_at.
+"""
+
+from alembic import op
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE historical_projects ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP")
+    op.execute("UPDATE historical_projects SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) "
+               "WHERE updated_at IS NULL")
+    op.execute("ALTER TABLE historical_projects ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP")
+    op.execute("ALTER TABLE historical_projects ALTER COLUMN updated_at SET NOT NULL")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_historical_projects_updated "
+               "ON historical_projects(updated_at, id)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_historical_projects_updated")
+    op.execute("ALTER TABLE historical_projects DROP COLUMN IF EXISTS updated_at")
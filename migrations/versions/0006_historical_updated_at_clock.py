@@ -0,0 +1,42 @@
+"""Stamp historical project changes with the wall clock
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+CURRENT_TIMESTAMP is the start time of the writing transaction, so a long
+import could commit rows stamped earlier than rows the historical cache had
+already seen. updated_at now defaults to clock_timestamp(), and a trigger
+stamps every UPDATE, including ones that do not set updated_at themselves.
+"""
+
+from alembic import op
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE historical_projects ALTER COLUMN updated_at SET DEFAULT clock_timestamp()")
+    op.execute("""
+    CREATE OR REPLACE FUNCTION historical_projects_touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS historical_projects_touch_updated_at ON historical_projects")
+    op.execute("""
+    CREATE TRIGGER historical_projects_touch_updated_at
+        BEFORE UPDATE ON historical_projects
+        FOR EACH ROW EXECUTE FUNCTION historical_projects_touch_updated_at()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS historical_projects_touch_updated_at ON historical_projects")
+    op.execute("DROP FUNCTION IF EXISTS historical_projects_touch_updated_at()")
+    op.execute("ALTER TABLE historical_projects ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP")
@@ -0,0 +1,43 @@
+"""Source project ids for historical projects
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Two real projects can share date, type, use case and location, so imports
+may now carry source_id, the project or quote number from the system the
+data comes from. Keyed rows are upserted on the unique source_id index. Rows
+without one still match on the natural key, now through an expression index
+with COALESCE(location, '') so the import joins on plain equality.
+"""
+
+from alembic import op
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE historical_projects ADD COLUMN IF NOT EXISTS source_id VARCHAR(100)")
+
+    with op.get_context().autocommit_block():
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_historical_projects_source_id "
+                   "ON historical_projects(source_id)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_historical_projects_natural_key")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_historical_projects_natural_key "
+                   "ON historical_projects(project_date, container_type, use_case, (COALESCE(location, ''))) "
+                   "WHERE source_id IS NULL")
+
+    op.execute("ANALYZE historical_projects")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_historical_projects_natural_key")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_historical_projects_natural_key "
+                   "ON historical_projects(project_date, container_type, use_case, location)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_historical_projects_source_id")
+
+    op.execute("ALTER TABLE historical_projects DROP COLUMN IF EXISTS source_id")
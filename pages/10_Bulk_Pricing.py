@@ -10,6 +10,8 @@ import pandas as pd
 from utils.translations import t, init_language
 from utils.shared_header import render_shared_header
 from utils.calculations import calculate_container_cost
+from utils.pricing_settings import get_pricing_settings_store, get_price_cache
+from utils.cost_correction import get_cost_correction_model
 
 init_language()
 
@@ -181,10 +183,18 @@ if st.session_state.bulk_containers:
     # Calculate total costs
     total_base_cost = 0
     individual_costs = []
+    calculated_costs = {}
+
+    # Pin one settings snapshot so the whole batch is priced consistently
+    pricing = get_pricing_settings_store().current()
+    price_cache = get_price_cache()
 
     for i, container in enumerate(st.session_state.bulk_containers):
         try:
-            cost_result = calculate_container_cost(container)
+            cost_result = price_cache.get_or_compute(
+                pricing, container,
+                lambda: calculate_container_cost(container, pricing=pricing)
+            )
             
             # Handle dictionary return type from calculate_container_cost
             if isinstance(cost_result, dict):
@@ -201,6 +211,7 @@ if st.session_state.bulk_containers:
                 "Cost (€)": f"{cost:,.0f}"
             })
             total_base_cost += cost
+            calculated_costs[i] = cost
             
         except Exception as e:
             # Fallback calculation
@@ -213,6 +224,18 @@ if st.session_state.bulk_containers:
             })
             total_base_cost += estimated_costtimated_cost
 
+    # Employees see what past projects suggest these containers will really cost,
+    # corrected for the whole batch in one pass
+    correction_model = get_cost_correction_model()
+    if correction_model and calculated_costs and st.session_state.employee_logged_in:
+        rows = list(calculated_costs)
+        corrected = correction_model.correct_configs(
+            [st.session_state.bulk_containers[i] for i in rows],
+            [calculated_costs[i] for i in rows]
+        )
+        for i, corrected_cost in zip(rows, corrected):
+            individual_costs[i]["History-adjusted (€)"] = f"{corrected_cost:,.0f}"
+
     # Apply discounts
     volume_discount_amount = total_base_cost * volume_discount_rate
     logistics_savings_amount = total_base_cost * logistics_savings_rate
@@ -269,6 +292,9 @@ if st.session_state.bulk_containers:
     # Individual containers
     with st.expander("Individual Container Details"):
         st.dataframe(pd.DataFrame(individual_costs), use_container_width=True)
+        if correction_model and st.session_state.employee_logged_in:
+            st.caption(f"History-adjusted costs use the cost correction model trained on "
+                       f"{correction_model.n_samples} projects ({correction_model.trained_at})")
 
     # Bulk benefits
     st.markdown("### Bulk Order Benefits")
@@ -8,6 +8,7 @@ st.set_page_config(
 
 from utils.container_database import ContainerDatabase
 from utils.calculations import calculate_container_cost
+from utils.pricing_settings import get_pricing_settings_store
 from utils.translations import t, init_language
 from utils.shared_header import render_shared_header
 
@@ -659,7 +660,7 @@ with st.form("container_configuration_form"):
 
         # Calculate comprehensive pricing using the proper calculation function
         try:
-            cost_result = calculate_container_cost(config)
+            cost_result = calculate_container_cost(config, pricing=get_pricing_settings_store().current())
             
             if isinstance(cost_result, dict):
                 base_price = cost_result.get('base_cost', 15000)
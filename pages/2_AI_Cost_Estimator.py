@@ -39,11 +39,12 @@ def generate_cost_estimate(config, ai_model):
     except Exception as e:
         # Fallback to configurator pricing when AI fails
         from utils.calculations import StructuralCalculations
+        from utils.pricing_settings import get_pricing_settings_store
         calc = StructuralCalculations()
 
         try:
             # Use the base cost calculation method that exists
-            cost_breakdown = calc.calculate_base_costs(config)
+            cost_breakdown = calc.calculate_base_costs(config, pricing=get_pricing_settings_store().current())
             total_cost = cost_breakdown.get('subtotal', 0)
 
             return f"""
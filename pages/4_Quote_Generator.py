@@ -3,6 +3,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 import json
 from utils.quote_generator import QuoteGenerator
+from utils.pricing_settings import get_pricing_settings_store
 from utils.calculations import StructuralCalculations
 from utils.translations import t
 from utils.shared_header import render_shared_header
@@ -132,6 +133,27 @@ special_terms = st.text_area(
     height=100
 )
 
+quote_params = {
+    "type": quote_type,
+    "validity_period": validity_period,
+    "payment_terms": payment_terms,
+    "profit_margin": profit_margin / 100,
+    "contingency": contingency / 100,
+    "discount": discount_offered / 100
+}
+
+services = {
+    "delivery": include_delivery,
+    "delivery_distance": delivery_distance,
+    "installation": include_installation,
+    "permits": include_permits,
+    "site_prep": include_site_prep,
+    "utilities": include_utilities,
+    "maintenance": include_maintenance,
+    "warranty": include_warranty,
+    "warranty_period": warranty_period if include_warranty else None
+}
+
 # Generate quote button
 if st.button("📄 Generate Professional Quote", type="primary", use_container_width=True):
 
@@ -155,25 +177,8 @@ if st.button("📄 Generate Professional Quote", type="primary", use_container_w
                     "location": project_location,
                     "delivery_address": delivery_address
                 },
-                "quote_params": {
-                    "type": quote_type,
-                    "validity_period": validity_period,
-                    "payment_terms": payment_terms,
-                    "profit_margin": profit_margin / 100,
-                    "contingency": contingency / 100,
-                    "discount": discount_offered / 100
-                },
-                "services": {
-                    "delivery": include_delivery,
-                    "delivery_distance": delivery_distance,
-                    "installation": include_installation,
-                    "permits": include_permits,
-                    "site_prep": include_site_prep,
-                    "utilities": include_utilities,
-                    "maintenance": include_maintenance,
-                    "warranty": include_warranty,
-                    "warranty_period": warranty_period if include_warranty else None
-                },
+                "quote_params": quote_params,
+                "services": services,
                 "special_terms": special_terms,
                 "container_config": st.session_state.container_config
             }
@@ -186,9 +191,14 @@ if st.button("📄 Generate Professional Quote", type="primary", use_container_w
                 quote_data["technical_analysis"] = st.session_state.technical_analysis
 
             try:
-                # Generate quote
-                quote = st.session_state.quote_generator.generate_quote(quote_data)
+                # Generate quote; the cost model keeps the same settings snapshot for later edits
+                pricing = get_pricing_settings_store().current()
+                quote = st.session_state.quote_generator.generate_quote(quote_data, pricing)
                 st.session_state.generated_quote = quote
+                st.session_state.last_quote_data = quote_data
+                st.session_state.quote_cost_model = st.session_state.quote_generator.build_cost_model(quote_data, pricing)
+                st.session_state.quote_edit_inputs = (services, quote_params)
+                st.session_state.pop('last_cost_diff', None)
 
                 st.success("✅ Quote generated successfully!")
                 st.rerun()
@@ -196,9 +206,24 @@ if st.button("📄 Generate Professional Quote", type="primary", use_container_w
             except Exception as e:
                 st.error(f"❌ Error generating quote: {str(e)}")
 
+# Apply edits to an already generated quote through the incremental cost model
+if 'generated_quote' in st.session_state and 'quote_cost_model' in st.session_state:
+    if st.session_state.get('quote_edit_inputs') != (services, quote_params):
+        cost_diff = st.session_state.quote_cost_model.update(services=services, quote_params=quote_params)
+        st.session_state.quote_edit_inputs = (services, quote_params)
+        if cost_diff['changes']:
+            st.session_state.generated_quote = st.session_state.quote_generator.refresh_quote_costs(
+                st.session_state.generated_quote,
+                st.session_state.quote_cost_model,
+                {"quote_params": quote_params}
+            )
+            st.session_state.last_cost_diff = cost_diff
+
 # Display generated quote
 if 'generated_quote' in st.session_state:
     quote = st.session_state.generated_quote
+    cost_diff = st.session_state.get('last_cost_diff', {})
+    cost_changes = cost_diff.get('changes', {})
 
     st.divider()
     st.subheader("📄 Generated Quote")
@@ -213,7 +238,9 @@ if 'generated_quote' in st.session_state:
 
     with col2:
         total_cost = quote.get('total_cost', 0)
-        st.metric("Total Quote Amount", f"€{total_cost:,.2f}")
+        total_delta = cost_diff.get('total_delta')
+        st.metric("Total Quote Amount", f"€{total_cost:,.2f}",
+                  delta=f"€{total_delta:+,.2f}" if total_delta else None)
 
     # Customer and project info
     col1, col2 = st.columns(2)
@@ -257,30 +284,33 @@ if 'generated_quote' in st.session_state:
     st.subheader("💰 Cost Breakdown")
 
     if 'cost_breakdown' in quote:
-        breakdown = quote['cost_breakdown']
+        breakdown = quote['cost_breakdown'].get('breakdown', {})
 
-        # Create breakdown table
+        # Create breakdown table, marking the lines changed by the last edit
         breakdown_data = []
         for category, details in breakdown.items():
-            if isinstance(details, dict):
-                breakdown_data.append({
-                    "Category": category.replace('_', ' ').title(),
-                    "Description": details.get('description', ''),
-                    "Quantity": details.get('quantity', 1),
-                    "Unit Cost": f"€{details.get('unit_cost', 0):,.2f}",
-                    "Total": f"€{details.get('total', 0):,.2f}"
-                })
-            else:
-                breakdown_data.append({
-                    "Category": category.replace('_', ' ').title(),
-                    "Description": "",
-                    "Quantity": 1,
-                    "Unit Cost": f"€{details:,.2f}",
-                    "Total": f"€{details:,.2f}"
-                })
+            change = cost_changes.get(category)
+            breakdown_data.append({
+                "Category": category.replace('_', ' ').title(),
+                "Description": details.get('description', ''),
+                "Quantity": details.get('quantity', 1),
+                "Unit Cost": f"€{details.get('unit_cost', 0):,.2f}",
+                "Total": f"€{details.get('total', 0):,.2f}",
+                "Change": f"€{change['delta']:+,.2f}" if change else ""
+            })
 
         breakdown_df = pd.DataFrame(breakdown_data)
-        st.dataframe(breakdown_df, use_container_width=True)
+        st.dataframe(
+            breakdown_df.style.apply(
+                lambda row: ['background-color: #fff3cd' if row['Change'] else '' for _ in row], axis=1
+            ),
+            use_container_width=True
+        )
+
+        removed_lines = [key for key, change in cost_changes.items()
+                         if key not in breakdown and change['new'] == 0 and key != 'total']
+        for key in removed_lines:
+            st.caption(f"Removed: {key.replace('_', ' ').title()} (€{cost_changes[key]['delta']:+,.2f})")
 
     # Summary costs
     col1, col2, col3 = st.columns(3)
@@ -330,14 +360,23 @@ if 'generated_quote' in st.session_state:
             st.success("✅ Quote email functionality would be implemented here")
 
     with col2:
-        if st.button("📱 Download PDF", use_container_width=True):
-            # PDF generation would be implemented here
-            st.success("✅ PDF download functionality would be implemented here")
+        generated_quote = st.session_state.generated_quote
+        st.download_button(
+            "📱 Download PDF",
+            data=st.session_state.quote_generator.export_quote_pdf(
+                generated_quote, st.session_state.get('language', 'en')
+            ),
+            file_name=f"{generated_quote.get('quote_number', 'quote')}.pdf",
+            mime="application/pdf",
+            use_container_width=True
+        )
 
     with col3:
         if st.button("🔄 Create New Quote", use_container_width=True):
             if 'generated_quote' in st.session_state:
                 del st.session_state.generated_quote
+            for key in ('quote_cost_model', 'quote_edit_inputs', 'last_cost_diff'):
+                st.session_state.pop(key, None)
             st.rerun()
 
     with col4:
@@ -350,10 +389,29 @@ with st.expander("📝 Quote Templates & History"):
 
     with col1:
         st.markdown("**Available Templates:**")
-        templates = ["Standard Container", "Residential Unit", "Office Space", "Workshop", "Custom"]
-        selected_template = st.selectbox("Load Template", templates)
-        if st.button("Load Template"):
-            st.info(f"Template '{selected_template}' loaded")
+        templates = st.session_state.quote_generator.list_quote_templates()
+        template_names = [template['name'] for template in templates]
+        selected_template = st.selectbox("Load Template", template_names)
+        if st.button("Load Template", disabled=not template_names):
+            template_quote_data = st.session_state.quote_generator.load_quote_template(selected_template)
+            if template_quote_data:
+                pricing = get_pricing_settings_store().current()
+                st.session_state.generated_quote = st.session_state.quote_generator.generate_quote(template_quote_data, pricing)
+                st.session_state.last_quote_data = template_quote_data
+                st.session_state.quote_cost_model = st.session_state.quote_generator.build_cost_model(template_quote_data, pricing)
+                st.session_state.quote_edit_inputs = (services, quote_params)
+                st.session_state.pop('last_cost_diff', None)
+                st.success(f"Template '{selected_template}' loaded")
+                st.rerun()
+            else:
+                st.error(f"Template '{selected_template}' not found")
+        
+        template_name = st.text_input("Template Name")
+        if st.button("Save Current Quote as Template", disabled='last_quote_data' not in st.session_state):
+            if not template_name:
+                st.error("Please enter a template name")
+            elif st.session_state.quote_generator.save_quote_template(st.session_state.last_quote_data, template_name):
+                st.success(f"Template '{template_name}' saved")
 
     with col2:
         st.markdown("**Recent Quotes:**")
@@ -6,8 +6,9 @@ Analyzes customer drawings (PDF/DWG) to extract pricing elements
 import streamlit as st
 import pandas as pd
 from utils.document_analyzer import DocumentAnalyzer
+from utils.drawing_jobs import get_drawing_job_queue, jobs_finished, FINISHED_STATUSES, STATUS_POLL_SECONDS
 from utils.translations import t, get_available_languages
-from utils.simple_storage import SimpleStorageManager
+from utils.simple_storage import get_local_storage
 import json
 
 st.set_page_config(page_title="Drawing Analysis", page_icon="📐", layout="wide")
@@ -39,7 +40,7 @@ st.markdown(f"*{t('drawing_analysis.description')}*")
 
 # Initialize services
 document_analyzer = DocumentAnalyzer()
-storage = SimpleStorageManager()
+storage = get_local_storage()
 
 # Project context form
 st.subheader(f"🏗️ {t('drawing_analysis.project_context')}")
@@ -82,212 +83,248 @@ if uploaded_files:
     for file in uploaded_files:
         st.write(f"📄 {file.name} ({file.size} bytes)")
 
+
+def render_pdf_result(result):
+    """Show the pricing elements extracted from a PDF drawing"""
+    if result.get('status') != 'failed':
+        st.success(f"✅ Analiza zakończona pomyślnie (Model: {result.get('ai_model_used', 'AI')})")
+
+        # Structural elements
+        st.subheader("🏗️ Elementy Strukturalne")
+
+        structural = result.get('structural_elements', {})
+
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            windows = structural.get('windows', {})
+            st.metric("Okna", windows.get('count', 0))
+            if windows.get('types'):
+                st.write("Typy:", ", ".join(windows.get('types', [])))
+
+        with col2:
+            doors = structural.get('doors', {})
+            st.metric("Drzwi", doors.get('count', 0))
+            if doors.get('types'):
+                st.write("Typy:", ", ".join(doors.get('types', [])))
+
+        with col3:
+            openings = structural.get('openings', {})
+            st.metric("Inne otwory", openings.get('count', 0))
+
+        # Installations
+        st.subheader("⚡ Instalacje")
+
+        installations = result.get('installations', {})
+
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            electrical = installations.get('electrical', {})
+            complexity = electrical.get('complexity', 'basic')
+            color = {"basic": "blue", "standard": "orange", "advanced": "red"}.get(complexity, "blue")
+            st.markdown(f"**Elektryczna:** :{color}[{complexity.title()}]")
+            if electrical.get('elements'):
+                for element in electrical.get('elements', []):
+                    st.write(f"• {element}")
+
+        with col2:
+            plumbing = installations.get('plumbing', {})
+            complexity = plumbing.get('complexity', 'basic')
+            color = {"basic": "blue", "standard": "orange", "advanced": "red"}.get(complexity, "blue")
+            st.markdown(f"**Hydrauliczna:** :{color}[{complexity.title()}]")
+            if plumbing.get('elements'):
+                for element in plumbing.get('elements', []):
+                    st.write(f"• {element}")
+
+        with col3:
+            hvac = installations.get('hvac', {})
+            complexity = hvac.get('complexity', 'basic')
+            color = {"basic": "blue", "standard": "orange", "advanced": "red"}.get(complexity, "blue")
+            st.markdown(f"**HVAC:** :{color}[{complexity.title()}]")
+            if hvac.get('elements'):
+                for element in hvac.get('elements', []):
+                    st.write(f"• {element}")
+
+        # Cost impact
+        st.subheader("💰 Wpływ na Koszty")
+
+        cost_summary = result.get('cost_impact_summary', {})
+
+        complexity = cost_summary.get('estimated_complexity', 'medium')
+        complexity_color = {"low": "green", "medium": "orange", "high": "red"}.get(complexity, "orange")
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown(f"**Złożoność projektu:** :{complexity_color}[{complexity.title()}]")
+
+            additional_cost = cost_summary.get('estimated_additional_cost_percentage', 0)
+            if additional_cost > 0:
+                st.metric("Szacunkowa korekta kosztów", f"+{additional_cost}%")
+
+        with col2:
+            cost_drivers = cost_summary.get('major_cost_drivers', [])
+            if cost_drivers:
+                st.write("**Główne czynniki kosztowe:**")
+                for driver in cost_drivers:
+                    st.write(f"• {driver}")
+
+        # Recommendations
+        recommendations = result.get('recommendations', [])
+        if recommendations:
+            st.subheader("💡 Zalecenia")
+            for rec in recommendations:
+                st.info(f"• {rec}")
+
+        # Calculate cost adjustments if base estimate is available
+        if 'base_estimate' in st.session_state:
+            base_estimate = st.session_state.base_estimate
+            cost_adjustments = document_analyzer.calculate_cost_adjustments(result, base_estimate)
+
+            st.subheader("📊 Szczegółowa Analiza Kosztów")
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.metric("Wstępna wycena", f"€{base_estimate:,.2f}")
+                st.metric("Korekta na podstawie rysunku", f"€{cost_adjustments.get('total_adjustment', 0):,.2f}")
+
+            with col2:
+                st.metric("Skorygowana wycena", f"€{cost_adjustments.get('adjusted_estimate', 0):,.2f}")
+                st.metric("Procentowa korekta", f"+{cost_adjustments.get('adjustment_percentage', 0):.1f}%")
+
+            # Detailed breakdown
+            adjustments = cost_adjustments.get('cost_adjustments', {})
+            if adjustments:
+                st.write("**Szczegółowy podział korekt:**")
+                for category, amount in adjustments.items():
+                    if amount > 0:
+                        category_name = {
+                            'structural_additions': 'Elementy strukturalne',
+                            'installation_complexity': 'Złożoność instalacji',
+                            'material_upgrades': 'Ulepszenia materiałowe',
+                            'special_requirements': 'Wymagania specjalne'
+                        }.get(category, category)
+                        st.write(f"• {category_name}: €{amount:,.2f}")
+
+    else:
+        st.error("❌ Nie udało się przeanalizować pliku")
+        st.write("Zalecenia:")
+        for rec in result.get('recommendations', []):
+            st.write(f"• {rec}")
+
+
+def render_dwg_result(result):
+    """Show the limited metadata analysis of a DWG file"""
+    st.info("📝 Analiza pliku DWG (ograniczona)")
+    st.write("**Informacje o pliku:**")
+    file_info = result.get('file_info', {})
+    st.write(f"• Nazwa: {file_info.get('filename', 'N/A')}")
+    st.write(f"• Rozmiar: {file_info.get('size_bytes', 0)/1024:.1f} KB")
+
+    st.warning("💡 **Wskazówka:** Prześlij rysunek w formacie PDF dla pełnej analizy AI")
+
+    recommendations = result.get('recommendations', [])
+    for rec in recommendations:
+        st.write(f"• {rec}")
+
+
+def render_image_result(result):
+    if result.get('status') != 'failed':
+        st.success("✅ Analiza obrazu zakończona")
+    else:
+        st.error("❌ Nie udało się przeanalizować obrazu")
+
+
+def render_analysis_jobs(polling: bool = False):
+    """Show the queued analyses of the last upload as they finish"""
+    batch = st.session_state.drawing_analysis_jobs
+    jobs = get_drawing_job_queue().get_jobs(batch['job_ids'])
+    finished = [job for job in jobs if job['status'] in FINISHED_STATUSES]
+
+    st.progress(len(finished) / max(1, len(jobs)), text=f"Przeanalizowano {len(finished)} z {len(jobs)} plików")
+
+    for job in jobs:
+        st.subheader(f"📋 Analiza: {job['filename']}")
+
+        if job['status'] == 'queued':
+            st.info("⏳ Plik czeka w kolejce na analizę...")
+        elif job['status'] == 'running':
+            st.info("🤖 Analizuję rysunek za pomocą Groq AI...")
+        elif job['status'] == 'failed':
+            st.error(f"❌ Błąd podczas analizy pliku {job['filename']}: {job['error']}")
+            st.write("Spróbuj ponownie lub skontaktuj się z działem technicznym.")
+        elif job['kind'] == 'pdf':
+            render_pdf_result(job['result'])
+        elif job['kind'] == 'dwg':
+            render_dwg_result(job['result'])
+        else:
+            st.info("🖼️ Analiza obrazu")
+            render_image_result(job['result'])
+
+    if not jobs_finished(jobs):
+        return
+    if polling:
+        # Everything is in; rerun the whole page so polling stops
+        st.rerun()
+
+    # Save analysis results
+    project_context = batch['project_context']
+    analysis_results = [job['result'] for job in jobs if job['kind'] == 'pdf' and job['status'] == 'done']
+    if analysis_results and project_context.get('project_name') and not batch.get('saved'):
+        try:
+            analysis_data = {
+                'project_name': project_context['project_name'],
+                'project_context': project_context,
+                'analysis_results': analysis_results,
+                'analysis_date': pd.Timestamp.now().isoformat(),
+                'files_analyzed': [job['filename'] for job in jobs]
+            }
+
+            # Save to storage
+            storage.save_user_project(
+                user_id=st.session_state.get('user_id', 'guest'),
+                project_name=f"Drawing Analysis: {project_context['project_name']}",
+                config=analysis_data
+            )
+            batch['saved'] = True
+
+            st.success("✅ Analiza została zapisana w projekcie")
+
+        except Exception as e:
+            st.warning(f"Nie udało się zapisać analizy: {str(e)}")
+
+
 # Analysis section
 if uploaded_files and st.button("🔍 Analizuj Rysunki (Groq AI - Darmowe)", type="primary"):
-    
+
     project_context = {
         'container_type': container_type,
         'use_case': use_case,
         'location': location,
         'project_name': project_name
     }
-    
-    with st.spinner("Analizuję rysunki za pomocą Groq AI (darmowe i szybkie)..."):
-        
-        analysis_results = []
-        
-        for uploaded_file in uploaded_files:
-            st.subheader(f"📋 Analiza: {uploaded_file.name}")
-            
-            try:
-                if uploaded_file.name.lower().endswith('.pdf'):
-                    # PDF analysis with AI
-                    result = document_analyzer.analyze_pdf_drawing(uploaded_file, project_context)
-                    analysis_results.append(result)
-                    
-                    # Display results
-                    if result.get('status') != 'failed':
-                        st.success(f"✅ Analiza zakończona pomyślnie (Model: {result.get('ai_model_used', 'AI')})")
-                        
-                        # Structural elements
-                        st.subheader("🏗️ Elementy Strukturalne")
-                        
-                        structural = result.get('structural_elements', {})
-                        
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            windows = structural.get('windows', {})
-                            st.metric("Okna", windows.get('count', 0))
-                            if windows.get('types'):
-                                st.write("Typy:", ", ".join(windows.get('types', [])))
-                        
-                        with col2:
-                            doors = structural.get('doors', {})
-                            st.metric("Drzwi", doors.get('count', 0))
-                            if doors.get('types'):
-                                st.write("Typy:", ", ".join(doors.get('types', [])))
-                        
-                        with col3:
-                            openings = structural.get('openings', {})
-                            st.metric("Inne otwory", openings.get('count', 0))
-                        
-                        # Installations
-                        st.subheader("⚡ Instalacje")
-                        
-                        installations = result.get('installations', {})
-                        
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            electrical = installations.get('electrical', {})
-                            complexity = electrical.get('complexity', 'basic')
-                            color = {"basic": "blue", "standard": "orange", "advanced": "red"}.get(complexity, "blue")
-                            st.markdown(f"**Elektryczna:** :{color}[{complexity.title()}]")
-                            if electrical.get('elements'):
-                                for element in electrical.get('elements', []):
-                                    st.write(f"• {element}")
-                        
-                        with col2:
-                            plumbing = installations.get('plumbing', {})
-                            complexity = plumbing.get('complexity', 'basic')
-                            color = {"basic": "blue", "standard": "orange", "advanced": "red"}.get(complexity, "blue")
-                            st.markdown(f"**Hydrauliczna:** :{color}[{complexity.title()}]")
-                            if plumbing.get('elements'):
-                                for element in plumbing.get('elements', []):
-                                    st.write(f"• {element}")
-                        
-                        with col3:
-                            hvac = installations.get('hvac', {})
-                            complexity = hvac.get('complexity', 'basic')
-                            color = {"basic": "blue", "standard": "orange", "advanced": "red"}.get(complexity, "blue")
-                            st.markdown(f"**HVAC:** :{color}[{complexity.title()}]")
-                            if hvac.get('elements'):
-                                for element in hvac.get('elements', []):
-                                    st.write(f"• {element}")
-                        
-                        # Cost impact
-                        st.subheader("💰 Wpływ na Koszty")
-                        
-                        cost_summary = result.get('cost_impact_summary', {})
-                        
-                        complexity = cost_summary.get('estimated_complexity', 'medium')
-                        complexity_color = {"low": "green", "medium": "orange", "high": "red"}.get(complexity, "orange")
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.markdown(f"**Złożoność projektu:** :{complexity_color}[{complexity.title()}]")
-                            
-                            additional_cost = cost_summary.get('estimated_additional_cost_percentage', 0)
-                            if additional_cost > 0:
-                                st.metric("Szacunkowa korekta kosztów", f"+{additional_cost}%")
-                        
-                        with col2:
-                            cost_drivers = cost_summary.get('major_cost_drivers', [])
-                            if cost_drivers:
-                                st.write("**Główne czynniki kosztowe:**")
-                                for driver in cost_drivers:
-                                    st.write(f"• {driver}")
-                        
-                        # Recommendations
-                        recommendations = result.get('recommendations', [])
-                        if recommendations:
-                            st.subheader("💡 Zalecenia")
-                            for rec in recommendations:
-                                st.info(f"• {rec}")
-                        
-                        # Calculate cost adjustments if base estimate is available
-                        if 'base_estimate' in st.session_state:
-                            base_estimate = st.session_state.base_estimate
-                            cost_adjustments = document_analyzer.calculate_cost_adjustments(result, base_estimate)
-                            
-                            st.subheader("📊 Szczegółowa Analiza Kosztów")
-                            
-                            col1, col2 = st.columns(2)
-                            
-                            with col1:
-                                st.metric("Wstępna wycena", f"€{base_estimate:,.2f}")
-                                st.metric("Korekta na podstawie rysunku", f"€{cost_adjustments.get('total_adjustment', 0):,.2f}")
-                            
-                            with col2:
-                                st.metric("Skorygowana wycena", f"€{cost_adjustments.get('adjusted_estimate', 0):,.2f}")
-                                st.metric("Procentowa korekta", f"+{cost_adjustments.get('adjustment_percentage', 0):.1f}%")
-                            
-                            # Detailed breakdown
-                            adjustments = cost_adjustments.get('cost_adjustments', {})
-                            if adjustments:
-                                st.write("**Szczegółowy podział korekt:**")
-                                for category, amount in adjustments.items():
-                                    if amount > 0:
-                                        category_name = {
-                                            'structural_additions': 'Elementy strukturalne',
-                                            'installation_complexity': 'Złożoność instalacji',
-                                            'material_upgrades': 'Ulepszenia materiałowe',
-                                            'special_requirements': 'Wymagania specjalne'
-                                        }.get(category, category)
-                                        st.write(f"• {category_name}: €{amount:,.2f}")
-                        
-                    else:
-                        st.error("❌ Nie udało się przeanalizować pliku")
-                        st.write("Zalecenia:")
-                        for rec in result.get('recommendations', []):
-                            st.write(f"• {rec}")
-                
-                elif uploaded_file.name.lower().endswith('.dwg'):
-                    # DWG analysis (limited)
-                    result = document_analyzer.analyze_dwg_metadata(uploaded_file)
-                    
-                    st.info("📝 Analiza pliku DWG (ograniczona)")
-                    st.write("**Informacje o pliku:**")
-                    file_info = result.get('file_info', {})
-                    st.write(f"• Nazwa: {file_info.get('filename', 'N/A')}")
-                    st.write(f"• Rozmiar: {file_info.get('size_bytes', 0)/1024:.1f} KB")
-                    
-                    st.warning("💡 **Wskazówka:** Prześlij rysunek w formacie PDF dla pełnej analizy AI")
-                    
-                    recommendations = result.get('recommendations', [])
-                    for rec in recommendations:
-                        st.write(f"• {rec}")
-                
-                else:
-                    # Image analysis
-                    st.info("🖼️ Analizuję obraz...")
-                    # For JPG/PNG, we can still use AI vision
-                    result = document_analyzer.analyze_pdf_drawing(uploaded_file, project_context)
-                    
-                    if result.get('status') != 'failed':
-                        st.success("✅ Analiza obrazu zakończona")
-                        # Display similar results as PDF
-                    else:
-                        st.error("❌ Nie udało się przeanalizować obrazu")
-                
-            except Exception as e:
-                st.error(f"❌ Błąd podczas analizy pliku {uploaded_file.name}: {str(e)}")
-                st.write("Spróbuj ponownie lub skontaktuj się z działem technicznym.")
-        
-        # Save analysis results
-        if analysis_results and project_name:
-            try:
-                analysis_data = {
-                    'project_name': project_name,
-                    'project_context': project_context,
-                    'analysis_results': analysis_results,
-                    'analysis_date': pd.Timestamp.now().isoformat(),
-                    'files_analyzed': [f.name for f in uploaded_files]
-                }
-                
-                # Save to storage
-                storage.save_user_project(
-                    user_id=st.session_state.get('user_id', 'guest'),
-                    project_name=f"Drawing Analysis: {project_name}",
-                    config=analysis_data
-                )
-                
-                st.success("✅ Analiza została zapisana w projekcie")
-                
-            except Exception as e:
-                st.warning(f"Nie udało się zapisać analizy: {str(e)}")
+
+    # Queue every file; they are analyzed in parallel in the background and survive navigation
+    try:
+        job_queue = get_drawing_job_queue()
+        st.session_state.drawing_analysis_jobs = {
+            'job_ids': [job_queue.enqueue(uploaded_file, project_context,
+                                          owner=st.session_state.get('user_id', 'guest'))
+                        for uploaded_file in uploaded_files],
+            'project_context': project_context,
+            'saved': False
+        }
+    except Exception as e:
+        st.error(f"❌ Nie udało się rozpocząć analizy: {str(e)}")
+
+if 'drawing_analysis_jobs' in st.session_state:
+    batch_jobs = get_drawing_job_queue().get_jobs(st.session_state.drawing_analysis_jobs['job_ids'])
+    if jobs_finished(batch_jobs):
+        render_analysis_jobs()
+    else:
+        st.fragment(run_every=STATUS_POLL_SECONDS)(render_analysis_jobs)(polling=True)
 
 # Tips section
 st.divider()
@@ -5,7 +5,7 @@ Simplified version for customer use as part of estimation process
 """
 
 import streamlit as st
-from utils.document_analyzer import DocumentAnalyzer
+from utils.drawing_jobs import get_drawing_job_queue, jobs_finished, STATUS_POLL_SECONDS
 from utils.translations import t, render_language_selector
 
 st.set_page_config(page_title="Drawing Analysis", page_icon="📐", layout="wide")
@@ -118,109 +118,128 @@ if uploaded_files:
     for file in uploaded_files:
         st.write(f"📄 {file.name} ({file.size} bytes)")
 
+
+def render_drawing_result(result):
+    """Show the simplified analysis of one drawing"""
+    if result and result.get('status') != 'failed':
+        st.success(f"✅ {t('drawing_analysis_customer.analysis_complete')}")
+
+        # Simplified results display
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            structural = result.get('structural_elements', {})
+            windows = structural.get('windows', {}).get('count', 0)
+            doors = structural.get('doors', {}).get('count', 0)
+            st.metric(t('drawing_analysis_customer.windows'), windows)
+            st.metric(t('drawing_analysis_customer.doors'), doors)
+
+        with col2:
+            installations = result.get('installations', {})
+            electrical = installations.get('electrical', {}).get('complexity', 'basic')
+            plumbing = installations.get('plumbing', {}).get('complexity', 'basic')
+
+            complexity_colors = {"basic": "🟢", "standard": "🟡", "advanced": "🔴"}
+            st.write(f"**{t('drawing_analysis_customer.electrical')}:** {complexity_colors.get(electrical, '🟢')} {electrical.title()}")
+            st.write(f"**{t('drawing_analysis_customer.plumbing')}:** {complexity_colors.get(plumbing, '🟢')} {plumbing.title()}")
+
+        with col3:
+            cost_impact = result.get('cost_impact_summary', {})
+            complexity = cost_impact.get('estimated_complexity', 'medium')
+            additional_cost = cost_impact.get('estimated_additional_cost_percentage', 0)
+
+            complexity_color = {"low": "green", "medium": "orange", "high": "red"}.get(complexity, "orange")
+            st.markdown(f"**{t('drawing_analysis_customer.complexity')}:** :{complexity_color}[{complexity.title()}]")
+
+            if additional_cost > 0:
+                st.metric(t('drawing_analysis_customer.cost_adjustment'), f"+{additional_cost}%")
+
+        # Cost adjustment if base estimate available
+        if 'cost_breakdown' in st.session_state and additional_cost > 0:
+            st.subheader(f"💰 {t('drawing_analysis_customer.updated_estimate')}")
+
+            base_cost = st.session_state.cost_breakdown.get('total_cost', 0)
+            adjusted_cost = base_cost * (1 + additional_cost / 100)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric(t('drawing_analysis_customer.base_estimate'), f"€{base_cost:,.2f}")
+            with col2:
+                st.metric(t('drawing_analysis_customer.adjusted_estimate'), f"€{adjusted_cost:,.2f}")
+
+        # Save the analysis
+        st.session_state.drawing_analysis = result
+
+    else:
+        st.error(f"❌ {t('drawing_analysis_customer.analysis_failed')}")
+        st.warning(f"""
+        **{t('drawing_analysis_customer.analysis_failed_reasons', 'Możliwe przyczyny niepowodzenia analizy')}:**
+        • Plik może być uszkodzony lub w nieobsługiwanym formacie
+        • Rysunek może nie zawierać wystarczających szczegółów technicznych
+        • Brak połączenia z usługą analizy AI
+        • Konfiguracja kontenera może być niepełna
+        """)
+        st.info("Attempting fallback analysis based on project context...")
+
+        # Show fallback results
+        st.info(f"📊 Based on project type: {config.get('main_purpose', 'Unknown')}")
+
+
+def render_drawing_jobs(polling: bool = False):
+    """Show the queued analyses of the last upload as they finish"""
+    jobs = get_drawing_job_queue().get_jobs(st.session_state.customer_drawing_jobs)
+
+    for job in jobs:
+        st.subheader(f"📋 {t('drawing_analysis_customer.analysis_results')}: {job['filename']}")
+
+        if job['status'] in ('queued', 'running'):
+            st.info(f"⏳ {t('drawing_analysis_customer.analyzing')}")
+        elif job['status'] == 'failed':
+            st.error(f"❌ {t('drawing_analysis_customer.error')}: {job['error']}")
+            st.info("Showing fallback analysis based on configuration...")
+
+            # Fallback display based on configuration
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Estimated Windows", 2)
+                st.metric("Estimated Doors", 1)
+            with col2:
+                st.write("**Electrical:** 🟡 Standard")
+                st.write("**Complexity:** Medium")
+        else:
+            render_drawing_result(job['result'])
+
+    if polling and jobs_finished(jobs):
+        # Everything is in; rerun the whole page so polling stops
+        st.rerun()
+
+
 # Analysis section
 if uploaded_files and st.button(f"🔍 {t('drawing_analysis_customer.analyze_button')}", type="primary"):
-    
+
     project_context = {
         'container_type': config.get('container_type'),
         'use_case': config.get('main_purpose'),
         'location': location,
         'project_name': project_name
     }
-    
-    with st.spinner(t('drawing_analysis_customer.analyzing')):
-        
-        try:
-            document_analyzer = DocumentAnalyzer()
-            
-            for uploaded_file in uploaded_files:
-                st.subheader(f"📋 {t('drawing_analysis_customer.analysis_results')}: {uploaded_file.name}")
-                
-                try:
-                    # Reset file pointer to beginning
-                    uploaded_file.seek(0)
-                    
-                    result = document_analyzer.analyze_pdf_drawing(uploaded_file, project_context)
-                    
-                    if result and result.get('status') != 'failed':
-                        st.success(f"✅ {t('drawing_analysis_customer.analysis_complete')}")
-                        
-                        # Simplified results display
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            structural = result.get('structural_elements', {})
-                            windows = structural.get('windows', {}).get('count', 0)
-                            doors = structural.get('doors', {}).get('count', 0)
-                            st.metric(t('drawing_analysis_customer.windows'), windows)
-                            st.metric(t('drawing_analysis_customer.doors'), doors)
-                        
-                        with col2:
-                            installations = result.get('installations', {})
-                            electrical = installations.get('electrical', {}).get('complexity', 'basic')
-                            plumbing = installations.get('plumbing', {}).get('complexity', 'basic')
-                            
-                            complexity_colors = {"basic": "🟢", "standard": "🟡", "advanced": "🔴"}
-                            st.write(f"**{t('drawing_analysis_customer.electrical')}:** {complexity_colors.get(electrical, '🟢')} {electrical.title()}")
-                            st.write(f"**{t('drawing_analysis_customer.plumbing')}:** {complexity_colors.get(plumbing, '🟢')} {plumbing.title()}")
-                        
-                        with col3:
-                            cost_impact = result.get('cost_impact_summary', {})
-                            complexity = cost_impact.get('estimated_complexity', 'medium')
-                            additional_cost = cost_impact.get('estimated_additional_cost_percentage', 0)
-                            
-                            complexity_color = {"low": "green", "medium": "orange", "high": "red"}.get(complexity, "orange")
-                            st.markdown(f"**{t('drawing_analysis_customer.complexity')}:** :{complexity_color}[{complexity.title()}]")
-                            
-                            if additional_cost > 0:
-                                st.metric(t('drawing_analysis_customer.cost_adjustment'), f"+{additional_cost}%")
-                        
-                        # Cost adjustment if base estimate available
-                        if 'cost_breakdown' in st.session_state and additional_cost > 0:
-                            st.subheader(f"💰 {t('drawing_analysis_customer.updated_estimate')}")
-                            
-                            base_cost = st.session_state.cost_breakdown.get('total_cost', 0)
-                            adjusted_cost = base_cost * (1 + additional_cost / 100)
-                            
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric(t('drawing_analysis_customer.base_estimate'), f"€{base_cost:,.2f}")
-                            with col2:
-                                st.metric(t('drawing_analysis_customer.adjusted_estimate'), f"€{adjusted_cost:,.2f}")
-                        
-                        # Save the analysis
-                        st.session_state.drawing_analysis = result
-                        
-                    else:
-                        st.error(f"❌ {t('drawing_analysis_customer.analysis_failed')}")
-                        st.warning(f"""
-                        **{t('drawing_analysis_customer.analysis_failed_reasons', 'Możliwe przyczyny niepowodzenia analizy')}:**
-                        • Plik może być uszkodzony lub w nieobsługiwanym formacie
-                        • Rysunek może nie zawierać wystarczających szczegółów technicznych
-                        • Brak połączenia z usługą analizy AI
-                        • Konfiguracja kontenera może być niepełna
-                        """)
-                        st.info("Attempting fallback analysis based on project context...")
-                        
-                        # Show fallback results
-                        st.info(f"📊 Based on project type: {config.get('main_purpose', 'Unknown')}")
-                        
-                except Exception as file_error:
-                    st.error(f"❌ {t('drawing_analysis_customer.error')}: {str(file_error)}")
-                    st.info("Showing fallback analysis based on configuration...")
-                    
-                    # Fallback display based on configuration
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.metric("Estimated Windows", 2)
-                        st.metric("Estimated Doors", 1)
-                    with col2:
-                        st.write("**Electrical:** 🟡 Standard")
-                        st.write("**Complexity:** Medium")
-                        
-        except Exception as e:
-            st.error(f"❌ Service error: {str(e)}")
-            st.info("Please try again or contact support if the problem persists.")
+
+    # Queue every file; they are analyzed in parallel in the background and survive navigation
+    try:
+        job_queue = get_drawing_job_queue()
+        st.session_state.customer_drawing_jobs = [
+            job_queue.enqueue(uploaded_file, project_context, owner=st.session_state.get('user_id', 'guest'))
+            for uploaded_file in uploaded_files
+        ]
+    except Exception as e:
+        st.error(f"❌ Service error: {str(e)}")
+        st.info("Please try again or contact support if the problem persists.")
+
+if st.session_state.get('customer_drawing_jobs'):
+    if jobs_finished(get_drawing_job_queue().get_jobs(st.session_state.customer_drawing_jobs)):
+        render_drawing_jobs()
+    else:
+        st.fragment(run_every=STATUS_POLL_SECONDS)(render_drawing_jobs)(polling=True)
 
 # Next steps
 st.divider()
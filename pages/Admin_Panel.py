@@ -3,13 +3,22 @@ Admin Panel for KAN-BUD Container Calculator
 Manage business settings, costs, margins, and historical data
 """
 
+import os
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 import json
-from utils.simple_storage import SimpleStorageManager
+from utils.simple_storage import get_local_storage
 from utils.translations import t, render_language_selector
-from utils.historical_data_service import HistoricalDataService
+from utils.historical_data_service import get_historical_data_service
+from utils.database import get_database_manager
+from utils.async_database import get_async_database_manager
+from utils.pricing_settings import get_pricing_settings_store, SETTINGS_SECTIONS
+from utils.calculations import LABOR_RATES
+from utils.pricing_rules import (
+    OPERATING_COSTS, MATERIAL_MARGINS, SERVICE_MARGINS, VOLUME_DISCOUNTS, SEASONAL_ADJUSTMENTS
+)
+from utils.analysis_cache import get_analysis_cache
 
 # Initialize language if not set
 if 'language' not in st.session_state:
@@ -18,6 +27,16 @@ if 'language' not in st.session_state:
 # Language selector
 render_language_selector()
 
+# Editor defaults of every persisted pricing section
+SECTION_DEFAULTS = {
+    'labor_rates': LABOR_RATES,
+    'operating_costs': OPERATING_COSTS,
+    'material_margins': MATERIAL_MARGINS,
+    'service_margins': SERVICE_MARGINS,
+    'volume_discounts': VOLUME_DISCOUNTS,
+    'seasonal_adjustments': SEASONAL_ADJUSTMENTS
+}
+
 # Admin authentication
 def check_admin_access():
     if 'admin_logged_in' not in st.session_state:
@@ -55,7 +74,16 @@ def admin_panel():
         st.rerun()
     
     # Initialize storage
-    storage = SimpleStorageManager()
+    storage = get_local_storage()
+    settings_store = get_pricing_settings_store()
+    
+    # Seed the settings editors once per session from the saved settings, defaults until saved
+    if 'pricing_settings_loaded' not in st.session_state:
+        snapshot = settings_store.current()
+        for section, defaults in SECTION_DEFAULTS.items():
+            saved = snapshot.section(section)
+            st.session_state[section] = {key: float(saved.get(key, value)) for key, value in defaults.items()}
+        st.session_state.pricing_settings_loaded = True
     
     # Admin tabs
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -74,16 +102,6 @@ def admin_panel():
         with col1:
             st.subheader("Labor Rates (€/hour)")
             
-            # Get current labor rates
-            if 'labor_rates' not in st.session_state:
-                st.session_state.labor_rates = {
-                    'basic_worker': 25.0,
-                    'skilled_worker': 35.0,
-                    'specialist': 45.0,
-                    'engineer': 65.0,
-                    'project_manager': 75.0
-                }
-            
             st.session_state.labor_rates['basic_worker'] = st.number_input(
                 "Basic Worker", 
                 value=st.session_state.labor_rates['basic_worker'],
@@ -101,29 +119,11 @@ def admin_panel():
                 value=st.session_state.labor_rates['specialist'],
                 min_value=0.0, max_value=200.0, step=0.5
             )
-            
-            st.session_state.labor_rates['engineer'] = st.number_input(
-                "Engineer", 
-                value=st.session_state.labor_rates['engineer'],
-                min_value=0.0, max_value=200.0, step=0.5
-            )
-            
-            st.session_state.labor_rates['project_manager'] = st.number_input(
-                "Project Manager", 
-                value=st.session_state.labor_rates['project_manager'],
-                min_value=0.0, max_value=200.0, step=0.5
-            )
         
         with col2:
             st.subheader("Operating Costs")
-            
-            if 'operating_costs' not in st.session_state:
-                st.session_state.operating_costs = {
-                    'workshop_hourly': 15.0,
-                    'equipment_hourly': 25.0,
-                    'transport_km': 1.2,
-                    'overhead_percentage': 20.0
-                }
+            st.caption("Once saved, overhead replaces the built-in 45% markup; workshop and equipment costs "
+                       "are charged per labor hour, transport per km of delivery over 50 km")
             
             st.session_state.operating_costs['workshop_hourly'] = st.number_input(
                 "Workshop Cost (€/hour)", 
@@ -150,27 +150,24 @@ def admin_panel():
             )
         
         if st.button("💾 Save Cost Settings"):
-            # Save to storage
-            st.success("Cost settings saved successfully!")
+            snapshot = settings_store.save({
+                'labor_rates': st.session_state.labor_rates,
+                'operating_costs': st.session_state.operating_costs
+            }, saved_by='admin')
+            if snapshot:
+                st.success(f"Cost settings saved successfully! (settings version {snapshot.version})")
     
     with tab2:
         st.header("Profit Margins & Pricing Strategy")
+        st.caption("Until saved, prices use the built-in 20% profit margin and no volume or seasonal adjustment. "
+                   "Volume discounts apply by project value; winter is Dec-Feb, summer Jun-Aug and the "
+                   "holiday surcharge replaces winter from 20 Dec to 6 Jan.")
         
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("Materials Margins")
             
-            if 'material_margins' not in st.session_state:
-                st.session_state.material_margins = {
-                    'steel_structural': 25.0,
-                    'insulation': 35.0,
-                    'electrical': 30.0,
-                    'plumbing': 28.0,
-                    'windows_doors': 40.0,
-                    'finishes': 45.0
-                }
-            
             for material, default_margin in st.session_state.material_margins.items():
                 st.session_state.material_margins[material] = st.number_input(
                     f"{material.replace('_', ' ').title()} Margin (%)",
@@ -181,16 +178,6 @@ def admin_panel():
         with col2:
             st.subheader("Service Categories")
             
-            if 'service_margins' not in st.session_state:
-                st.session_state.service_margins = {
-                    'basic_modification': 20.0,
-                    'complex_structural': 35.0,
-                    'hvac_systems': 30.0,
-                    'electrical_systems': 28.0,
-                    'custom_design': 50.0,
-                    'project_management': 25.0
-                }
-            
             for service, default_margin in st.session_state.service_margins.items():
                 st.session_state.service_margins[service] = st.number_input(
                     f"{service.replace('_', ' ').title()} Margin (%)",
@@ -207,14 +194,6 @@ def admin_panel():
         with col1:
             st.markdown("**Volume Discounts**")
             
-            if 'volume_discounts' not in st.session_state:
-                st.session_state.volume_discounts = {
-                    'small_project': 0.0,  # < €50k
-                    'medium_project': 5.0,  # €50k - €200k
-                    'large_project': 10.0,  # €200k - €500k
-                    'enterprise_project': 15.0  # > €500k
-                }
-            
             st.session_state.volume_discounts['small_project'] = st.number_input(
                 "Small Project Discount (< €50k) %", 
                 value=st.session_state.volume_discounts['small_project'],
@@ -242,13 +221,6 @@ def admin_panel():
         with col2:
             st.markdown("**Seasonal Adjustments**")
             
-            if 'seasonal_adjustments' not in st.session_state:
-                st.session_state.seasonal_adjustments = {
-                    'winter_surcharge': 5.0,
-                    'summer_discount': 2.0,
-                    'holiday_surcharge': 10.0
-                }
-            
             st.session_state.seasonal_adjustments['winter_surcharge'] = st.number_input(
                 "Winter Surcharge (%)", 
                 value=st.session_state.seasonal_adjustments['winter_surcharge'],
@@ -268,12 +240,17 @@ def admin_panel():
             )
         
         if st.button("💾 Save Pricing Settings"):
-            st.success("Pricing settings saved successfully!")
+            snapshot = settings_store.save({
+                section: st.session_state[section]
+                for section in ('material_margins', 'service_margins', 'volume_discounts', 'seasonal_adjustments')
+            }, saved_by='admin')
+            if snapshot:
+                st.success(f"Pricing settings saved successfully! (settings version {snapshot.version})")
     
     with tab3:
         st.header("Historical Data Management")
         
-        historical_service = HistoricalDataService()
+        historical_service = get_historical_data_service()
         
         st.subheader("📤 Import Historical Project Data")
         st.info("**Admin Only:** Import your 2-year historical calculation results to improve pricing accuracy")
@@ -287,23 +264,35 @@ def admin_panel():
         if uploaded_file is not None:
             if st.button("Import Historical Data"):
                 try:
-                    st.info("Processing historical data...")
-                    
-                    # Process the uploaded file
-                    df = None
-                    if uploaded_file.name.endswith('.csv'):
-                        df = pd.read_csv(uploaded_file)
-                    elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-                        df = pd.read_excel(uploaded_file)
-                    
-                    if df is not None:
-                        # Convert DataFrame to records and import
-                        data_records = df.to_dict('records')
-                        if historical_service.import_historical_projects(data=data_records):
-                            st.success(f"Successfully imported {len(data_records)} historical projects!")
-                            st.info("Pricing accuracy will now improve based on this historical data!")
-                        else:
-                            st.error("Failed to import data. Please check the format.")
+                    progress_bar = st.progress(0.0, text="Processing historical data...")
+
+                    def show_progress(progress):
+                        fraction = progress['fraction']
+                        progress_bar.progress(fraction if fraction is not None else 0.5,
+                                              text=f"Read {progress['rows_read']:,} rows, "
+                                                   f"rejected {progress['rows_rejected']:,}")
+
+                    summary = historical_service.import_historical_upload(
+                        uploaded_file, uploaded_file.name, progress_callback=show_progress
+                    )
+                    progress_bar.progress(1.0, text="Import finished")
+
+                    if summary:
+                        st.success(f"Successfully imported {summary['rows_accepted']:,} historical projects "
+                                   f"({summary['inserted']:,} new, {summary['updated']:,} updated)!")
+                        st.info("Pricing accuracy will now improve based on this historical data!")
+
+                        if summary['rejected_path']:
+                            st.warning(f"{summary['rows_rejected']:,} rows were rejected and not imported.")
+                            with open(summary['rejected_path'], 'rb') as rejected_file:
+                                st.download_button(
+                                    label="Download Rejected Rows",
+                                    data=rejected_file.read(),
+                                    file_name=os.path.basename(summary['rejected_path']),
+                                    mime="text/csv"
+                                )
+                    else:
+                        st.error("Failed to import data. Please check the format.")
                     
                 except Exception as e:
                     st.error(f"Error processing file: {str(e)}")
@@ -324,7 +313,18 @@ def admin_panel():
         # Historical data statistics
         st.subheader("📊 Historical Data Statistics")
         
-        stats = storage.get_storage_stats()
+        async_db = get_async_database_manager()
+        if async_db:
+            # Independent counts, fetched concurrently
+            counts = async_db.run_concurrently(
+                historical_projects=async_db.count_rows('historical_projects'),
+                user_projects=async_db.count_rows('user_projects'),
+                customers=async_db.count_rows('customers'),
+                quotes=async_db.count_rows('quotes')
+            )
+            stats = {key: value or 0 for key, value in counts.items()}
+        else:
+            stats = storage.get_storage_stats()
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -339,7 +339,111 @@ def admin_panel():
         
         with col4:
             st.metric("Generated Quotes", stats.get('quotes', 0))
-        
+
+        # Estimate accuracy for every container type / use case, from the cached lookup table
+        accuracy_table = historical_service.get_accuracy_table()
+        if not accuracy_table.empty:
+            st.subheader("🎯 Estimate Accuracy by Segment")
+            st.dataframe(
+                accuracy_table[['container_type', 'use_case', 'n', 'mae', 'mape', 'within_10_pct',
+                                'within_20_pct', 'bias_pct', 'ratio_mean', 'ratio_std']].rename(columns={
+                    'container_type': 'Container Type',
+                    'use_case': 'Use Case',
+                    'n': 'Projects',
+                    'mae': 'MAE',
+                    'mape': 'MAPE %',
+                    'within_10_pct': 'Within 10 %',
+                    'within_20_pct': 'Within 20 %',
+                    'bias_pct': 'Over - Under %',
+                    'ratio_mean': 'Actual/Estimate',
+                    'ratio_std': 'Ratio Std'
+                }).round(2),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        # Cost trends for every segment, computed once per data version
+        st.subheader("📈 Cost Trends by Segment")
+        trend_grouping = st.radio(
+            "Segment by",
+            options=["Container type & use case", "Container type", "Location"],
+            horizontal=True
+        )
+        segment_columns = {
+            "Container type & use case": ('container_type', 'use_case'),
+            "Container type": ('container_type',),
+            "Location": ('location',)
+        }[trend_grouping]
+        trends = historical_service.get_segment_trends(segment_columns)
+        if trends.empty:
+            st.info("Not enough historical data for trend analysis yet.")
+        else:
+            st.dataframe(
+                trends[list(segment_columns) + ['months', 'projects', 'latest_avg_cost', 'monthly_trend_pct',
+                                                'volatility_pct', 'changepoints', 'last_changepoint',
+                                                'trend_direction']].rename(columns={
+                    'container_type': 'Container Type',
+                    'use_case': 'Use Case',
+                    'location': 'Location',
+                    'months': 'Months',
+                    'projects': 'Projects',
+                    'latest_avg_cost': 'Latest Avg Cost',
+                    'monthly_trend_pct': 'EWMA Trend %/month',
+                    'volatility_pct': 'Volatility %',
+                    'changepoints': 'Changepoints',
+                    'last_changepoint': 'Last Changepoint',
+                    'trend_direction': 'Direction'
+                }).round(2),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        # Nearest past projects for a planned configuration, from the similar-project index
+        if not accuracy_table.empty:
+            st.subheader("🔍 Similar Past Projects")
+            col1, col2, col3, col4 = st.columns([3, 3, 3, 1])
+            with col1:
+                similar_type = st.selectbox("Container Type", sorted(accuracy_table['container_type'].unique()),
+                                            key='similar_container_type')
+            with col2:
+                similar_use = st.selectbox("Use Case", sorted(accuracy_table['use_case'].unique()),
+                                           key='similar_use_case')
+            with col3:
+                similar_location = st.text_input("Location (optional)", key='similar_location')
+            with col4:
+                similar_k = st.number_input("Projects", min_value=1, max_value=50, value=10, key='similar_k')
+
+            similar = historical_service.get_similar_projects(similar_type, similar_use,
+                                                              location=similar_location or None, k=int(similar_k))
+            if not similar:
+                st.info("No comparable historical projects found.")
+            else:
+                if 'weighted_cost_ratio' in similar:
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Weighted Actual/Estimate", f"{similar['weighted_cost_ratio']:.2f}")
+                    with col2:
+                        st.metric("Ratio Std", f"{similar['ratio_std']:.2f}")
+                    with col3:
+                        st.metric("Projects with Both Costs", similar['neighbours'])
+                columns = [column for column in ('project_date', 'container_type', 'use_case', 'location',
+                                                 'estimated_cost', 'actual_cost', 'cost_ratio', 'distance')
+                           if column in similar['projects'].columns]
+                st.dataframe(
+                    similar['projects'][columns].rename(columns={
+                        'project_date': 'Date',
+                        'container_type': 'Container Type',
+                        'use_case': 'Use Case',
+                        'location': 'Location',
+                        'estimated_cost': 'Estimated',
+                        'actual_cost': 'Actual',
+                        'cost_ratio': 'Actual/Estimate',
+                        'distance': 'Distance'
+                    }).round(2),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
         # Clear data option (dangerous!)
         st.divider()
         st.subheader("⚠️ Danger Zone")
@@ -449,9 +553,71 @@ def admin_panel():
                             if key != 'export_date':
                                 st.session_state[key] = value
                         
-                        st.success("Settings imported successfully!")
+                        # Persist so running workers pick up the imported pricing
+                        snapshot = settings_store.save({
+                            key: value for key, value in settings_data.items()
+                            if key in SETTINGS_SECTIONS
+                        }, saved_by='admin_import')
+                        
+                        if snapshot:
+                            st.success("Settings imported successfully!")
                     except Exception as e:
                         st.error(f"Error importing settings: {str(e)}")
+        
+        st.divider()
+        
+        st.subheader("Database Connection Pool")
+        
+        pool_metrics = get_database_manager().get_pool_metrics()
+        
+        if pool_metrics:
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Connections In Use", f"{pool_metrics['checked_out']} / {pool_metrics['pool_size']}",
+                          delta=f"+{pool_metrics['overflow']} overflow" if pool_metrics['overflow'] else None)
+            
+            with col2:
+                st.metric("Checkouts", f"{pool_metrics['checkouts']:,}")
+            
+            with col3:
+                st.metric("Avg / Max Wait", f"{pool_metrics['avg_wait_ms']:.1f} / {pool_metrics['max_wait_ms']:.1f} ms")
+            
+            with col4:
+                st.metric("Checkout Timeouts", pool_metrics['timeouts'])
+        else:
+            st.info("No database configured - using session storage.")
+
+        st.divider()
+        
+        st.subheader("Drawing Analysis Cache")
+        
+        analysis_cache = get_analysis_cache()
+        
+        if analysis_cache:
+            cache_stats = analysis_cache.stats()
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Cached Analyses", f"{cache_stats['entries']:,}",
+                          delta=f"{cache_stats['size_bytes'] / 1024 / 1024:.1f} / "
+                                f"{cache_stats['max_bytes'] / 1024 / 1024:.0f} MB", delta_color="off")
+            
+            with col2:
+                st.metric("Cache Hits", f"{cache_stats['hits']:,}",
+                          delta=f"{cache_stats['hit_rate']:.0%} hit rate", delta_color="off")
+            
+            with col3:
+                st.metric("Cache Misses", f"{cache_stats['misses']:,}")
+            
+            with col4:
+                st.metric("Evictions", f"{cache_stats['evictions']:,}")
+            
+            if st.button("Clear Analysis Cache"):
+                analysis_cache.clear()
+                st.success("Analysis cache cleared")
+        else:
+            st.info("Analysis cache unavailable.")
 
 # Main execution
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+"""
+Tests for the async read layer
+Run against a disposable local Postgres named in DATABASE_URL; skipped when it is not set
+"""
+
+import os
+import uuid
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+pytestmark = pytest.mark.skipif(not os.environ.get('DATABASE_URL'), reason="DATABASE_URL is not set")
+
+# Unique per run so the tests only see, and clean up, their own rows
+RUN_ID = uuid.uuid4().hex[:8]
+CONTAINER_TYPE = f"test-{RUN_ID}"
+USE_CASE = 'Office Space'
+USER_ID = f"test-user-{RUN_ID}"
+DATA_TYPE = f"test_price_{RUN_ID}"
+MATERIAL = f"test_steel_{RUN_ID}"
+
+
+@pytest.fixture(scope='module')
+def sync_db():
+    from utils.database import DatabaseManager
+
+    db = DatabaseManager()
+    assert db.engine is not None and db.schema_ready, "DATABASE_URL does not point at a usable Postgres"
+
+    today = date.today()
+    db.insert_historical_data([
+        {'project_date': today - timedelta(days=30 * months), 'container_type': CONTAINER_TYPE,
+         'use_case': USE_CASE, 'location': 'Gdańsk', 'actual_cost': 20000 + 1000 * months,
+         'estimated_cost': 19000 + 1000 * months, 'materials_cost': 9000, 'labor_cost': 4000,
+         'project_duration_days': 30}
+        for months in range(6)
+    ])
+    db.save_user_project(USER_ID, 'Test project', {'container_type': '20ft Standard'}, {'total_cost': 1000})
+    with db.engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO market_data (data_type, value, unit, region, data_date, source)
+            VALUES (:data_type, :value, 'EUR/t', 'PL', :data_date, 'test')
+        """), [{'data_type': DATA_TYPE, 'value': 800 + day, 'data_date': today - timedelta(days=day)}
+               for day in range(0, 120, 3)])
+        conn.execute(text("""
+            INSERT INTO material_prices (material_name, price_per_unit, unit, price_date)
+            VALUES (:name, :price, 'kg', :price_date)
+        """), [{'name': MATERIAL, 'price': price, 'price_date': today - timedelta(days=days)}
+               for price, days in ((1.10, 60), (1.25, 1))])
+
+    yield db
+
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM historical_projects WHERE container_type = :t"), {'t': CONTAINER_TYPE})
+        conn.execute(text("DELETE FROM historical_rollups WHERE container_type = :t"), {'t': CONTAINER_TYPE})
+        conn.execute(text("DELETE FROM user_projects WHERE user_id = :u"), {'u': USER_ID})
+        conn.execute(text("DELETE FROM market_data WHERE data_type = :d"), {'d': DATA_TYPE})
+        conn.execute(text("DELETE FROM material_prices WHERE material_name = :m"), {'m': MATERIAL})
+
+
+@pytest.fixture(scope='module')
+def async_db(sync_db):
+    from utils.async_database import AsyncDatabaseManager
+
+    db = AsyncDatabaseManager()
+    yield db
+    db.dispose()
+
+
+def test_run_concurrently_matches_sync_reads(sync_db, async_db):
+    results = async_db.run_concurrently(
+        pricing=async_db.get_historical_pricing_data(CONTAINER_TYPE, USE_CASE),
+        materials=async_db.get_current_material_prices(),
+        projects=async_db.get_user_projects(USER_ID),
+        trends=async_db.get_market_trends(DATA_TYPE),
+        series=async_db.get_market_trend_series(DATA_TYPE, months_back=3, resolution='week')
+    )
+
+    assert results['pricing'] == sync_db.get_historical_pricing_data(CONTAINER_TYPE, USE_CASE)
+    assert results['pricing']['project_count'] == 6
+    assert results['materials'] == sync_db.get_current_material_prices()
+    assert results['materials'][MATERIAL] == pytest.approx(1.25)
+    assert results['projects'] == sync_db.get_user_projects(USER_ID)
+    assert len(results['projects']) == 1
+    assert results['trends'] == sync_db.get_market_trends(DATA_TYPE)
+    # Series are columnar numpy arrays
+    series = sync_db.get_market_trend_series(DATA_TYPE, months_back=3, resolution='week')
+    np.testing.assert_equal(results['series'], series)
+    assert len(series['avg']) > 1
+
+
+def test_fetch_many_matches_sync_queries(sync_db, async_db):
+    queries = {
+        'projects': ("SELECT project_name FROM user_projects WHERE user_id = :u", {'u': USER_ID}),
+        'market': ("SELECT data_date, value FROM market_data WHERE data_type = :d ORDER BY data_date",
+                   {'d': DATA_TYPE}),
+        # Query names are free-form, including the name of the timeout argument
+        'timeout': ("SELECT COUNT(*) FROM material_prices WHERE material_name = :m", {'m': MATERIAL})
+    }
+
+    results = async_db.fetch_many(queries, timeout=30)
+
+    with sync_db.engine.connect() as conn:
+        for name, (query, params) in queries.items():
+            expected = conn.execute(text(query), params).fetchall()
+            assert [tuple(row) for row in results[name]] == [tuple(row) for row in expected]
+
+
+def test_failed_query_comes_back_as_none(async_db):
+    results = async_db.fetch_many({
+        'broken': ("SELECT * FROM no_such_table", {}),
+        'working': ("SELECT 1", {})
+    })
+
+    assert results['broken'] is None
+    assert [tuple(row) for row in results['working']] == [(1,)]
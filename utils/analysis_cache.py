@@ -0,0 +1,190 @@
+"""
+Analysis Result Cache for KAN-BUD Container Calculator
+Drawing analysis results keyed by file content hash, kept in a size-bounded local SQLite store
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import streamlit as st
+
+from utils.local_paths import data_path
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    cache_key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    last_used_at TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache(last_used_at);
+
+CREATE TABLE IF NOT EXISTS analysis_cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+STAT_NAMES = ('hits', 'misses', 'stores', 'evictions')
+
+# Upper bound on the stored result JSON; least recently used entries go first
+DEFAULT_MAX_BYTES = int(float(os.environ.get('KANBUD_ANALYSIS_CACHE_MB', '64')) * 1024 * 1024)
+
+# The only project context fields passed into an analysis prompt; the file name and other
+# fields (e.g. project name) are left out so they cannot change a cached result
+CONTEXT_FIELDS = ('container_type', 'use_case', 'location')
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def content_hash(file_obj, chunk_size: int = HASH_CHUNK_BYTES) -> str:
+    """SHA-256 of a seekable file object's content, without copying it whole"""
+    digest = hashlib.sha256()
+    if hasattr(file_obj, 'getbuffer'):
+        # In-memory uploads (BytesIO) are hashed straight from their buffer
+        with file_obj.getbuffer() as view:
+            digest.update(view)
+    else:
+        file_obj.seek(0)
+        for chunk in iter(lambda: file_obj.read(chunk_size), b''):
+            digest.update(chunk)
+        file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def prompt_context(project_context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The part of the project context an analysis may depend on"""
+    context = project_context or {}
+    return {field: context[field] for field in CONTEXT_FIELDS if context.get(field)}
+
+
+def context_fingerprint(project_context: Optional[Dict[str, Any]], prompt_version: int) -> str:
+    context = prompt_context(project_context)
+    payload = json.dumps({
+        'prompt_version': prompt_version,
+        'context': {field: str(context.get(field) or '').strip().lower() for field in CONTEXT_FIELDS}
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def analysis_cache_key(file_hash: str, project_context: Optional[Dict[str, Any]], prompt_version: int) -> str:
+    """Cache key of one file analyzed under one project context and prompt version"""
+    return f"{file_hash}:{context_fingerprint(project_context, prompt_version)}"
+
+
+class AnalysisCache:
+    """
+    Persistent cache of drawing analysis results
+
+    Shared through one SQLite file by the app and the analysis worker
+    processes. Entries are evicted least recently used first once the
+    stored results exceed ``max_bytes``; hit, miss, store and eviction
+    counters are kept in the same file so every process reports into them.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path or os.environ.get('KANBUD_ANALYSIS_CACHE_PATH') or data_path('analysis_cache.db')
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA_SQL)
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO analysis_cache_stats (name, value) VALUES (?, 0)",
+                             [(name,) for name in STAT_NAMES])
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread and process; forked analysis workers open their own"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, name: str, amount: int = 1):
+        conn.execute("UPDATE analysis_cache_stats SET value = value + ? WHERE name = ?", (amount, name))
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """The cached result, or None; counts a hit or a miss"""
+        conn = self._connection()
+        with conn:
+            row = conn.execute("SELECT result FROM analysis_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None:
+                self._count(conn, 'misses')
+                return None
+            conn.execute(
+                "UPDATE analysis_cache SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+                (datetime.now().isoformat(), cache_key)
+            )
+            self._count(conn, 'hits')
+        return json.loads(row['result'])
+
+    def put(self, cache_key: str, result: Dict[str, Any]):
+        """Store a result, then evict the least recently used entries beyond the size bound"""
+        payload = json.dumps(result, default=str)
+        now = datetime.now().isoformat()
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO analysis_cache (cache_key, result, size_bytes, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (cache_key, payload, len(payload), now, now))
+            self._count(conn, 'stores')
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM analysis_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        evicted = []
+        for row in conn.execute("SELECT cache_key, size_bytes FROM analysis_cache ORDER BY last_used_at"):
+            evicted.append((row['cache_key'],))
+            excess -= row['size_bytes']
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM analysis_cache WHERE cache_key = ?", evicted)
+        self._count(conn, 'evictions', len(evicted))
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM analysis_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connection()
+        counters = {row['name']: row['value'] for row in conn.execute("SELECT name, value FROM analysis_cache_stats")}
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_cache"
+        ).fetchone()
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {
+            **{name: counters.get(name, 0) for name in STAT_NAMES},
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'hit_rate': counters.get('hits', 0) / lookups if lookups else 0.0
+        }
+
+
+@st.cache_resource
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Process-wide analysis cache (None if the store cannot be opened)"""
+    try:
+        return AnalysisCache()
+    except Exception:
+        return None
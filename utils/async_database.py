@@ -0,0 +1,198 @@
+"""
+Async Database Access for KAN-BUD Container Calculator
+Runs independent read queries concurrently so a page waits for the slowest one, not the sum
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple, Awaitable
+
+import streamlit as st
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from utils.database import (
+    HISTORICAL_PRICING_SQL,
+    CURRENT_MATERIAL_PRICES_SQL,
+    USER_PROJECTS_SQL,
+    MARKET_TRENDS_SQL,
+    MARKET_TREND_SERIES_SQL,
+    MAX_CHART_POINTS,
+    market_resolution,
+    market_series_from_rows,
+    historical_pricing_from_row,
+    user_project_from_row,
+    market_trend_from_row
+)
+from utils.db_engine import normalize_database_url
+
+
+class _EventLoopThread:
+    """
+    A private event loop running in a daemon thread
+
+    Streamlit scripts run in plain threads without a loop, and asyncpg
+    connections are bound to the loop that opened them, so every async query
+    in the process runs on this one long-lived loop.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='kanbud-async-db', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coroutine: Awaitable, timeout: Optional[float] = None) -> Any:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+
+def to_async_url(database_url: str) -> Tuple[str, Dict[str, Any]]:
+    """Convert a sync Postgres URL to asyncpg, moving sslmode into connect args"""
+    url = make_url(normalize_database_url(database_url)).set(drivername='postgresql+asyncpg')
+
+    connect_args = {}
+    query = dict(url.query)
+    sslmode = query.pop('sslmode', None)
+    if sslmode and sslmode != 'disable':
+        connect_args['ssl'] = sslmode
+    return url.set(query=query).render_as_string(hide_password=False), connect_args
+
+
+class AsyncDatabaseManager:
+    """Async counterpart of DatabaseManager's read queries"""
+
+    def __init__(self, database_url: str = None):
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        self.database_url = database_url or os.environ.get('DATABASE_URL')
+        if not self.database_url:
+            raise ValueError("DATABASE_URL is not set")
+
+        async_url, connect_args = to_async_url(self.database_url)
+        connect_args['server_settings'] = {
+            'statement_timeout': os.environ.get('DB_STATEMENT_TIMEOUT_MS', '15000')
+        }
+
+        self._loop_thread = _EventLoopThread()
+        self.engine = create_async_engine(
+            async_url,
+            pool_size=int(os.environ.get('DB_ASYNC_POOL_SIZE', '10')),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+            pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+            pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT', '30')),
+            pool_pre_ping=True,
+            connect_args=connect_args
+        )
+
+    async def fetch_all(self, query: str, params: Dict[str, Any] = None) -> List[Any]:
+        """Run a read query on its own pooled connection"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(text(query), params or {})
+            return result.fetchall()
+
+    async def fetch_one(self, query: str, params: Dict[str, Any] = None) -> Any:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(text(query), params or {})
+            return result.fetchone()
+
+    async def get_historical_pricing_data(self, container_type: str, use_case: str,
+                                          months_back: int = 24) -> Dict[str, Any]:
+        cutoff_date = (datetime.now() - timedelta(days=months_back * 30)).date()
+        row = await self.fetch_one(HISTORICAL_PRICING_SQL, {
+            'container_type': container_type,
+            'use_case': use_case,
+            'cutoff_date': cutoff_date
+        })
+        return historical_pricing_from_row(row)
+
+    async def get_current_material_prices(self) -> Dict[str, float]:
+        rows = await self.fetch_all(CURRENT_MATERIAL_PRICES_SQL)
+        return {row[0]: float(row[1]) for row in rows}
+
+    async def get_user_projects(self, user_id: str) -> List[Dict[str, Any]]:
+        rows = await self.fetch_all(USER_PROJECTS_SQL, {'user_id': user_id})
+        return [user_project_from_row(row) for row in rows]
+
+    async def get_market_trends(self, data_type: str, months_back: int = 12) -> List[Dict[str, Any]]:
+        cutoff_date = (datetime.now() - timedelta(days=months_back * 30)).date()
+        rows = await self.fetch_all(MARKET_TRENDS_SQL, {
+            'data_type': data_type,
+            'cutoff_date': cutoff_date
+        })
+        return [market_trend_from_row(row) for row in rows]
+
+    async def get_market_trend_series(self, data_type: str, months_back: int = 12, resolution: str = 'auto',
+                                      region: str = None, max_points: int = MAX_CHART_POINTS) -> Dict[str, Any]:
+        resolution = market_resolution(months_back, resolution, max_points)
+        cutoff_date = (datetime.now() - timedelta(days=months_back * 30)).date()
+        rows = await self.fetch_all(MARKET_TREND_SERIES_SQL, {
+            'resolution': resolution,
+            'data_type': data_type,
+            'cutoff_date': cutoff_date,
+            'region': region,
+            'max_points': max_points + 1
+        })
+        return market_series_from_rows(rows, resolution, max_points)
+    
+    async def count_rows(self, table: str) -> int:
+        row = await self.fetch_one(f"SELECT COUNT(*) FROM {table}")
+        return int(row[0]) if row else 0
+
+    async def gather(self, coroutines: Dict[str, Awaitable]) -> Dict[str, Any]:
+        """Await named coroutines concurrently; a failed query yields its exception"""
+        names = list(coroutines)
+        results = await asyncio.gather(*coroutines.values(), return_exceptions=True)
+        return dict(zip(names, results))
+
+    def run_concurrently(self, *, timeout: Optional[float] = 60, **coroutines: Awaitable) -> Dict[str, Any]:
+        """
+        Run independent queries concurrently from a page script and wait for all of them
+
+        Example:
+            results = db.run_concurrently(
+                pricing=db.get_historical_pricing_data('40ft High Cube', 'Office Space'),
+                projects=db.get_user_projects(user_id),
+                trends=db.get_market_trends('steel_price')
+            )
+
+        A query that failed comes back as None and is reported to employees.
+        """
+        return self._run_named(coroutines, timeout)
+
+    def fetch_many(self, queries: Dict[str, Tuple[str, Dict[str, Any]]], *,
+                   timeout: Optional[float] = 60) -> Dict[str, Optional[List[Any]]]:
+        """Run raw (query, params) pairs concurrently, keyed by name"""
+        return self._run_named({
+            name: self.fetch_all(query, params) for name, (query, params) in queries.items()
+        }, timeout)
+
+    def _run_named(self, coroutines: Dict[str, Awaitable], timeout: Optional[float]) -> Dict[str, Any]:
+        # Names are passed as a dict so any query name, "timeout" included, is allowed
+        results = self._loop_thread.run(self.gather(coroutines), timeout)
+
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                if st.session_state.get('employee_logged_in', False):
+                    st.error(f"Failed to load {name.replace('_', ' ')}: {str(result)}")
+                results[name] = None
+        return results
+
+    def dispose(self):
+        """Close the pooled asyncpg connections"""
+        self._loop_thread.run(self.engine.dispose())
+
+
+@st.cache_resource
+def get_async_database_manager() -> Optional[AsyncDatabaseManager]:
+    """Process-wide async database access, or None without Postgres/asyncpg"""
+    if not os.environ.get('DATABASE_URL'):
+        return None
+    try:
+        return AsyncDatabaseManager()
+    except Exception:
+        return None
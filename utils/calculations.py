@@ -9,6 +9,11 @@ from typing import Dict, List, Any, Tuple
 import pandas as pd
 from datetime import datetime
 
+from utils.pricing_rules import (
+    BUILT_IN_PROFIT_RATE, operating_rate, hourly_operating_cost,
+    margin_rate, volume_discount_rate, seasonal_rate
+)
+
 # Cache lookup tables - Enhanced with all container types
 BASE_COSTS = {
     "10ft Compact": 2000,
@@ -33,6 +38,43 @@ USE_CASE_MULTIPLIERS = {
     'Laboratory': 3.0
 }
 
+# Polish market labor rates in EUR/hour; labor rates saved in the Admin Panel replace them
+LABOR_RATES = {
+    'basic_worker': 12,
+    'skilled_worker': 15,
+    'specialist': 18
+}
+
+# Admin Panel margin category of each priced item in calculate_container_cost;
+# unlisted items keep the built-in profit margin
+MARGIN_CATEGORIES = {
+    'container_base': ('material_margins', 'steel_structural'),
+    'construction_material': ('material_margins', 'steel_structural'),
+    'environment': ('material_margins', 'steel_structural'),
+    'climate_zone': ('material_margins', 'insulation'),
+    'insulation': ('material_margins', 'insulation'),
+    'lighting': ('material_margins', 'electrical'),
+    'electrical_system': ('material_margins', 'electrical'),
+    'security_systems': ('material_margins', 'electrical'),
+    'fire_systems': ('material_margins', 'electrical'),
+    'plumbing_system': ('material_margins', 'plumbing'),
+    'windows': ('material_margins', 'windows_doors'),
+    'additional_openings': ('material_margins', 'windows_doors'),
+    'finish_level': ('material_margins', 'finishes'),
+    'flooring': ('material_margins', 'finishes'),
+    'exterior_cladding': ('material_margins', 'finishes'),
+    'paint_finish': ('material_margins', 'finishes'),
+    'labor': ('service_margins', 'basic_modification'),
+    'installation': ('service_margins', 'basic_modification'),
+    'roof_modifications': ('service_margins', 'complex_structural'),
+    'accessibility': ('service_margins', 'complex_structural'),
+    'ventilation': ('service_margins', 'hvac_systems'),
+    'hvac_system': ('service_margins', 'hvac_systems'),
+    'it_systems': ('service_margins', 'electrical_systems'),
+    'interior_layout': ('service_margins', 'custom_design'),
+    'transport_type': ('service_margins', 'project_management')
+}
+
 FINISH_COSTS = {
     'Basic': 0,
     'Standard': 3000,
@@ -40,8 +82,14 @@ FINISH_COSTS = {
     'Luxury': 15000
 }
 
-def calculate_container_cost(config):
-    """Calculate container cost based on configuration - comprehensive pricing"""
+def calculate_container_cost(config, pricing=None, on_date=None):
+    """Calculate container cost based on configuration - comprehensive pricing
+
+    ``pricing`` is an optional PricingSettingsSnapshot; every section saved in
+    the Admin Panel (labor rates, operating costs, margins, volume discounts
+    and seasonal adjustments) replaces the matching built-in pricing.
+    ``on_date`` picks the season and defaults to today.
+    """
     
     # Enhanced base costs
     enhanced_base_costs = {
@@ -59,8 +107,8 @@ def calculate_container_cost(config):
     base_cost = enhanced_base_costs.get(config.get('container_type', '20ft Standard'), 8000)
     multiplier = USE_CASE_MULTIPLIERS.get(config.get('main_purpose', 'Storage'), 1.0)
 
-    # Calculate modifications cost efficiently
-    modifications_cost = 0
+    # Modification costs by configuration field, so each can carry its own margin
+    item_costs = {}
 
     # Construction material costs
     construction_material_costs = {
@@ -72,7 +120,7 @@ def calculate_container_cost(config):
     if any(key in construction_material.lower() for key in construction_material_costs.keys()):
         for key, cost in construction_material_costs.items():
             if key in construction_material.lower():
-                modifications_cost += cost
+                item_costs['construction_material'] = cost
                 break
 
     # Environment costs
@@ -88,7 +136,7 @@ def calculate_container_cost(config):
     environment = config.get('environment', '').lower()
     for key, cost in environment_costs.items():
         if key in environment.lower():
-            modifications_cost += cost
+            item_costs['environment'] = cost
             break
 
     # Finish level costs
@@ -103,7 +151,7 @@ def calculate_container_cost(config):
     finish_level = config.get('finish_level', '').lower()
     for key, cost in finish_level_costs.items():
         if key in finish_level.lower():
-            modifications_cost += cost
+            item_costs['finish_level'] = cost
             break
 
     # Flooring costs
@@ -121,7 +169,7 @@ def calculate_container_cost(config):
     flooring = config.get('flooring', '').lower()
     for key, cost in flooring_costs.items():
         if key in flooring.lower():
-            modifications_cost += cost
+            item_costs['flooring'] = cost
             break
 
     # Climate zone adjustments
@@ -137,7 +185,7 @@ def calculate_container_cost(config):
     climate_zone = config.get('climate_zone', '').lower()
     for key, cost in climate_zone_costs.items():
         if key in climate_zone.lower():
-            modifications_cost += cost
+            item_costs['climate_zone'] = cost
             break
 
     # Insulation costs based on level
@@ -150,7 +198,7 @@ def calculate_container_cost(config):
     insulation = config.get('insulation', '').lower()
     for key, cost in insulation_costs.items():
         if key in insulation.lower():
-            modifications_cost += cost
+            item_costs['insulation'] = cost
             break
 
     # Windows costs - enhanced
@@ -190,7 +238,7 @@ def calculate_container_cost(config):
                 total_window_cost += cost
                 break
     
-    modifications_cost += num_windows * (total_window_cost if total_window_cost > 0 else 600)
+    item_costs['windows'] = num_windows * (total_window_cost if total_window_cost > 0 else 600)
 
     # Lighting system costs
     lighting_costs = {
@@ -204,7 +252,7 @@ def calculate_container_cost(config):
     lighting = config.get('lighting', '').lower()
     for key, cost in lighting_costs.items():
         if key in lighting.lower():
-            modifications_cost += cost
+            item_costs['lighting'] = cost
             break
 
     # Ventilation system costs
@@ -221,7 +269,7 @@ def calculate_container_cost(config):
     ventilation = config.get('ventilation', '').lower()
     for key, cost in ventilation_costs.items():
         if key in ventilation.lower():
-            modifications_cost += cost
+            item_costs['ventilation'] = cost
             break
 
     # Roof modifications costs
@@ -239,7 +287,7 @@ def calculate_container_cost(config):
     roof_mods = config.get('roof_modifications', '').lower()
     for key, cost in roof_mod_costs.items():
         if key in roof_mods.lower():
-            modifications_cost += cost
+            item_costs['roof_modifications'] = cost
             break
 
     # Electrical system costs
@@ -256,7 +304,7 @@ def calculate_container_cost(config):
     electrical = config.get('electrical_system', '').lower()
     for key, cost in electrical_costs.items():
         if key in electrical.lower():
-            modifications_cost += cost
+            item_costs['electrical_system'] = cost
             break
 
     # Plumbing system costs
@@ -274,7 +322,7 @@ def calculate_container_cost(config):
     plumbing = config.get('plumbing_system', '').lower()
     for key, cost in plumbing_costs.items():
         if key in plumbing.lower():
-            modifications_cost += cost
+            item_costs['plumbing_system'] = cost
             break
 
     # HVAC system costs
@@ -292,7 +340,7 @@ def calculate_container_cost(config):
     hvac = config.get('hvac_system', '').lower()
     for key, cost in hvac_costs.items():
         if key in hvac.lower():
-            modifications_cost += cost
+            item_costs['hvac_system'] = cost
             break
 
     # Interior layout costs
@@ -306,7 +354,7 @@ def calculate_container_cost(config):
     interior_layout = config.get('interior_layout', '').lower()
     for key, cost in interior_layout_costs.items():
         if key in interior_layout.lower():
-            modifications_cost += cost
+            item_costs['interior_layout'] = cost
             break
 
     # Security systems costs
@@ -322,7 +370,7 @@ def calculate_container_cost(config):
     security = config.get('security_systems', '').lower()
     for key, cost in security_costs.items():
         if key in security.lower():
-            modifications_cost += cost
+            item_costs['security_systems'] = cost
             break
 
     # Exterior cladding costs
@@ -340,7 +388,7 @@ def calculate_container_cost(config):
     cladding = config.get('exterior_cladding', '').lower()
     for key, cost in cladding_costs.items():
         if key in cladding.lower():
-            modifications_cost += cost
+            item_costs['exterior_cladding'] = cost
             break
 
     # Additional openings costs
@@ -357,7 +405,7 @@ def calculate_container_cost(config):
     additional_openings = config.get('additional_openings', '').lower()
     for key, cost in additional_openings_costs.items():
         if key in additional_openings.lower():
-            modifications_cost += cost
+            item_costs['additional_openings'] = cost
             break
 
     # Fire safety systems costs
@@ -371,7 +419,7 @@ def calculate_container_cost(config):
     fire_systems = config.get('fire_systems', '').lower()
     for key, cost in fire_safety_costs.items():
         if key in fire_systems.lower():
-            modifications_cost += cost
+            item_costs['fire_systems'] = cost
             break
 
     # Accessibility costs
@@ -384,7 +432,7 @@ def calculate_container_cost(config):
     accessibility = config.get('accessibility', '').lower()
     for key, cost in accessibility_costs.items():
         if key in accessibility.lower():
-            modifications_cost += cost
+            item_costs['accessibility'] = cost
             break
 
     # Paint and finish costs
@@ -398,7 +446,7 @@ def calculate_container_cost(config):
     paint_finish = config.get('paint_finish', '').lower()
     for key, cost in paint_costs.items():
         if key in paint_finish.lower():
-            modifications_cost += cost
+            item_costs['paint_finish'] = cost
             break
 
     # Transport type costs
@@ -411,7 +459,7 @@ def calculate_container_cost(config):
     transport_type = config.get('transport_type', '').lower()
     for key, cost in transport_costs.items():
         if key in transport_type.lower():
-            modifications_cost += cost
+            item_costs['transport_type'] = cost
             break
 
     # Installation costs
@@ -424,7 +472,7 @@ def calculate_container_cost(config):
     installation = config.get('installation', '').lower()
     for key, cost in installation_costs.items():
         if key in installation.lower():
-            modifications_cost += cost
+            item_costs['installation'] = cost
             break
 
     # Equipment costs
@@ -437,7 +485,7 @@ def calculate_container_cost(config):
     office_equipment = config.get('office_equipment', '').lower()
     for key, cost in office_equipment_costs.items():
         if key in office_equipment.lower():
-            modifications_cost += cost
+            item_costs['office_equipment'] = cost
             break
 
     appliances_costs = {
@@ -449,7 +497,7 @@ def calculate_container_cost(config):
     appliances = config.get('appliances', '').lower()
     for key, cost in appliances_costs.items():
         if key in appliances.lower():
-            modifications_cost += cost
+            item_costs['appliances'] = cost
             break
 
     it_systems_costs = {
@@ -461,18 +509,19 @@ def calculate_container_cost(config):
     it_systems = config.get('it_systems', '').lower()
     for key, cost in it_systems_costs.items():
         if key in it_systems.lower():
-            modifications_cost += cost
+            item_costs['it_systems'] = cost
             break
 
     # Calculate delivery costs based on delivery zone
     delivery_cost = calculate_delivery_cost(config.get('delivery_zone', 'Local'), config.get('container_type', '20ft Standard'))
 
     # Calculate material costs (base + modifications)
+    modifications_cost = sum(item_costs.values())
     material_cost = base_cost + modifications_cost
     
     # Calculate labor cost (varies by complexity)
     labor_hours = calculate_labor_hours(config)
-    labor_cost = calculate_labor_cost(labor_hours)
+    labor_cost = calculate_labor_cost(labor_hours, pricing.section('labor_rates') if pricing else None)
     
     # Calculate subtotal (materials + labor)
     subtotal_materials_labor = material_cost + labor_cost
@@ -480,17 +529,31 @@ def calculate_container_cost(config):
     # Apply use case complexity multiplier
     subtotal_with_multiplier = subtotal_materials_labor * multiplier
     
-    # Add operating costs (45% markup on materials + labor as per company policy)
-    operating_costs = subtotal_with_multiplier * 0.45
+    # Add operating costs: overhead markup on materials + labor (45% as per company policy
+    # until saved in the Admin Panel) plus workshop and equipment time
+    overhead_rate = operating_rate(pricing)
+    hourly_costs = labor_hours * hourly_operating_cost(pricing)
+    operating_costs = subtotal_with_multiplier * overhead_rate + hourly_costs
     
-    # Add profit margin (additional 20% on total before delivery)
-    profit_margin = (subtotal_with_multiplier + operating_costs) * 0.20
+    # Add profit margin on each cost after markups (20% until category margins are saved)
+    item_costs['container_base'] = base_cost
+    item_costs['labor'] = labor_cost
+    markup = multiplier * (1 + overhead_rate)
+    profit_margin = hourly_costs * BUILT_IN_PROFIT_RATE + sum(
+        cost * markup * margin_rate(pricing, *MARGIN_CATEGORIES.get(item, (None, None)))
+        for item, cost in item_costs.items()
+    )
     
     # Calculate subtotal before delivery
     subtotal_before_delivery = subtotal_with_multiplier + operating_costs + profit_margin
     
+    # Seasonal surcharge or discount, then the volume discount for the project's value tier
+    seasonal_adjustment = subtotal_before_delivery * seasonal_rate(pricing, on_date)
+    adjusted_subtotal = subtotal_before_delivery + seasonal_adjustment
+    volume_discount = adjusted_subtotal * volume_discount_rate(pricing, adjusted_subtotal)
+    
     # Add delivery cost
-    total_cost = subtotal_before_delivery + delivery_cost
+    total_cost = adjusted_subtotal - volume_discount + delivery_cost
 
     return {
         'base_cost': base_cost,
@@ -504,6 +567,8 @@ def calculate_container_cost(config):
         'operating_costs': operating_costs,
         'profit_margin': profit_margin,
         'subtotal_before_delivery': subtotal_before_delivery,
+        'seasonal_adjustment': seasonal_adjustment,
+        'volume_discount': volume_discount,
         'delivery_cost': delivery_cost,
         'total_cost': total_cost
     }
@@ -625,15 +690,21 @@ def calculate_labor_hours(config):
     
     return base_hours + modification_hours
 
-def calculate_labor_cost(total_hours):
+def calculate_labor_cost(total_hours, labor_rates=None):
     """Calculate labor cost with mixed skill rates and profit margin"""
     
-    # Labor rate distribution (Polish market rates in EUR/hour)
-    basic_hours = total_hours * 0.4      # 40% basic work at €12/hour
-    skilled_hours = total_hours * 0.4    # 40% skilled work at €15/hour  
-    specialist_hours = total_hours * 0.2 # 20% specialist work at €18/hour
+    rates = dict(LABOR_RATES)
+    if labor_rates:
+        rates.update({role: rate for role, rate in labor_rates.items() if role in rates})
     
-    labor_cost = (basic_hours * 12 + skilled_hours * 15 + specialist_hours * 18)
+    # Labor rate distribution
+    basic_hours = total_hours * 0.4      # 40% basic work
+    skilled_hours = total_hours * 0.4    # 40% skilled work
+    specialist_hours = total_hours * 0.2 # 20% specialist work
+    
+    labor_cost = (basic_hours * rates['basic_worker'] +
+                  skilled_hours * rates['skilled_worker'] +
+                  specialist_hours * rates['specialist'])
     
     # Add 17% profit margin on labor as per company policy
     labor_cost_with_profit = labor_cost * 1.17
@@ -723,7 +794,7 @@ class StructuralCalculations:
             "tax_rate": 0.00,               # No VAT for B2B sales (23% VAT applies only for B2C)
         }
 
-    def calculate_base_costs(self, config: Dict[str, Any]) -> Dict[str, Any]:
+    def calculate_base_costs(self, config: Dict[str, Any], pricing=None) -> Dict[str, Any]:
         """Calculate base costs for container modifications"""
 
         base_type = config.get('base_type', '40ft Standard')
@@ -853,9 +924,14 @@ class StructuralCalculations:
         skilled_hours = total_hours * 0.4    # 40% skilled work  
         specialist_hours = total_hours * 0.2 # 20% specialist work
 
-        labor_cost = (basic_hours * self.base_rates["labor_rates"]["basic_worker"] + 
-                     skilled_hours * self.base_rates["labor_rates"]["skilled_worker"] + 
-                     specialist_hours * self.base_rates["labor_rates"]["specialist"])
+        labor_rates = dict(self.base_rates["labor_rates"])
+        if pricing:
+            labor_rates.update({role: rate for role, rate in pricing.section('labor_rates').items()
+                                if role in labor_rates})
+
+        labor_cost = (basic_hours * labor_rates["basic_worker"] + 
+                     skilled_hours * labor_rates["skilled_worker"] + 
+                     specialist_hours * labor_rates["specialist"])
 
         # Add 17% profit margin on labor
         labor_cost_with_profit = labor_cost * (1 + self.base_rates["labor_profit_margin"])
@@ -863,8 +939,11 @@ class StructuralCalculations:
         # Calculate subtotal before permanent costs
         subtotal_before_permanent = base_cost + modification_costs + labor_cost_with_profit
 
-        # Apply 45% permanent costs markup on parts + labor
-        permanent_costs = subtotal_before_permanent * self.base_rates["permanent_costs_markup"]
+        # Apply 45% permanent costs markup on parts + labor (or the saved overhead percentage)
+        # plus workshop and equipment time
+        permanent_rate = operating_rate(pricing, self.base_rates["permanent_costs_markup"])
+        permanent_costs = (subtotal_before_permanent * permanent_rate +
+                           total_hours * hourly_operating_cost(pricing))
 
         # Calculate subtotal
         subtotal = subtotal_before_permanent + permanent_costs
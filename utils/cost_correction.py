@@ -0,0 +1,306 @@
+"""
+Cost Correction Model for KAN-BUD Container Calculator
+Ridge regression of actual vs. estimated cost, trained offline and served from a small .npz artifact
+
+Training:
+    DATABASE_URL=postgresql://... python -m utils.cost_correction --output data/cost_correction_model.npz
+    python -m utils.cost_correction --csv historical.csv --output data/cost_correction_model.npz
+"""
+
+import argparse
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.calculations import BASE_COSTS, USE_CASE_MULTIPLIERS
+from utils.local_paths import data_path
+from utils.similar_projects import parse_modifications
+
+# Bump when the feature layout changes; artifacts of another format are not loaded
+FORMAT_VERSION = 1
+
+DEFAULT_ALPHA = 1.0
+
+# The predicted factor is kept inside the same bounds as the recommended range
+MIN_FACTOR = 0.5
+MAX_FACTOR = 2.0
+
+CONTAINER_TYPES = list(BASE_COSTS)
+USE_CASES = list(USE_CASE_MULTIPLIERS)
+
+# Container types offered elsewhere (bulk pricing, container database) and the base size they are priced as
+CONTAINER_TYPE_ALIASES = {
+    '20ft double door': '20ft Standard',
+    '40ft double door': '40ft Standard',
+    '40ft hc double door': '40ft High Cube'
+}
+
+# Historical modification keys and the configurator fields that correspond to them
+MODIFICATION_FEATURES = {
+    'windows': 'num_windows',
+    'electrical': 'electrical_system',
+    'plumbing': 'plumbing_system',
+    'hvac': 'hvac_system'
+}
+
+WINDOW_COUNTS = {'none': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'five_plus': 5}
+
+FEATURE_NAMES = (['intercept', 'log_estimate']
+                 + [f'type:{name}' for name in CONTAINER_TYPES]
+                 + [f'use:{name}' for name in USE_CASES]
+                 + [f'mod:{name}' for name in MODIFICATION_FEATURES])
+
+
+def default_model_path() -> str:
+    return os.environ.get('KANBUD_COST_MODEL_PATH') or data_path('cost_correction_model.npz')
+
+
+@lru_cache(maxsize=1)
+def _option_labels() -> Dict[str, Dict[str, str]]:
+    """Translated configurator labels mapped back to their option keys, for every language"""
+    from utils.translations import load_translations
+
+    labels = {'windows': {}, 'electrical_system': {}, 'plumbing_system': {}, 'hvac_system': {}}
+    for translation_data in load_translations().values():
+        for section in labels:
+            options = translation_data.get(section)
+            if isinstance(options, dict):
+                for key, label in options.items():
+                    if isinstance(label, str):
+                        labels[section][label.lower()] = key
+    return labels
+
+
+def _option_key(section: str, value: Any) -> str:
+    text = str(value or '').strip().lower()
+    return _option_labels()[section].get(text, text)
+
+
+def _window_count(value: Any) -> float:
+    # Bulk pricing passes a number from st.number_input; the configurator passes a translated label
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return float(WINDOW_COUNTS.get(_option_key('windows', value), 0))
+
+
+def _container_category(container_type: Any) -> str:
+    """Lower-cased CONTAINER_TYPES entry a container type is encoded as"""
+    name = str(container_type or '').strip().lower()
+    return CONTAINER_TYPE_ALIASES.get(name, name).lower()
+
+
+def config_modifications(config: Dict[str, Any]) -> Dict[str, float]:
+    """Configurator selections expressed as the historical modification counts"""
+    counts = {'windows': _window_count(config.get('num_windows', 'none'))}
+    for feature, field in MODIFICATION_FEATURES.items():
+        if feature == 'windows':
+            continue
+        option = _option_key(field, config.get(field, 'none'))
+        counts[feature] = 0.0 if option in ('', 'none') else 1.0
+    return counts
+
+
+def _one_hot(values: pd.Series, categories: List[str]) -> np.ndarray:
+    lowered = values.astype(str).str.strip().str.lower().to_numpy()[:, None]
+    return (lowered == np.array([name.lower() for name in categories], dtype=object)[None, :]).astype(float)
+
+
+def build_feature_matrix(container_types: pd.Series, use_cases: pd.Series,
+                         modifications: List[Dict[str, float]], estimates: np.ndarray) -> np.ndarray:
+    """Design matrix in FEATURE_NAMES order"""
+    estimates = np.asarray(estimates, dtype=float)
+    mods = np.array([[float(item.get(name, 0.0)) for name in MODIFICATION_FEATURES] for item in modifications],
+                    dtype=float).reshape(len(estimates), len(MODIFICATION_FEATURES))
+    return np.hstack([
+        np.ones((len(estimates), 1)),
+        np.log(np.clip(estimates, 1.0, None))[:, None],
+        _one_hot(pd.Series(container_types).map(_container_category), CONTAINER_TYPES),
+        _one_hot(pd.Series(use_cases), USE_CASES),
+        mods
+    ])
+
+
+_TYPE_COLUMNS = {name.lower(): 2 + i for i, name in enumerate(CONTAINER_TYPES)}
+_USE_COLUMNS = {name.lower(): 2 + len(CONTAINER_TYPES) + i for i, name in enumerate(USE_CASES)}
+_MOD_START = 2 + len(CONTAINER_TYPES) + len(USE_CASES)
+
+
+def feature_vector(container_type: str, use_case: str, modifications: Dict[str, float],
+                   estimate: float) -> np.ndarray:
+    """One row of the design matrix, without the pandas overhead of a batch"""
+    x = np.zeros(len(FEATURE_NAMES))
+    x[0] = 1.0
+    x[1] = np.log(max(float(estimate), 1.0))
+    type_column = _TYPE_COLUMNS.get(_container_category(container_type))
+    if type_column is not None:
+        x[type_column] = 1.0
+    use_column = _USE_COLUMNS.get(str(use_case or '').strip().lower())
+    if use_column is not None:
+        x[use_column] = 1.0
+    for i, name in enumerate(MODIFICATION_FEATURES):
+        x[_MOD_START + i] = float(modifications.get(name, 0.0))
+    return x
+
+
+class CostCorrectionModel:
+    """
+    log(actual / estimated) as a linear function of the estimate's inputs
+
+    The artifact stores the coefficient vector with its feature names and
+    training metadata; applying it is one dot product per estimate, or one
+    matrix product for a batch.
+    """
+
+    def __init__(self, coefficients: np.ndarray, feature_names: List[str] = None,
+                 trained_at: str = None, n_samples: int = 0, rmse: float = 0.0, alpha: float = DEFAULT_ALPHA):
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.feature_names = list(feature_names or FEATURE_NAMES)
+        self.trained_at = trained_at or datetime.now().isoformat(timespec='seconds')
+        self.n_samples = int(n_samples)
+        self.rmse = float(rmse)
+        self.alpha = float(alpha)
+
+    @classmethod
+    def fit(cls, frame: pd.DataFrame, alpha: float = DEFAULT_ALPHA) -> 'CostCorrectionModel':
+        """Ridge fit on historical rows with a positive estimate and actual cost"""
+        estimated = pd.to_numeric(frame['estimated_cost'], errors='coerce')
+        actual = pd.to_numeric(frame['actual_cost'], errors='coerce')
+        rows = frame[(estimated > 0) & (actual > 0)]
+        if len(rows) < len(FEATURE_NAMES):
+            raise ValueError(f"Need at least {len(FEATURE_NAMES)} projects with estimated and actual cost, "
+                             f"got {len(rows)}")
+
+        modifications = (rows['modifications'].map(parse_modifications).tolist()
+                         if 'modifications' in rows.columns else [{}] * len(rows))
+        estimates = pd.to_numeric(rows['estimated_cost']).to_numpy(dtype=float)
+        X = build_feature_matrix(rows['container_type'], rows['use_case'], modifications, estimates)
+        y = np.log(pd.to_numeric(rows['actual_cost']).to_numpy(dtype=float) / estimates)
+
+        penalty = alpha * np.eye(X.shape[1])
+        penalty[0, 0] = 0.0  # Leave the intercept unpenalized
+        coefficients = np.linalg.solve(X.T @ X + penalty, X.T @ y)
+
+        residuals = y - X @ coefficients
+        return cls(coefficients, FEATURE_NAMES, n_samples=len(rows),
+                   rmse=float(np.sqrt(np.mean(residuals ** 2))), alpha=alpha)
+
+    def save(self, path: str = None) -> str:
+        path = path or default_model_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                format_version=np.array(FORMAT_VERSION),
+                coefficients=self.coefficients,
+                feature_names=np.array(self.feature_names),
+                trained_at=np.array(self.trained_at),
+                n_samples=np.array(self.n_samples),
+                rmse=np.array(self.rmse),
+                alpha=np.array(self.alpha)
+            )
+        return path
+
+    @classmethod
+    def load(cls, path: str = None) -> Optional['CostCorrectionModel']:
+        """The saved model, or None when missing or built for another feature layout"""
+        path = path or default_model_path()
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path, allow_pickle=False) as artifact:
+            if int(artifact['format_version']) != FORMAT_VERSION:
+                return None
+            feature_names = [str(name) for name in artifact['feature_names']]
+            if feature_names != FEATURE_NAMES:
+                return None
+            return cls(
+                artifact['coefficients'],
+                feature_names,
+                trained_at=str(artifact['trained_at']),
+                n_samples=int(artifact['n_samples']),
+                rmse=float(artifact['rmse']),
+                alpha=float(artifact['alpha'])
+            )
+
+    def factors(self, X: np.ndarray) -> np.ndarray:
+        return np.clip(np.exp(X @ self.coefficients), MIN_FACTOR, MAX_FACTOR)
+
+    def correction_factor(self, container_type: str, use_case: str, estimate: float,
+                          modifications: Dict[str, float] = None) -> float:
+        """actual/estimated multiplier predicted for one estimate"""
+        x = feature_vector(container_type, use_case, modifications or {}, estimate)
+        return float(min(MAX_FACTOR, max(MIN_FACTOR, np.exp(x @ self.coefficients))))
+
+    def correct_configs(self, configs: List[Dict[str, Any]], estimates: List[float]) -> np.ndarray:
+        """Corrected costs for a batch of configurator configs and their calculated estimates"""
+        if not configs:
+            return np.array([])
+        estimates = np.asarray(estimates, dtype=float)
+        X = build_feature_matrix(
+            [config.get('container_type', '') for config in configs],
+            [config.get('main_purpose', '') for config in configs],
+            [config_modifications(config) for config in configs],
+            estimates
+        )
+        return estimates * self.factors(X)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'trained_at': self.trained_at,
+            'n_samples': self.n_samples,
+            'rmse_log_ratio': self.rmse,
+            'alpha': self.alpha
+        }
+
+
+@st.cache_resource
+def get_cost_correction_model() -> Optional[CostCorrectionModel]:
+    """Process-wide correction model, loaded once from the artifact (None until one is trained)"""
+    try:
+        return CostCorrectionModel.load()
+    except Exception:
+        return None
+
+
+def _load_training_frame(args) -> pd.DataFrame:
+    if args.csv:
+        return pd.read_csv(args.csv)
+
+    from sqlalchemy import create_engine
+    from utils.db_engine import normalize_database_url
+
+    database_url = args.database_url or os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise SystemExit("Pass --csv or --database-url, or set DATABASE_URL")
+    engine = create_engine(normalize_database_url(database_url))
+    try:
+        return pd.read_sql(
+            "SELECT container_type, use_case, modifications, estimated_cost, actual_cost "
+            "FROM historical_projects",
+            engine
+        )
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the historical cost correction model")
+    parser.add_argument('--csv', help="Historical projects CSV (same columns as the upload template)")
+    parser.add_argument('--database-url', help="Read historical_projects from this database")
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help="Ridge penalty")
+    parser.add_argument('--output', default=None, help="Artifact path (default: KANBUD_COST_MODEL_PATH)")
+    args = parser.parse_args()
+
+    model = CostCorrectionModel.fit(_load_training_frame(args), alpha=args.alpha)
+    path = model.save(args.output)
+    print(f"Saved cost correction model to {path}: {model.n_samples} projects, "
+          f"RMSE {model.rmse:.4f} (log ratio)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Incremental Quote Cost Model for KAN-BUD Container Calculator
+Keeps the line-item graph of a quote so an edit only recomputes what it touches
+"""
+
+import copy
+from typing import Dict, Any, Optional
+
+from utils.calculations import LABOR_RATES
+from utils.pricing_rules import seasonal_rate, volume_discount_rate
+
+# Labor is priced as a share of the material line items at the built-in labor rates
+LABOR_SHARE = 0.40
+
+# Services that appear as breakdown lines: service -> (line item key, description)
+SERVICE_LINE_ITEMS = {
+    "delivery": ("delivery_logistics",
+                 lambda services: f"Delivery within {services.get('delivery_distance', 50)} miles"),
+    "permits": ("permits_fees", lambda services: "Permit assistance and fees"),
+    "site_prep": ("site_preparation", lambda services: "Site preparation and foundation work")
+}
+
+# Which service input feeds which service line
+SERVICE_INPUTS = {
+    "delivery": "delivery",
+    "delivery_distance": "delivery",
+    "permits": "permits",
+    "site_prep": "site_prep"
+}
+
+
+def _labor_rate_factor(pricing) -> float:
+    """Saved Admin Panel labor rates relative to the built-in ones"""
+    saved = pricing.section('labor_rates') if pricing is not None else {}
+    rates = [saved.get(role, rate) for role, rate in LABOR_RATES.items()]
+    return sum(rates) / sum(LABOR_RATES.values())
+
+
+def _line(description: str, amount: float) -> Dict[str, Any]:
+    return {
+        "description": description,
+        "quantity": 1,
+        "unit_cost": amount,
+        "total": amount
+    }
+
+
+class QuoteCostModel:
+    """
+    Line-item graph of a quote's costs
+
+    Material lines feed the labor line, and material, labor and service lines
+    feed the subtotal, which in turn feeds profit, contingency, the seasonal
+    adjustment, discounts and total. Changing one input recomputes only its
+    own line, adjusts the group subtotal by the difference and re-derives the
+    constant number of downstream values, so an edit costs O(1) regardless of
+    quote size.
+
+    ``pricing`` is the settings snapshot the quote was priced with; the model
+    keeps it so later edits use the same rates.
+    """
+
+    def __init__(self, generator, quote_data: Dict[str, Any], pricing):
+        self.generator = generator
+        self.pricing = pricing
+        self.labor_share = LABOR_SHARE * _labor_rate_factor(pricing)
+        self.seasonal_rate = seasonal_rate(pricing)
+        self.config = copy.deepcopy(quote_data.get("container_config", {}))
+        self.services = dict(quote_data.get("services", {}))
+
+        quote_params = quote_data.get("quote_params", {})
+        self.profit_margin = quote_params.get("profit_margin", 0.20)
+        self.contingency = quote_params.get("contingency", 0.10)
+        self.discount = quote_params.get("discount", 0.0)
+
+        self.material_items = self._build_material_items()
+        self.materials_total = sum(item["total"] for item in self.material_items.values())
+
+        self.service_items = {}
+        for service in SERVICE_LINE_ITEMS:
+            self._refresh_service_item(service)
+        self.services_total = sum(item["total"] for item in self.service_items.values())
+
+    def _build_material_items(self) -> Dict[str, Dict[str, Any]]:
+        """Container, structural, systems and finish lines"""
+
+        base_costs = self.generator._get_base_costs(self.config)
+        items = {
+            "container_base": _line(f"{self.config.get('base_type', 'Container')} with basic modifications",
+                                    base_costs["container_base"])
+        }
+
+        if base_costs.get("structural_modifications", 0) > 0:
+            items["structural_modifications"] = _line("Structural reinforcements and modifications",
+                                                      base_costs["structural_modifications"])
+
+        systems_cost = (base_costs.get("electrical", 0) +
+                        base_costs.get("plumbing", 0) +
+                        base_costs.get("hvac", 0))
+        if systems_cost > 0:
+            items["systems_installation"] = _line("Electrical, plumbing, and HVAC systems", systems_cost)
+
+        finish_cost = base_costs.get("insulation", 0) + base_costs.get("finishes", 0)
+        if finish_cost > 0:
+            items["finishes_interior"] = _line("Insulation and interior finishes", finish_cost)
+
+        return items
+
+    def _refresh_service_item(self, service: str) -> float:
+        """Recompute one service line and return its change in total"""
+
+        key, describe = SERVICE_LINE_ITEMS[service]
+        old_total = self.service_items.get(key, {}).get("total", 0)
+        cost = self.generator._service_cost(service, self.services, self.pricing)
+
+        if cost > 0:
+            self.service_items[key] = _line(describe(self.services), cost)
+        else:
+            self.service_items.pop(key, None)
+
+        return cost - old_total
+
+    def totals(self) -> Dict[str, float]:
+        """Derived values downstream of the line items"""
+
+        labor = self.materials_total * self.labor_share
+        subtotal = self.materials_total + labor + self.services_total
+        subtotal_with_profit = subtotal * (1 + self.profit_margin)
+        contingency_amount = subtotal_with_profit * self.contingency
+        subtotal_final = subtotal_with_profit + contingency_amount
+        seasonal_amount = subtotal_final * self.seasonal_rate
+        subtotal_adjusted = subtotal_final + seasonal_amount
+        volume_discount = subtotal_adjusted * volume_discount_rate(self.pricing, subtotal_adjusted)
+        subtotal_discounted = subtotal_adjusted - volume_discount
+        discount_amount = subtotal_discounted * self.discount
+
+        return {
+            "labor_costs": labor,
+            "contingency": contingency_amount,
+            "seasonal_adjustment": seasonal_amount,
+            "volume_discount": volume_discount,
+            "discount": discount_amount,
+            "total": subtotal_discounted - discount_amount
+        }
+
+    def update(self, services: Optional[Dict[str, Any]] = None,
+               quote_params: Optional[Dict[str, Any]] = None,
+               container_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Apply edited inputs and return a structured diff of what changed
+        Only the line items fed by a changed input are recomputed
+        """
+
+        changes = {}
+        before = self.totals()
+
+        def record(key, old, new):
+            if abs(new - old) > 1e-9:
+                changes[key] = {"old": old, "new": new, "delta": new - old}
+
+        if container_config is not None and container_config != self.config:
+            old_items = {key: item["total"] for key, item in self.material_items.items()}
+            self.config = copy.deepcopy(container_config)
+            self.material_items = self._build_material_items()
+            self.materials_total = sum(item["total"] for item in self.material_items.values())
+            for key in set(old_items) | set(self.material_items):
+                record(key, old_items.get(key, 0), self.material_items.get(key, {}).get("total", 0))
+
+        if services:
+            touched = set()
+            for name, value in services.items():
+                if self.services.get(name) != value:
+                    self.services[name] = value
+                    if name in SERVICE_INPUTS:
+                        touched.add(SERVICE_INPUTS[name])
+
+            for service in touched:
+                key = SERVICE_LINE_ITEMS[service][0]
+                old_total = self.service_items.get(key, {}).get("total", 0)
+                delta = self._refresh_service_item(service)
+                self.services_total += delta
+                record(key, old_total, old_total + delta)
+
+        if quote_params:
+            self.profit_margin = quote_params.get("profit_margin", self.profit_margin)
+            self.contingency = quote_params.get("contingency", self.contingency)
+            self.discount = quote_params.get("discount", self.discount)
+
+        after = self.totals()
+        for key in ("labor_costs", "contingency", "seasonal_adjustment", "volume_discount", "discount", "total"):
+            record(key, before[key], after[key])
+
+        return {
+            "changes": changes,
+            "total_delta": after["total"] - before["total"]
+        }
+
+    def breakdown(self) -> Dict[str, Any]:
+        """Cost breakdown in the format returned by QuoteGenerator"""
+
+        totals = self.totals()
+        breakdown = dict(self.material_items)
+        breakdown["labor_costs"] = _line("Professional installation and labor", totals["labor_costs"])
+
+        for service, (key, _) in SERVICE_LINE_ITEMS.items():
+            if key in self.service_items:
+                breakdown[key] = self.service_items[key]
+
+        breakdown["contingency"] = _line(f"Contingency ({self.contingency*100:.0f}%)", totals["contingency"])
+
+        if totals["seasonal_adjustment"]:
+            label = "surcharge" if self.seasonal_rate > 0 else "discount"
+            breakdown["seasonal_adjustment"] = _line(f"Seasonal {label} ({abs(self.seasonal_rate)*100:.0f}%)",
+                                                     totals["seasonal_adjustment"])
+
+        if totals["volume_discount"] > 0:
+            breakdown["volume_discount"] = _line("Volume discount", -totals["volume_discount"])
+
+        if totals["discount"] > 0:
+            breakdown["discount"] = _line(f"Discount ({self.discount*100:.0f}%)", -totals["discount"])
+
+        # No tax calculation for B2B customers - VAT handled in invoicing
+        return {
+            "breakdown": copy.deepcopy(breakdown),
+            "subtotal": totals["total"],
+            "tax": 0.0,  # VAT not included in B2B pricing
+            "total": totals["total"],
+            "vat_note": "VAT will be added according to applicable tax regulations at invoicing"
+        }
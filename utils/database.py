@@ -3,14 +3,295 @@ Database Module for KAN-BUD Container Calculator
 Handles user data, historical projects, and pricing accuracy improvements
 """
 
+import math
 import os
+import io
+import time
+import numpy as np
 import pandas as pd
 import streamlit as st
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
-from typing import Dict, List, Any, Optional
+from sqlalchemy import text
+from typing import Dict, List, Any, Optional, Iterable, Union, Callable
 import json
 from datetime import datetime, timedelta
+from utils.db_engine import (get_shared_engine, get_pool_metrics, ensure_schema, normalize_database_url,
+                             bulk_statement_timeout_sql)
+
+# Seconds between retries of a schema setup that failed (e.g. the database was still starting)
+SCHEMA_RETRY_SECONDS = 30
+
+# Columns accepted by the historical bulk loader, in COPY order
+HISTORICAL_COLUMNS = [
+    'project_date', 'container_type', 'use_case', 'location',
+    'actual_cost', 'estimated_cost', 'materials_cost', 'labor_cost', 'delivery_cost',
+    'modifications', 'project_duration_days', 'customer_satisfaction', 'source_id'
+]
+
+# Column limits of historical_projects; the upload ingestor rejects rows beyond them
+# per row, since a single value out of range would abort a whole COPY
+HISTORICAL_TEXT_LIMITS = {'container_type': 50, 'use_case': 100, 'location': 100, 'source_id': 100}
+HISTORICAL_DECIMAL_COLUMNS = ['actual_cost', 'estimated_cost', 'materials_cost', 'labor_cost', 'delivery_cost']
+HISTORICAL_DECIMAL_LIMIT = 10 ** 10  # DECIMAL(12,2)
+HISTORICAL_INTEGER_COLUMNS = ['project_duration_days', 'customer_satisfaction']
+HISTORICAL_INTEGER_LIMIT = 2 ** 31  # INTEGER
+
+# Project or quote number from the system the data comes from; unique when given
+HISTORICAL_SOURCE_KEY = 'source_id'
+
+# Without a source_id, a project is identified by when, what and where it was built.
+# location may be empty, so it is compared as COALESCE(location, '') (see HISTORICAL_KEY_SQL).
+HISTORICAL_NATURAL_KEY = ['project_date', 'container_type', 'use_case', 'location']
+
+HISTORICAL_KEY_SQL = {col: f"COALESCE({{alias}}.{col}, '')" if col == 'location' else f"{{alias}}.{col}"
+                      for col in HISTORICAL_NATURAL_KEY}
+
+
+def _source_id(value: Any) -> Optional[str]:
+    """A source_id as text; numeric ids read into a float column lose their '.0'"""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _natural_key(alias: str) -> List[str]:
+    """Natural key expressions for a table alias, matching idx_historical_projects_natural_key"""
+    return [HISTORICAL_KEY_SQL[col].format(alias=alias) for col in HISTORICAL_NATURAL_KEY]
+
+# Per (container_type, use_case, month, location) aggregates of historical_projects.
+# Sums and counts are stored instead of averages so groups can be combined exactly.
+HISTORICAL_ROLLUP_SELECT = """
+SELECT
+    h.container_type,
+    h.use_case,
+    CAST(date_trunc('month', h.project_date) AS DATE) AS month,
+    COALESCE(h.location, '') AS location,
+    COUNT(*) AS project_count,
+    SUM(h.actual_cost) AS sum_actual,
+    MIN(h.actual_cost) AS min_actual,
+    MAX(h.actual_cost) AS max_actual,
+    SUM(h.materials_cost) AS sum_materials,
+    COUNT(h.materials_cost) AS count_materials,
+    SUM(h.labor_cost) AS sum_labor,
+    COUNT(h.labor_cost) AS count_labor,
+    SUM(h.project_duration_days) AS sum_duration,
+    COUNT(h.project_duration_days) AS count_duration
+FROM historical_projects h
+{where_clause}
+GROUP BY 1, 2, 3, 4
+"""
+
+HISTORICAL_ROLLUP_COLUMNS = """
+    container_type, use_case, month, location, project_count,
+    sum_actual, min_actual, max_actual, sum_materials, count_materials,
+    sum_labor, count_labor, sum_duration, count_duration
+"""
+
+# Read queries shared by DatabaseManager and the async data access layer
+
+# Reads the monthly rollups, so the window starts at the cutoff's month
+HISTORICAL_PRICING_SQL = """
+SELECT 
+    SUM(sum_actual) / NULLIF(SUM(project_count), 0) as avg_cost,
+    MIN(min_actual) as min_cost,
+    MAX(max_actual) as max_cost,
+    SUM(sum_materials) / NULLIF(SUM(count_materials), 0) as avg_materials,
+    SUM(sum_labor) / NULLIF(SUM(count_labor), 0) as avg_labor,
+    SUM(sum_duration) / NULLIF(SUM(count_duration), 0) as avg_duration,
+    COALESCE(SUM(project_count), 0) as project_count
+FROM historical_rollups 
+WHERE container_type = :container_type 
+AND use_case = :use_case 
+AND month >= CAST(date_trunc('month', CAST(:cutoff_date AS DATE)) AS DATE)
+"""
+
+CURRENT_MATERIAL_PRICES_SQL = """
+SELECT DISTINCT ON (material_name) 
+    material_name, price_per_unit, unit
+FROM material_prices 
+ORDER BY material_name, price_date DESC
+"""
+
+# As-of lookups: for each requested (key, date) the latest row dated on or before it.
+# Requests are passed as parallel arrays so any number resolve in one round trip;
+# each LATERAL probe is an index seek on idx_material_prices_name_date /
+# idx_labor_rates_skill_region_date.
+MATERIAL_PRICES_AS_OF_SQL = """
+SELECT q.ord, q.material_name, q.as_of, p.price_per_unit, p.unit, p.price_date
+FROM unnest(CAST(:material_names AS TEXT[]), CAST(:as_of_dates AS DATE[]))
+     WITH ORDINALITY AS q(material_name, as_of, ord)
+LEFT JOIN LATERAL (
+    SELECT m.price_per_unit, m.unit, m.price_date
+    FROM material_prices m
+    WHERE m.material_name = q.material_name
+    AND m.price_date <= q.as_of
+    ORDER BY m.price_date DESC
+    LIMIT 1
+) p ON TRUE
+ORDER BY q.ord
+"""
+
+LABOR_RATES_AS_OF_SQL = """
+SELECT q.ord, q.skill_level, q.region, q.as_of, r.hourly_rate, r.effective_date
+FROM unnest(CAST(:skill_levels AS TEXT[]), CAST(:regions AS TEXT[]), CAST(:as_of_dates AS DATE[]))
+     WITH ORDINALITY AS q(skill_level, region, as_of, ord)
+LEFT JOIN LATERAL (
+    SELECT l.hourly_rate, l.effective_date
+    FROM labor_rates l
+    WHERE l.skill_level = q.skill_level
+    AND l.region = q.region
+    AND l.effective_date <= q.as_of
+    ORDER BY l.effective_date DESC
+    LIMIT 1
+) r ON TRUE
+ORDER BY q.ord
+"""
+
+USER_PROJECTS_SQL = """
+SELECT id, project_name, container_config, cost_estimate, 
+       technical_analysis, status, created_at
+FROM user_projects 
+WHERE user_id = :user_id 
+ORDER BY created_at DESC
+"""
+
+MARKET_TRENDS_SQL = """
+SELECT value, data_date, region, unit
+FROM market_data 
+WHERE data_type = :data_type 
+AND data_date >= :cutoff_date 
+ORDER BY data_date DESC
+"""
+
+
+# Bucket sizes the market series can be downsampled to, finest first, with their length in days
+MARKET_RESOLUTIONS = {'day': 1, 'week': 7, 'month': 30, 'quarter': 91, 'year': 365}
+
+# Upper bound on points returned for a chart, whatever the window
+MAX_CHART_POINTS = 300
+
+# Buckets are computed in the database so only chart-sized results leave it.
+# :resolution is one of MARKET_RESOLUTIONS (validated before binding); :max_points
+# is bound one above the caller's limit so a cut-off series can be flagged.
+MARKET_TREND_SERIES_SQL = """
+SELECT
+    CAST(date_trunc(:resolution, CAST(data_date AS TIMESTAMP)) AS DATE) AS bucket,
+    AVG(value) AS avg_value,
+    MIN(value) AS min_value,
+    MAX(value) AS max_value,
+    COUNT(*) AS samples,
+    MAX(unit) AS unit
+FROM market_data
+WHERE data_type = :data_type
+AND data_date >= :cutoff_date
+AND (CAST(:region AS VARCHAR) IS NULL OR region = :region)
+GROUP BY 1
+ORDER BY 1 DESC
+LIMIT :max_points
+"""
+
+
+def market_resolution(months_back: int, resolution: str = 'auto', max_points: int = MAX_CHART_POINTS) -> str:
+    """
+    The finest bucket size, no finer than the requested one, that fits the window in max_points
+
+    A requested resolution too fine for the window is coarsened rather than
+    letting LIMIT drop the oldest buckets; 'auto' starts from days.
+    """
+    if resolution != 'auto' and resolution not in MARKET_RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}', expected one of {list(MARKET_RESOLUTIONS)}")
+    window_days = months_back * 30
+    finest = MARKET_RESOLUTIONS.get(resolution, 1)
+    for name, days in MARKET_RESOLUTIONS.items():
+        # Calendar buckets can be cut at both ends of the window, hence the extra one
+        if days >= finest and math.ceil(window_days / days) + 1 <= max_points:
+            return name
+    return 'year'
+
+
+def market_series_from_rows(rows, resolution: str, max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Columnar, oldest-first arrays from MARKET_TREND_SERIES_SQL rows (which come newest first)
+
+    ``truncated`` is set when more than max_points buckets came back and the
+    oldest had to be dropped, which only happens when even yearly buckets do
+    not fit.
+    """
+    truncated = max_points is not None and len(rows) > max_points
+    rows = list(reversed(rows[:max_points] if truncated else rows))
+    return {
+        'resolution': resolution,
+        'truncated': truncated,
+        'unit': rows[-1][5] if rows else None,
+        'bucket': np.array([row[0] for row in rows], dtype='datetime64[D]'),
+        'avg': np.array([row[1] for row in rows], dtype=float),
+        'min': np.array([row[2] for row in rows], dtype=float),
+        'max': np.array([row[3] for row in rows], dtype=float),
+        'samples': np.array([row[4] for row in rows], dtype=np.int64)
+    }
+
+
+def _json_value(value: Any) -> Any:
+    """JSONB columns arrive decoded from psycopg2 but as text from other drivers"""
+    if not value:
+        return {}
+    return value if isinstance(value, (dict, list)) else json.loads(value)
+
+
+def historical_pricing_from_row(result) -> Dict[str, Any]:
+    if result and result[6] > 0:  # project_count > 0
+        return {
+            'avg_cost': float(result[0]) if result[0] else 0,
+            'min_cost': float(result[1]) if result[1] else 0,
+            'max_cost': float(result[2]) if result[2] else 0,
+            'avg_materials': float(result[3]) if result[3] else 0,
+            'avg_labor': float(result[4]) if result[4] else 0,
+            'avg_duration': float(result[5]) if result[5] else 0,
+            'project_count': int(result[6]),
+            'confidence': min(1.0, int(result[6]) / 10)  # Higher confidence with more projects
+        }
+    return {}
+
+
+def user_project_from_row(row) -> Dict[str, Any]:
+    return {
+        'id': row[0],
+        'project_name': row[1],
+        'container_config': _json_value(row[2]),
+        'cost_estimate': _json_value(row[3]),
+        'technical_analysis': _json_value(row[4]),
+        'status': row[5],
+        'created_at': row[6]
+    }
+
+
+def market_trend_from_row(row) -> Dict[str, Any]:
+    return {'value': float(row[0]), 'date': row[1], 'region': row[2], 'unit': row[3]}
+
+
+def as_of_merge(requests: pd.DataFrame, history: pd.DataFrame, by: List[str],
+                request_date: str, history_date: str) -> pd.DataFrame:
+    """
+    In-memory as-of join: each request row gets the latest history row with the
+    same ``by`` keys dated on or before its ``request_date``. Request order is kept.
+    """
+    left = requests.reset_index(drop=True).assign(_order=lambda df: range(len(df)))
+    left[request_date] = pd.to_datetime(left[request_date]).astype('datetime64[ns]')
+    right = history.copy()
+    right[history_date] = pd.to_datetime(right[history_date]).astype('datetime64[ns]')
+
+    merged = pd.merge_asof(
+        left.sort_values(request_date),
+        right.sort_values(history_date),
+        left_on=request_date,
+        right_on=history_date,
+        by=by,
+        direction='backward'
+    )
+    return merged.sort_values('_order').drop(columns='_order').reset_index(drop=True)
+
 
 class DatabaseManager:
     """Database manager for KAN-BUD container calculation system"""
@@ -18,14 +299,15 @@ class DatabaseManager:
     def __init__(self):
         self.database_url = os.environ.get('DATABASE_URL')
         self.engine = None
+        self.schema_ready = False
+        self._schema_attempted_at = 0.0
         
         if self.database_url:
             try:
-                # Fix common URL issues
-                if self.database_url.startswith('postgres://'):
-                    self.database_url = self.database_url.replace('postgres://', 'postgresql://', 1)
+                self.database_url = normalize_database_url(self.database_url)
                 
-                self.engine = create_engine(self.database_url, pool_pre_ping=True)
+                # One pooled engine per process, shared by every DatabaseManager
+                self.engine = get_shared_engine(self.database_url)
                 self.initialize_tables()
             except Exception as e:
                 self.engine = None
@@ -34,12 +316,76 @@ class DatabaseManager:
             self.engine = None
     
     def initialize_tables(self):
-        """Create necessary tables for the KAN-BUD system"""
+        """Bring the KAN-BUD schema up to date (see migrations/versions)"""
+        
+        self._schema_attempted_at = time.monotonic()
+        try:
+            self.schema_ready = ensure_schema(self.engine)
+        except Exception as e:
+            # Only show database errors to employees/admins
+            if st.session_state.get('employee_logged_in', False):
+                st.error(f"Failed to initialize database tables: {str(e)}")
+    
+    def retry_schema_setup(self):
+        """Retry a failed schema setup, at most once every SCHEMA_RETRY_SECONDS"""
+        
+        if self.engine is None or self.schema_ready:
+            return
+        if time.monotonic() - self._schema_attempted_at >= SCHEMA_RETRY_SECONDS:
+            self.initialize_tables()
+    
+    def get_pool_metrics(self) -> Dict[str, Any]:
+        """Connection pool occupancy and checkout wait statistics"""
+        
+        if not self.engine:
+            return {}
+        return get_pool_metrics(self.engine)
+    
+    def insert_historical_data(self, data: List[Dict[str, Any]]) -> bool:
+        """Insert historical project data for improved pricing accuracy"""
+        
+        if not self.engine:
+            return False
+        
+        return self.bulk_load_historical(pd.DataFrame(data)) is not None
+    
+    def bulk_load_historical(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                             chunk_size: int = 10000,
+                             progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
+                             ) -> Optional[Dict[str, int]]:
+        """
+        Bulk load cleaned historical projects with COPY FROM STDIN
+        Rows are staged in chunks and merged in one transaction, on source_id when
+        given and on the natural key otherwise, so a re-import updates existing
+        projects instead of duplicating them
+        """
+        
+        if not self.engine:
+            return None
         
-        tables_sql = """
-        -- Historical project data table
-        CREATE TABLE IF NOT EXISTS historical_projects (
-            id SERIAL PRIMARY KEY,
+        if isinstance(data, pd.DataFrame):
+            total_rows = len(data)
+            chunks = (data.iloc[start:start + chunk_size] for start in range(0, total_rows, chunk_size))
+        else:
+            total_rows = None
+            chunks = data
+        
+        if self.engine.dialect.name != 'postgresql':
+            return self._append_historical_chunks(chunks, total_rows, progress_callback)
+        
+        columns = ', '.join(HISTORICAL_COLUMNS)
+        source_columns = ', '.join(f"s.{col}" for col in HISTORICAL_COLUMNS)
+        # Plain equality on the key expressions, so the planner can hash join or probe the indexes
+        key_match = ' AND '.join(f"{h} = {s}" for h, s in zip(_natural_key('h'), _natural_key('s')))
+        keyed_updates = ', '.join([f"{col} = EXCLUDED.{col}" for col in HISTORICAL_COLUMNS
+                                   if col != HISTORICAL_SOURCE_KEY] + ["updated_at = clock_timestamp()"])
+        unkeyed_updates = ', '.join([f"{col} = s.{col}" for col in HISTORICAL_COLUMNS
+                                     if col not in HISTORICAL_NATURAL_KEY and col != HISTORICAL_SOURCE_KEY]
+                                    + ["updated_at = clock_timestamp()"])
+        
+        staging_sql = """
+        CREATE TEMP TABLE historical_import (
+            seq BIGSERIAL,
             project_date DATE NOT NULL,
             container_type VARCHAR(50) NOT NULL,
             use_case VARCHAR(100) NOT NULL,
@@ -52,113 +398,261 @@ class DatabaseManager:
             modifications JSONB,
             project_duration_days INTEGER,
             customer_satisfaction INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Material pricing history
-        CREATE TABLE IF NOT EXISTS material_prices (
-            id SERIAL PRIMARY KEY,
-            material_name VARCHAR(100) NOT NULL,
-            price_per_unit DECIMAL(10,4) NOT NULL,
-            unit VARCHAR(20) NOT NULL,
-            supplier VARCHAR(100),
-            price_date DATE NOT NULL,
-            region VARCHAR(50),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Labor rates by region and skill
-        CREATE TABLE IF NOT EXISTS labor_rates (
-            id SERIAL PRIMARY KEY,
-            skill_level VARCHAR(50) NOT NULL,
-            hourly_rate DECIMAL(8,2) NOT NULL,
-            region VARCHAR(50) NOT NULL,
-            effective_date DATE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- User projects and configurations
-        CREATE TABLE IF NOT EXISTS user_projects (
-            id SERIAL PRIMARY KEY,
-            user_id VARCHAR(100),
-            project_name VARCHAR(200) NOT NULL,
-            container_config JSONB NOT NULL,
-            cost_estimate JSONB,
-            technical_analysis JSONB,
-            quote_data JSONB,
-            status VARCHAR(50) DEFAULT 'draft',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Customer data
-        CREATE TABLE IF NOT EXISTS customers (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(200) NOT NULL,
-            company VARCHAR(200),
-            email VARCHAR(150),
-            phone VARCHAR(50),
-            address TEXT,
-            preferred_language VARCHAR(10) DEFAULT 'en',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Quotes and proposals
-        CREATE TABLE IF NOT EXISTS quotes (
-            id SERIAL PRIMARY KEY,
-            quote_number VARCHAR(50) UNIQUE NOT NULL,
-            customer_id INTEGER REFERENCES customers(id),
-            project_id INTEGER REFERENCES user_projects(id),
-            total_amount DECIMAL(12,2) NOT NULL,
-            status VARCHAR(50) DEFAULT 'pending',
-            valid_until DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Market data and trends
-        CREATE TABLE IF NOT EXISTS market_data (
-            id SERIAL PRIMARY KEY,
-            data_type VARCHAR(50) NOT NULL,
-            value DECIMAL(12,4) NOT NULL,
-            unit VARCHAR(20),
-            region VARCHAR(50),
-            data_date DATE NOT NULL,
-            source VARCHAR(100),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Create indexes for better performance
-        CREATE INDEX IF NOT EXISTS idx_historical_projects_date ON historical_projects(project_date);
-        CREATE INDEX IF NOT EXISTS idx_material_prices_date ON material_prices(price_date);
-        CREATE INDEX IF NOT EXISTS idx_user_projects_user ON user_projects(user_id);
-        CREATE INDEX IF NOT EXISTS idx_quotes_customer ON quotes(customer_id);
+            source_id VARCHAR(100)
+        ) ON COMMIT DROP
+        """
+        
+        # Keep only the first occurrence of each key within the import; the
+        # upload ingestor already rejects the repeats into the rejects file
+        dedupe_sql = f"""
+        CREATE TEMP TABLE historical_import_dedup ON COMMIT DROP AS
+        (SELECT DISTINCT ON (source_id) {columns}
+         FROM historical_import
+         WHERE source_id IS NOT NULL
+         ORDER BY source_id, seq)
+        UNION ALL
+        (SELECT DISTINCT ON ({', '.join(_natural_key('i'))}) {', '.join(f"i.{col}" for col in HISTORICAL_COLUMNS)}
+         FROM historical_import i
+         WHERE i.source_id IS NULL
+         ORDER BY {', '.join(_natural_key('i'))}, i.seq)
         """
         
+        keyed_upsert_sql = f"""
+        WITH upserted AS (
+            INSERT INTO historical_projects ({columns})
+            SELECT {columns}
+            FROM historical_import_dedup
+            WHERE source_id IS NOT NULL
+            ON CONFLICT (source_id) DO UPDATE SET {keyed_updates}
+            RETURNING xmax = 0 AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+        """
+        
+        unkeyed_update_sql = f"""
+        UPDATE historical_projects h
+        SET {unkeyed_updates}
+        FROM historical_import_dedup s
+        WHERE s.source_id IS NULL
+        AND h.source_id IS NULL
+        AND {key_match}
+        """
+        
+        unkeyed_insert_sql = f"""
+        INSERT INTO historical_projects ({columns})
+        SELECT {source_columns}
+        FROM historical_import_dedup s
+        WHERE s.source_id IS NULL
+        AND NOT EXISTS (
+            SELECT 1 FROM historical_projects h WHERE h.source_id IS NULL AND {key_match}
+        )
+        """
+        
+        copy_sql = f"COPY historical_import ({columns}) FROM STDIN WITH (FORMAT csv, NULL '')"
+        
+        raw_conn = self.engine.raw_connection()
         try:
-            with self.engine.connect() as conn:
-                conn.execute(text(tables_sql))
-                conn.commit()
-        except SQLAlchemyError as e:
-            # Only show database errors to employees/admins
+            cursor = raw_conn.cursor()
+            # COPY, upsert and rollup refresh of a large import outlast the pool's statement_timeout
+            cursor.execute(bulk_statement_timeout_sql())
+            cursor.execute(staging_sql)
+            
+            staged_rows = 0
+            for chunk in chunks:
+                if chunk.empty:
+                    continue
+                buffer = io.StringIO()
+                self._prepare_historical_chunk(chunk).to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+                staged_rows += len(chunk)
+                if progress_callback:
+                    progress_callback(staged_rows, total_rows)
+            
+            cursor.execute(dedupe_sql)
+            cursor.execute("ANALYZE historical_import_dedup")
+            self._collect_rollup_groups(cursor)
+            cursor.execute(keyed_upsert_sql)
+            inserted_rows, updated_rows = cursor.fetchone()
+            cursor.execute(unkeyed_update_sql)
+            updated_rows += cursor.rowcount
+            cursor.execute(unkeyed_insert_sql)
+            inserted_rows += cursor.rowcount
+            self._refresh_rollups_for_import(cursor)
+            raw_conn.commit()
+            
+            return {
+                'staged': staged_rows,
+                'inserted': inserted_rows,
+                'updated': updated_rows,
+                'duplicates': staged_rows - inserted_rows - updated_rows
+            }
+        except Exception as e:
+            raw_conn.rollback()
             if st.session_state.get('employee_logged_in', False):
-                st.error(f"Failed to initialize database tables: {str(e)}")
+                st.error(f"Failed to bulk load historical data: {str(e)}")
+            return None
+        finally:
+            raw_conn.close()
     
-    def insert_historical_data(self, data: List[Dict[str, Any]]) -> bool:
-        """Insert historical project data for improved pricing accuracy"""
+    @staticmethod
+    def _collect_rollup_groups(cursor):
+        """
+        Rollup groups touched by the staged import, collected before the upsert
+        
+        A re-imported source_id may change a project's type, use case, month or
+        location, so the group it leaves is recomputed as well as the one it joins.
+        """
+        
+        groups_sql = """
+        CREATE TEMP TABLE historical_rollup_groups ON COMMIT DROP AS
+        SELECT
+            container_type,
+            use_case,
+            CAST(date_trunc('month', project_date) AS DATE) AS month,
+            COALESCE(location, '') AS location
+        FROM historical_import_dedup
+        UNION
+        SELECT
+            h.container_type,
+            h.use_case,
+            CAST(date_trunc('month', h.project_date) AS DATE),
+            COALESCE(h.location, '')
+        FROM historical_projects h
+        JOIN historical_import_dedup s ON s.source_id = h.source_id
+        """
+        cursor.execute(groups_sql)
+    
+    @staticmethod
+    def _refresh_rollups_for_import(cursor):
+        """Recompute only the rollup groups collected by _collect_rollup_groups"""
+        
+        delete_sql = """
+        DELETE FROM historical_rollups r
+        USING historical_rollup_groups g
+        WHERE r.container_type = g.container_type
+        AND r.use_case = g.use_case
+        AND r.month = g.month
+        AND r.location = g.location
+        """
+        
+        where_clause = """
+        WHERE EXISTS (
+            SELECT 1 FROM historical_rollup_groups g
+            WHERE g.container_type = h.container_type
+            AND g.use_case = h.use_case
+            AND h.project_date >= g.month
+            AND h.project_date < g.month + INTERVAL '1 month'
+            AND g.location = COALESCE(h.location, '')
+        )
+        """
+        insert_sql = f"""
+        INSERT INTO historical_rollups ({HISTORICAL_ROLLUP_COLUMNS})
+        {HISTORICAL_ROLLUP_SELECT.format(where_clause=where_clause)}
+        """
+        
+        cursor.execute(delete_sql)
+        cursor.execute(insert_sql)
+    
+    def refresh_historical_rollups(self) -> bool:
+        """Rebuild all rollups from historical_projects (e.g. after manual edits)"""
         
         if not self.engine:
             return False
         
         try:
-            df = pd.DataFrame(data)
-            df.to_sql('historical_projects', self.engine, if_exists='append', index=False)
+            with self.engine.begin() as conn:
+                conn.execute(text(bulk_statement_timeout_sql()))
+                conn.execute(text("DELETE FROM historical_rollups"))
+                conn.execute(text(f"""
+                INSERT INTO historical_rollups ({HISTORICAL_ROLLUP_COLUMNS})
+                {HISTORICAL_ROLLUP_SELECT.format(where_clause='')}
+                """))
             return True
         except Exception as e:
-            # Only show database errors to employees/admins
             if st.session_state.get('employee_logged_in', False):
-                st.error(f"Failed to insert historical data: {str(e)}")
+                st.error(f"Failed to refresh historical rollups: {str(e)}")
             return False
     
+    def get_historical_rollups(self, container_type: str = None, use_case: str = None,
+                               months_back: int = None) -> pd.DataFrame:
+        """Get pre-aggregated historical rows for seasonal, regional and trend stats"""
+        
+        if not self.engine:
+            return pd.DataFrame()
+        
+        conditions = []
+        params = {}
+        if container_type:
+            conditions.append("container_type = :container_type")
+            params['container_type'] = container_type
+        if use_case:
+            conditions.append("use_case = :use_case")
+            params['use_case'] = use_case
+        if months_back:
+            conditions.append("month >= CAST(date_trunc('month', CAST(:cutoff_date AS DATE)) AS DATE)")
+            params['cutoff_date'] = (datetime.now() - timedelta(days=months_back * 30)).date()
+        
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+        SELECT {HISTORICAL_ROLLUP_COLUMNS}
+        FROM historical_rollups
+        {where_clause}
+        """
+        
+        try:
+            with self.engine.connect() as conn:
+                rollups = pd.read_sql(text(query), conn, params=params, parse_dates=['month'])
+        except Exception as e:
+            if st.session_state.get('employee_logged_in', False):
+                st.error(f"Failed to get historical rollups: {str(e)}")
+            return pd.DataFrame()
+        
+        numeric_columns = [col for col in rollups.columns
+                           if col not in ('container_type', 'use_case', 'month', 'location')]
+        rollups[numeric_columns] = rollups[numeric_columns].astype(float)
+        return rollups
+    
+    def _append_historical_chunks(self, chunks: Iterable[pd.DataFrame], total_rows: Optional[int],
+                                  progress_callback: Optional[Callable[[int, Optional[int]], None]]
+                                  ) -> Optional[Dict[str, int]]:
+        """Chunked, single-transaction append for databases without COPY"""
+        
+        staged_rows = 0
+        try:
+            with self.engine.begin() as conn:
+                for chunk in chunks:
+                    if chunk.empty:
+                        continue
+                    self._prepare_historical_chunk(chunk).to_sql(
+                        'historical_projects', conn, if_exists='append', index=False,
+                        method='multi', chunksize=500
+                    )
+                    staged_rows += len(chunk)
+                    if progress_callback:
+                        progress_callback(staged_rows, total_rows)
+        except Exception as e:
+            if st.session_state.get('employee_logged_in', False):
+                st.error(f"Failed to bulk load historical data: {str(e)}")
+            return None
+        
+        return {'staged': staged_rows, 'inserted': staged_rows, 'updated': 0, 'duplicates': 0}
+    
+    @staticmethod
+    def _prepare_historical_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+        """Order and format a chunk's columns the way the historical table expects"""
+        
+        prepared = chunk.reindex(columns=HISTORICAL_COLUMNS)
+        prepared['project_date'] = pd.to_datetime(prepared['project_date'], errors='coerce').dt.date
+        prepared['modifications'] = prepared['modifications'].map(
+            lambda value: json.dumps(value) if isinstance(value, (dict, list)) else value
+        )
+        for col in ('project_duration_days', 'customer_satisfaction'):
+            prepared[col] = pd.to_numeric(prepared[col], errors='coerce').round().astype('Int64')
+        prepared['source_id'] = prepared['source_id'].map(_source_id)
+        return prepared
+    
     def get_historical_pricing_data(self, container_type: str, use_case: str, 
                                   months_back: int = 24) -> Dict[str, Any]:
         """Get historical pricing data for more accurate estimates"""
@@ -168,40 +662,15 @@ class DatabaseManager:
         
         cutoff_date = datetime.now() - timedelta(days=months_back * 30)
         
-        query = """
-        SELECT 
-            AVG(actual_cost) as avg_cost,
-            MIN(actual_cost) as min_cost,
-            MAX(actual_cost) as max_cost,
-            AVG(materials_cost) as avg_materials,
-            AVG(labor_cost) as avg_labor,
-            AVG(project_duration_days) as avg_duration,
-            COUNT(*) as project_count
-        FROM historical_projects 
-        WHERE container_type = :container_type 
-        AND use_case = :use_case 
-        AND project_date >= :cutoff_date
-        """
-        
         try:
             with self.engine.connect() as conn:
-                result = conn.execute(text(query), {
+                result = conn.execute(text(HISTORICAL_PRICING_SQL), {
                     'container_type': container_type,
                     'use_case': use_case,
                     'cutoff_date': cutoff_date
                 }).fetchone()
                 
-                if result and result[6] > 0:  # project_count > 0
-                    return {
-                        'avg_cost': float(result[0]) if result[0] else 0,
-                        'min_cost': float(result[1]) if result[1] else 0,
-                        'max_cost': float(result[2]) if result[2] else 0,
-                        'avg_materials': float(result[3]) if result[3] else 0,
-                        'avg_labor': float(result[4]) if result[4] else 0,
-                        'avg_duration': float(result[5]) if result[5] else 0,
-                        'project_count': int(result[6]),
-                        'confidence': min(1.0, int(result[6]) / 10)  # Higher confidence with more projects
-                    }
+                return historical_pricing_from_row(result)
         except Exception as e:
             st.error(f"Failed to get historical pricing data: {str(e)}")
         
@@ -213,21 +682,106 @@ class DatabaseManager:
         if not self.engine:
             return {}
         
-        query = """
-        SELECT DISTINCT ON (material_name) 
-            material_name, price_per_unit, unit
-        FROM material_prices 
-        ORDER BY material_name, price_date DESC
-        """
-        
         try:
             with self.engine.connect() as conn:
-                result = conn.execute(text(query)).fetchall()
+                result = conn.execute(text(CURRENT_MATERIAL_PRICES_SQL)).fetchall()
                 return {row[0]: float(row[1]) for row in result}
         except Exception as e:
             st.error(f"Failed to get material prices: {str(e)}")
             return {}
     
+    def get_material_price_as_of(self, material_name: str, as_of) -> Optional[Dict[str, Any]]:
+        """Price of a material as it stood on a given date (e.g. the original quote date)"""
+        prices = self.get_material_prices_as_of([(material_name, as_of)])
+        if prices.empty or pd.isna(prices.iloc[0]['price_per_unit']):
+            return None
+        row = prices.iloc[0]
+        return {'price': float(row['price_per_unit']), 'unit': row['unit'], 'price_date': row['price_date']}
+    
+    def get_material_prices_as_of(self, requests: Iterable[tuple]) -> pd.DataFrame:
+        """
+        Resolve many (material_name, as_of_date) pairs at once
+        Returns one row per request, in request order, with price_per_unit, unit
+        and price_date (NaN/None when no price existed yet on that date)
+        """
+        columns = ['material_name', 'as_of', 'price_per_unit', 'unit', 'price_date']
+        wanted = pd.DataFrame(list(requests), columns=['material_name', 'as_of'])
+        if wanted.empty or not self.engine:
+            return wanted.reindex(columns=columns)
+        wanted['as_of'] = pd.to_datetime(wanted['as_of']).dt.date
+        
+        # Repricing many quote lines repeats the same pairs; resolve each once
+        unique = wanted.drop_duplicates().reset_index(drop=True)
+        
+        try:
+            if self.engine.dialect.name == 'postgresql':
+                with self.engine.connect() as conn:
+                    rows = conn.execute(text(MATERIAL_PRICES_AS_OF_SQL), {
+                        'material_names': unique['material_name'].astype(str).tolist(),
+                        'as_of_dates': unique['as_of'].tolist()
+                    }).fetchall()
+                resolved = pd.DataFrame([row[1:] for row in rows], columns=columns)
+            else:
+                with self.engine.connect() as conn:
+                    history = pd.read_sql(
+                        text("SELECT material_name, price_per_unit, unit, price_date FROM material_prices"),
+                        conn
+                    )
+                resolved = as_of_merge(unique, history, ['material_name'], 'as_of', 'price_date')
+                resolved['as_of'] = resolved['as_of'].dt.date
+            resolved['price_per_unit'] = pd.to_numeric(resolved['price_per_unit'], errors='coerce')
+            resolved['price_date'] = pd.to_datetime(resolved['price_date'])
+        except Exception as e:
+            st.error(f"Failed to get material prices: {str(e)}")
+            return wanted.reindex(columns=columns)
+        
+        return wanted.merge(resolved[columns], on=['material_name', 'as_of'], how='left')
+    
+    def get_labor_rate_as_of(self, skill_level: str, region: str, as_of) -> Optional[float]:
+        """Hourly rate for a skill level and region as it stood on a given date"""
+        rates = self.get_labor_rates_as_of([(skill_level, region, as_of)])
+        if rates.empty or pd.isna(rates.iloc[0]['hourly_rate']):
+            return None
+        return float(rates.iloc[0]['hourly_rate'])
+    
+    def get_labor_rates_as_of(self, requests: Iterable[tuple]) -> pd.DataFrame:
+        """
+        Resolve many (skill_level, region, as_of_date) triples at once
+        Returns one row per request, in request order, with hourly_rate and effective_date
+        """
+        columns = ['skill_level', 'region', 'as_of', 'hourly_rate', 'effective_date']
+        wanted = pd.DataFrame(list(requests), columns=['skill_level', 'region', 'as_of'])
+        if wanted.empty or not self.engine:
+            return wanted.reindex(columns=columns)
+        wanted['as_of'] = pd.to_datetime(wanted['as_of']).dt.date
+        
+        unique = wanted.drop_duplicates().reset_index(drop=True)
+        
+        try:
+            if self.engine.dialect.name == 'postgresql':
+                with self.engine.connect() as conn:
+                    rows = conn.execute(text(LABOR_RATES_AS_OF_SQL), {
+                        'skill_levels': unique['skill_level'].astype(str).tolist(),
+                        'regions': unique['region'].astype(str).tolist(),
+                        'as_of_dates': unique['as_of'].tolist()
+                    }).fetchall()
+                resolved = pd.DataFrame([row[1:] for row in rows], columns=columns)
+            else:
+                with self.engine.connect() as conn:
+                    history = pd.read_sql(
+                        text("SELECT skill_level, region, hourly_rate, effective_date FROM labor_rates"),
+                        conn
+                    )
+                resolved = as_of_merge(unique, history, ['skill_level', 'region'], 'as_of', 'effective_date')
+                resolved['as_of'] = resolved['as_of'].dt.date
+            resolved['hourly_rate'] = pd.to_numeric(resolved['hourly_rate'], errors='coerce')
+            resolved['effective_date'] = pd.to_datetime(resolved['effective_date'])
+        except Exception as e:
+            st.error(f"Failed to get labor rates: {str(e)}")
+            return wanted.reindex(columns=columns)
+        
+        return wanted.merge(resolved[columns], on=['skill_level', 'region', 'as_of'], how='left')
+    
     def save_user_project(self, user_id: str, project_name: str, 
                          config: Dict[str, Any], estimate: Dict[str, Any] = None,
                          analysis: Dict[str, Any] = None) -> Optional[int]:
@@ -263,31 +817,11 @@ class DatabaseManager:
         if not self.engine:
             return []
         
-        query = """
-        SELECT id, project_name, container_config, cost_estimate, 
-               technical_analysis, status, created_at
-        FROM user_projects 
-        WHERE user_id = :user_id 
-        ORDER BY created_at DESC
-        """
-        
         try:
             with self.engine.connect() as conn:
-                result = conn.execute(text(query), {'user_id': user_id}).fetchall()
+                result = conn.execute(text(USER_PROJECTS_SQL), {'user_id': user_id}).fetchall()
                 
-                projects = []
-                for row in result:
-                    projects.append({
-                        'id': row[0],
-                        'project_name': row[1],
-                        'container_config': json.loads(row[2]) if row[2] else {},
-                        'cost_estimate': json.loads(row[3]) if row[3] else {},
-                        'technical_analysis': json.loads(row[4]) if row[4] else {},
-                        'status': row[5],
-                        'created_at': row[6]
-                    })
-                
-                return projects
+                return [user_project_from_row(row) for row in result]
         except Exception as e:
             st.error(f"Failed to get user projects: {str(e)}")
             return []
@@ -341,23 +875,57 @@ class DatabaseManager:
         
         cutoff_date = datetime.now() - timedelta(days=months_back * 30)
         
-        query = """
-        SELECT value, data_date, region, unit
-        FROM market_data 
-        WHERE data_type = :data_type 
-        AND data_date >= :cutoff_date 
-        ORDER BY data_date DESC
+        try:
+            with self.engine.connect() as conn:
+                result = conn.execute(text(MARKET_TRENDS_SQL), {
+                    'data_type': data_type,
+                    'cutoff_date': cutoff_date
+                }).fetchall()
+                
+                return [market_trend_from_row(row) for row in result]
+        except Exception as e:
+            st.error(f"Failed to get market trends: {str(e)}")
+            return []
+
+    
+    def get_market_trend_series(self, data_type: str, months_back: int = 12, resolution: str = 'auto',
+                                region: str = None, max_points: int = MAX_CHART_POINTS) -> Dict[str, Any]:
+        """
+        Market data bucketed in the database (avg/min/max per day, week, month, ...)
+        Returns columnar arrays of at most max_points buckets, oldest first, ready for charting;
+        the resolution is coarsened when the requested one would need more buckets
         """
+        resolution = market_resolution(months_back, resolution, max_points)
+        empty = market_series_from_rows([], resolution)
+        
+        if not self.engine:
+            return empty
+        
+        cutoff_date = (datetime.now() - timedelta(days=months_back * 30)).date()
         
         try:
             with self.engine.connect() as conn:
-                result = conn.execute(text(query), {
+                rows = conn.execute(text(MARKET_TREND_SERIES_SQL), {
+                    'resolution': resolution,
                     'data_type': data_type,
-                    'cutoff_date': cutoff_date
+                    'cutoff_date': cutoff_date,
+                    'region': region,
+                    'max_points': max_points + 1
                 }).fetchall()
                 
-                return [{'value': float(row[0]), 'date': row[1], 'region': row[2], 'unit': row[3]} 
-                       for row in result]
+                return market_series_from_rows(rows, resolution, max_points)
         except Exception as e:
             st.error(f"Failed to get market trends: {str(e)}")
-            return []
\ No newline at end of file
+            return empty
+
+
+@st.cache_resource
+def _shared_database_manager() -> DatabaseManager:
+    return DatabaseManager()
+
+
+def get_database_manager() -> DatabaseManager:
+    """Process-wide database manager; a schema setup that failed is retried on later calls"""
+    db = _shared_database_manager()
+    db.retry_schema_setup()
+    return db
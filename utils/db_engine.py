@@ -0,0 +1,215 @@
+"""
+Database Engine for KAN-BUD Container Calculator
+One tuned, metered connection pool per process and schema setup once per deployment
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+import streamlit as st
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Arbitrary constant shared by every process that may run migrations
+SCHEMA_LOCK_KEY = 7262031
+
+# statement_timeout for bulk imports and rollup rebuilds, which outlast the
+# pool-wide DB_STATEMENT_TIMEOUT_MS on large data sets (0 disables it)
+BULK_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_BULK_STATEMENT_TIMEOUT_MS', '0'))
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def normalize_database_url(database_url: str) -> str:
+    """Fix common URL issues"""
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    return database_url
+
+
+class PoolMetrics:
+    """Checkout counts and wait times for a connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics:
+                self.metrics.record_timeout()
+            raise
+        if self.metrics:
+            self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # Keep counting across engine.dispose()
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+@st.cache_resource
+def get_shared_engine(database_url: str):
+    """
+    Process-wide engine for a database URL
+    Pool sizing and timeouts come from DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE, DB_POOL_TIMEOUT and DB_STATEMENT_TIMEOUT_MS
+    """
+    database_url = normalize_database_url(database_url)
+    statement_timeout_ms = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '15000'))
+
+    connect_args = {}
+    if database_url.startswith('postgresql'):
+        connect_args['options'] = f"-c statement_timeout={statement_timeout_ms}"
+        connect_args['connect_timeout'] = int(os.environ.get('DB_CONNECT_TIMEOUT', '10'))
+
+    engine = create_engine(
+        database_url,
+        poolclass=MeteredQueuePool,
+        pool_size=int(os.environ.get('DB_POOL_SIZE', '5')),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+        pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+        pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT', '30')),
+        pool_pre_ping=True,
+        connect_args=connect_args
+    )
+    engine.pool.metrics = PoolMetrics()
+    return engine
+
+
+def get_pool_metrics(engine) -> Dict[str, Any]:
+    """Pool occupancy plus checkout and wait statistics"""
+    pool = engine.pool
+    metrics = getattr(pool, 'metrics', None) or PoolMetrics()
+
+    return {
+        'pool_size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'idle': pool.checkedin(),
+        'overflow': max(0, pool.overflow()),
+        'checkouts': metrics.checkouts,
+        'timeouts': metrics.timeouts,
+        'avg_wait_ms': metrics.total_wait / metrics.checkouts * 1000 if metrics.checkouts else 0.0,
+        'max_wait_ms': metrics.max_wait * 1000
+    }
+
+
+def ensure_schema(engine) -> bool:
+    """
+    Bring the schema to the latest migration once per deployment
+    A cheap version check runs once per process; migrations only run when the
+    recorded version is behind, under an advisory lock so concurrent workers
+    starting together migrate exactly once
+    """
+    key = str(engine.url)
+    with _schema_lock:
+        if key in _schema_ready:
+            return True
+
+        head = schema_head()
+        if _current_schema_version(engine) != head:
+            # Waiting for another worker's migration can outlast the engine's statement_timeout
+            with _without_statement_timeout(engine) as lock_conn:
+                lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {'key': SCHEMA_LOCK_KEY})
+                try:
+                    # Another worker may have finished migrating while we waited
+                    if _current_schema_version(engine) != head:
+                        _run_migrations(engine)
+                finally:
+                    lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': SCHEMA_LOCK_KEY})
+                    lock_conn.commit()
+
+        _schema_ready.add(key)
+        return True
+
+
+def bulk_statement_timeout_sql() -> str:
+    """SET LOCAL for the current transaction only; the pooled connection keeps its own timeout"""
+    return f"SET LOCAL statement_timeout = {BULK_STATEMENT_TIMEOUT_MS}"
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'migrations'))
+    return config
+
+
+@lru_cache(maxsize=1)
+def schema_head() -> str:
+    """Latest revision in migrations/versions; the schema is current when alembic_version matches"""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+
+@contextmanager
+def _without_statement_timeout(engine):
+    """
+    Pooled connection with statement_timeout lifted for long-running schema work
+    RESET restores the engine's connect-time setting before the connection goes back to the pool
+    """
+    with engine.connect() as conn:
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.commit()
+        try:
+            yield conn
+        finally:
+            try:
+                conn.rollback()
+                conn.execute(text("RESET statement_timeout"))
+                conn.commit()
+            except Exception:
+                # Never return a connection without its timeout to the pool
+                conn.invalidate()
+
+
+def _current_schema_version(engine) -> Optional[str]:
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT to_regclass('alembic_version')")).scalar()
+        if not exists:
+            return None
+        return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def _run_migrations(engine):
+    from alembic import command
+
+    config = _alembic_config()
+    with _without_statement_timeout(engine) as conn:
+        config.attributes['connection'] = conn
+        command.upgrade(config, 'head')
+        conn.commit()
@@ -5,62 +5,183 @@ Analyzes PDF drawings and DWG files from customers to extract pricing elements
 
 import streamlit as st
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Iterator, Tuple
 import base64
+import io
+import shutil
+import tempfile
 from utils.ai_services import OpenAIService, AnthropicService
 from utils.groq_service import GroqService
+from utils.analysis_cache import get_analysis_cache, analysis_cache_key, content_hash, prompt_context
+from utils.pdf_extraction import extract_drawing_summary, is_pdf
 import json
 import re
 
+# Bump when the analysis prompts change so results cached under the old prompts are not reused
+ANALYSIS_PROMPT_VERSION = 4
+
+# Only answers read from the drawing or a model are cached; fallbacks are retried on the next upload
+CACHEABLE_METHODS = ('local_pdf_extraction', 'groq_context_analysis', 'openai_text_summary', 'openai_vision')
+
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# Non-seekable uploads are spooled to a temp file, kept in memory up to this size
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+# Bytes encoded per base64 chunk; a multiple of 3 so chunks concatenate without padding
+BASE64_CHUNK_BYTES = 3 * 256 * 1024
+
+OPENAI_VISION_TIMEOUT = 120
+
+
+def upload_size(uploaded_file) -> int:
+    """Size of an upload from its metadata, or by seeking to the end; the content is not read"""
+    size = getattr(uploaded_file, 'size', None)
+    if isinstance(size, int):
+        return size
+    position = uploaded_file.tell()
+    size = uploaded_file.seek(0, io.SEEK_END)
+    uploaded_file.seek(position)
+    return size
+
+
+def seekable_upload(uploaded_file):
+    """The upload itself when seekable, otherwise a spooled temp file copy of it"""
+    if getattr(uploaded_file, 'seekable', lambda: False)():
+        uploaded_file.seek(0)
+        return uploaded_file
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    shutil.copyfileobj(uploaded_file, spooled, BASE64_CHUNK_BYTES)
+    spooled.seek(0)
+    return spooled
+
+
+def iter_base64(upload) -> Iterator[bytes]:
+    """Base64 of the upload's content, encoded chunk by chunk from the start"""
+    upload.seek(0)
+    remainder = b''
+    while True:
+        chunk = upload.read(BASE64_CHUNK_BYTES)
+        if not chunk:
+            break
+        if remainder:
+            chunk = remainder + chunk
+        cut = len(chunk) - len(chunk) % 3
+        remainder = chunk[cut:]
+        if cut:
+            yield base64.b64encode(chunk[:cut])
+    if remainder:
+        yield base64.b64encode(remainder)
+    upload.seek(0)
+
+
+def openai_vision_body(upload, size: int, prompt: str, mime_type: str = 'application/pdf') -> Tuple[int, Iterator[bytes]]:
+    """
+    Chat completion request body with the upload inlined as a base64 data URL
+    Returns the body length and an iterator that encodes the file while the request is sent
+    """
+    placeholder = '__FILE_DATA_URL__'
+    payload = json.dumps({
+        "model": "gpt-4o",  # GPT-4o supports vision
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": placeholder}}
+                ]
+            }
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": 2000
+    })
+    head, tail = payload.split(json.dumps(placeholder))
+    head = f'{head}"data:{mime_type};base64,'.encode()
+    tail = f'"{tail}'.encode()
+
+    def body() -> Iterator[bytes]:
+        yield head
+        yield from iter_base64(upload)
+        yield tail
+
+    return len(head) + 4 * ((size + 2) // 3) + len(tail), body()
+
 class DocumentAnalyzer:
     """Analyzes customer drawings (PDF/DWG) to extract pricing elements"""
 
-    def __init__(self):
+    def __init__(self, rate_limit: Optional[Callable[[str], None]] = None):
         self.openai_service = OpenAIService()
         self.anthropic_service = AnthropicService()
         self.groq_service = GroqService()
+        # Called with the provider name right before each provider request
+        self.rate_limit = rate_limit
+
+    def _wait_for(self, provider: str):
+        if self.rate_limit is not None:
+            self.rate_limit(provider)
 
     def analyze_pdf_drawing(self, uploaded_file, project_context: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyze PDF technical drawing and extract elements for pricing
         """
+        filename = getattr(uploaded_file, 'name', None)
         try:
-            # Ensure file pointer is at beginning
-            uploaded_file.seek(0)
-
-            # Convert file to text content for analysis
-            file_bytes = uploaded_file.read()
+            upload = seekable_upload(uploaded_file)
 
-            # Reset file pointer for potential future use
-            uploaded_file.seek(0)
-
-            # Validate file size (max 20MB)
-            if len(file_bytes) > 20 * 1024 * 1024:
+            # Validate file size (max 20MB) without reading the file
+            size = upload_size(upload)
+            if size > MAX_UPLOAD_BYTES:
                 return {
                     'status': 'failed',
                     'error': 'File too large (max 20MB)',
                     'recommendations': ['Please reduce file size', 'Try compressing the PDF']
                 }
 
+            # Resent drawings are answered from the cache without another LLM call
+            cache = get_analysis_cache()
+            cache_key = analysis_cache_key(content_hash(upload), project_context, ANALYSIS_PROMPT_VERSION)
+            cached = self._cached_result(cache, cache_key)
+            if cached is not None:
+                cached['cache_hit'] = True
+                return cached
+
+            # Read the PDF's own text and vectors first; a drawing with a clear
+            # schedule, dimensions and scale needs no LLM at all. Cached answers
+            # see only the file content and the prompt context their key covers
+            extraction = extract_drawing_summary(upload) if is_pdf(upload) else None
+            if extraction and extraction['confident']:
+                result = self._result_from_extraction(extraction, prompt_context(project_context))
+                self._cache_result(cache, cache_key, result)
+                return result
+
             analysis_prompt = self._build_drawing_analysis_prompt(project_context)
 
             # Try Groq first (free and fast), then fallback to intelligent analysis
             try:
                 st.info("🤖 Analyzing drawing with Groq AI...")
-                result = self._analyze_with_groq(uploaded_file.name, analysis_prompt, project_context)
+                result = self._analyze_with_groq(analysis_prompt, prompt_context(project_context), extraction)
                 result['ai_model_used'] = 'Groq Llama3'
                 result['status'] = 'success'
+                self._cache_result(cache, cache_key, result)
                 return result
             except Exception as e:
                 st.warning(f"Groq analysis failed: {str(e)}")
 
                 # Try OpenAI if available
                 try:
-                    if len(file_bytes) < 20 * 1024 * 1024:  # Only try if file is under 20MB
-                        base64_file = base64.b64encode(file_bytes).decode()
-                        result = self._analyze_with_openai(base64_file, analysis_prompt)
+                    if extraction and extraction['has_text_layer']:
+                        # The extracted summary replaces uploading the whole file
+                        result = self._analyze_with_openai_summary(
+                            analysis_prompt + self._extraction_prompt(extraction))
                         result['ai_model_used'] = 'OpenAI GPT-4o'
                         result['status'] = 'success'
+                        self._cache_result(cache, cache_key, result)
+                        return result
+                    elif size < MAX_UPLOAD_BYTES:  # Only try if file is under 20MB
+                        result = self._analyze_with_openai(upload, size, analysis_prompt)
+                        result['ai_model_used'] = 'OpenAI GPT-4o'
+                        result['status'] = 'success'
+                        self._cache_result(cache, cache_key, result)
                         return result
                     else:
                         raise Exception("File too large for OpenAI analysis")
@@ -69,12 +190,76 @@ class DocumentAnalyzer:
 
                 # Use intelligent fallback based on filename and context
                 st.info("🧠 Using intelligent fallback analysis...")
-                return self._get_unified_fallback_analysis(project_context, uploaded_file.name, "intelligent")
+                return self._get_unified_fallback_analysis(project_context, filename, "intelligent")
 
         except Exception as e:
             st.error(f"Document analysis error: {str(e)}")
             return self._get_unified_fallback_analysis(project_context, None, "basic")
 
+    def _result_from_extraction(self, extraction: Dict[str, Any], project_context: Dict[str, Any]) -> Dict[str, Any]:
+        """Analysis result built from what was read from the PDF itself"""
+        result = self._get_unified_fallback_analysis(project_context, None, "intelligent")
+
+        structural = result['structural_elements']
+        structural['windows']['count'] = extraction['windows']
+        structural['doors']['count'] = extraction['doors']
+
+        for name, found in extraction['installations'].items():
+            mentions = found['mentions']
+            result['installations'][name] = {
+                'complexity': 'basic' if mentions == 0 else 'standard' if mentions <= 3 else 'advanced',
+                'elements': found['elements']
+            }
+
+        result['specifications']['dimensions'] = {
+            'scale': extraction['scale'],
+            'annotations_mm': extraction['dimensions_mm']
+        }
+        result['specifications']['title_block'] = extraction['title_block']
+        result['recommendations'] = [
+            "Elementy odczytane bezpośrednio z rysunku PDF (bez analizy AI)",
+            "Zalecana ręczna weryfikacja przez zespół techniczny"
+        ]
+        result['pdf_extraction'] = extraction
+        result['analysis_confidence'] = 'high'
+        result['analysis_method'] = 'local_pdf_extraction'
+        result['ai_model_used'] = 'Local PDF extraction'
+        result['status'] = 'success'
+        return result
+
+    @staticmethod
+    def _extraction_prompt(extraction: Optional[Dict[str, Any]]) -> str:
+        if not extraction:
+            return ""
+        data = {key: value for key, value in extraction.items() if key != 'confident'}
+        return f"""
+
+        DANE ODCZYTANE Z PLIKU PDF (warstwa tekstowa i wektory):
+        {json.dumps(data, ensure_ascii=False)}
+
+        Traktuj te dane jako najważniejsze źródło; wymiary i skala pochodzą z rysunku.
+        Pola windows/doors to ilości z zestawienia (null, jeśli go brak). Pola window_tags/door_tags
+        to różne oznaczenia otworów znalezione na rzucie - traktuj je jako wskazówkę, nie jako liczbę sztuk.
+        """
+
+    @staticmethod
+    def _cached_result(cache, cache_key: str) -> Optional[Dict[str, Any]]:
+        if cache is None:
+            return None
+        try:
+            return cache.get(cache_key)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _cache_result(cache, cache_key: str, result: Dict[str, Any]):
+        if cache is None or result.get('analysis_method') not in CACHEABLE_METHODS:
+            return
+        try:
+            cache.put(cache_key, result)
+        except Exception:
+            pass  # A full or locked cache must not fail the analysis
+
     def analyze_dwg_metadata(self, uploaded_file) -> Dict[str, Any]:
         """
         Analyze DWG file metadata and extract available information
@@ -83,14 +268,11 @@ class DocumentAnalyzer:
         try:
             file_info = {
                 'filename': uploaded_file.name,
-                'size_bytes': len(uploaded_file.read()),
+                'size_bytes': upload_size(uploaded_file),
                 'file_type': 'DWG',
                 'analysis_method': 'metadata_extraction'
             }
 
-            # Reset file pointer
-            uploaded_file.seek(0)
-
             # For now, we'll use AI to analyze the file context based on filename and user input
             # In production, you might want to use libraries like ezdxf for full DWG parsing
 
@@ -182,50 +364,76 @@ class DocumentAnalyzer:
         Bądź precyzyjny i szczegółowy. Jeśli na rysunku brakuje informacji, zaznacz to w odpowiedzi.
         """
 
-    def _analyze_with_openai(self, base64_file: str, prompt: str) -> Dict[str, Any]:
+    def _analyze_with_openai(self, upload, size: int, prompt: str) -> Dict[str, Any]:
         """Analyze drawing using OpenAI GPT-4o with vision"""
 
         try:
+            import httpx
+
+            # The file is base64-encoded into the request body as it is sent,
+            # so no encoded copy of the whole file is ever held in memory
+            content_length, body = openai_vision_body(upload, size, prompt)
+            client = self.openai_service.client
+            self._wait_for('openai')
+            response = httpx.post(
+                f"{str(client.base_url).rstrip('/')}/chat/completions",
+                content=body,
+                headers={
+                    'Authorization': f'Bearer {client.api_key}',
+                    'Content-Type': 'application/json',
+                    'Content-Length': str(content_length)
+                },
+                timeout=OPENAI_VISION_TIMEOUT
+            )
+            response.raise_for_status()
+
+            result = json.loads(response.json()['choices'][0]['message']['content'])
+            result['analysis_confidence'] = 'high'
+            result['analysis_method'] = 'openai_vision'
+
+            return result
+
+        except Exception as e:
+            raise Exception(f"OpenAI analysis failed: {str(e)}")
+
+    def _analyze_with_openai_summary(self, prompt: str) -> Dict[str, Any]:
+        """Analyze drawing using OpenAI GPT-4o on the extracted PDF summary, without uploading the file"""
+
+        try:
+            self._wait_for('openai')
             response = self.openai_service.client.chat.completions.create(
-                model="gpt-4o",  # GPT-4o supports vision
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": f"data:application/pdf;base64,{base64_file}"}
-                            }
-                        ]
-                    }
-                ],
+                model="gpt-4o",
+                messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"},
                 max_tokens=2000
             )
 
             result = json.loads(response.choices[0].message.content)
             result['analysis_confidence'] = 'high'
-            result['analysis_method'] = 'openai_vision'
+            result['analysis_method'] = 'openai_text_summary'
 
             return result
 
         except Exception as e:
             raise Exception(f"OpenAI analysis failed: {str(e)}")
 
-    def _analyze_with_groq(self, filename: str, prompt: str, project_context: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze drawing using Groq based on filename and context"""
+    def _analyze_with_groq(self, prompt: str, project_context: Dict[str, Any],
+                           extraction: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Analyze drawing using Groq based on the extracted PDF summary and context
+
+        ``project_context`` must be the prompt context the analysis cache key
+        covers; the file name is not sent, so a cached answer never depends on it.
+        """
 
-        # Build enhanced prompt with filename context
+        # Build enhanced prompt with the project context
         enhanced_prompt = f"""
-        {prompt}
+        {prompt}{self._extraction_prompt(extraction)}
 
         DODATKOWE INFORMACJE:
-        - Nazwa pliku: {filename}
-        - Kontekst projektu: {json.dumps(project_context, indent=2)}
+        - Kontekst projektu: {json.dumps(project_context, indent=2, ensure_ascii=False)}
 
-        Na podstawie nazwy pliku i kontekstu projektu, przeprowadź inteligentną analizę i oszacuj elementy konstrukcyjne.
-        Jeśli nazwa pliku zawiera wskazówki (np. "plan", "elewacja", "przekroj"), uwzględnij to w analizie.
+        Na podstawie danych z pliku PDF (jeśli są) i kontekstu projektu, przeprowadź inteligentną analizę i oszacuj elementy konstrukcyjne.
 
         WAŻNE: Odpowiedz wyłącznie poprawnym JSON bez żadnych dodatkowych komentarzy, markdown ani formatowania.
         Format JSON:
@@ -234,12 +442,13 @@ class DocumentAnalyzer:
 
         try:
             # Use Groq for text-based analysis
+            self._wait_for('groq')
             response = self.groq_service.client.chat.completions.create(
                 model="llama3-8b-8192",
                 messages=[
                     {
                         "role": "system",
-                        "content": "Jesteś ekspertem od analizy rysunków technicznych kontenerów. Analizujesz na podstawie nazwy pliku i kontekstu projektu. Odpowiadaj WYŁĄCZNIE poprawnym JSON bez dodatkowych tekstów."
+                        "content": "Jesteś ekspertem od analizy rysunków technicznych kontenerów. Analizujesz na podstawie danych odczytanych z rysunku i kontekstu projektu. Odpowiadaj WYŁĄCZNIE poprawnym JSON bez dodatkowych tekstów."
                     },
                     {
                         "role": "user",
@@ -291,10 +500,10 @@ class DocumentAnalyzer:
                 except json.JSONDecodeError:
                     pass
 
-            # If all parsing methods fail, use fallback
+            # If all parsing methods fail, use fallback (not cached as a Groq answer)
             if not result:
                 st.warning(f"Groq returned invalid JSON: {result_text[:200]}...")
-                result = self._get_unified_fallback_analysis(project_context, filename, "groq_fallback")
+                return self._get_unified_fallback_analysis(project_context, None, "groq_fallback")
 
             # Ensure required structure
             if result:
@@ -313,7 +522,7 @@ class DocumentAnalyzer:
 
         except Exception as e:
             st.warning(f"Groq analysis error: {str(e)}")
-            return self._get_unified_fallback_analysis(project_context, filename, "error_fallback")
+            return self._get_unified_fallback_analysis(project_context, None, "error_fallback")
 
 
 
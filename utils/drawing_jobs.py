@@ -0,0 +1,411 @@
+"""
+Drawing Analysis Jobs for KAN-BUD Container Calculator
+Local job queue that analyzes uploaded drawings in a worker process pool under provider rate limits
+"""
+
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Any, Optional
+
+import streamlit as st
+
+from utils.local_paths import data_path
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS drawing_jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT,
+    filename TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    project_context TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_drawing_jobs_status_created ON drawing_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_drawing_jobs_owner_created ON drawing_jobs(owner, created_at);
+
+-- Token buckets shared by every worker process calling a provider
+CREATE TABLE IF NOT EXISTS provider_rate_limits (
+    provider TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+FINISHED_STATUSES = ('done', 'failed')
+
+# Requests per minute allowed per provider; Groq's free tier allows 30, OpenAI's first paid tier 500
+PROVIDER_RATE_LIMITS = {
+    'groq': float(os.environ.get('KANBUD_GROQ_RPM', '30')),
+    'openai': float(os.environ.get('KANBUD_OPENAI_RPM', '500')),
+}
+
+# Seconds between queue checks when nothing wakes the dispatcher
+POLL_INTERVAL = 1.0
+
+# Seconds between page refreshes while a user's jobs are unfinished
+STATUS_POLL_SECONDS = 2
+
+# Running jobs older than this were orphaned by a stopped process and are requeued
+STALE_AFTER = timedelta(minutes=10)
+
+# Finished jobs and their results are kept this long
+RESULT_RETENTION = timedelta(days=7)
+
+_UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def job_kind(filename: str) -> str:
+    """'pdf', 'dwg' or 'image' from the upload's extension"""
+    name = filename.lower()
+    if name.endswith('.pdf'):
+        return 'pdf'
+    if name.endswith('.dwg'):
+        return 'dwg'
+    return 'image'
+
+
+def _provider(kind: str) -> str:
+    # DWG files are only inspected locally; everything else may end in a Groq call
+    return 'local' if kind == 'dwg' else 'groq'
+
+
+def provider_rate_limit(db_path: str) -> Callable[[str], None]:
+    """Hook that blocks until a provider may be called, under limits shared through ``db_path``"""
+    limiters = {provider: RateLimiter(db_path, provider, rpm)
+                for provider, rpm in PROVIDER_RATE_LIMITS.items() if rpm > 0}
+
+    def wait(provider: str):
+        limiter = limiters.get(provider)
+        if limiter is not None:
+            limiter.acquire()
+
+    return wait
+
+
+def _analyze_job(file_path: str, filename: str, kind: str, project_context: Dict[str, Any],
+                 db_path: str) -> Dict[str, Any]:
+    """Worker process entry point: run the analyzer on a stored upload"""
+    from utils.document_analyzer import DocumentAnalyzer
+
+    # Read from disk as needed rather than loading the upload into memory
+    raw = io.FileIO(file_path, 'rb')
+    raw.name = filename
+    with io.BufferedReader(raw) as upload:
+        # Tokens are taken right before each provider call, so cache hits and
+        # confident local extractions never spend one
+        analyzer = DocumentAnalyzer(rate_limit=provider_rate_limit(db_path))
+        if kind == 'dwg':
+            return analyzer.analyze_dwg_metadata(upload)
+        return analyzer.analyze_pdf_drawing(upload, project_context)
+
+
+class RateLimiter:
+    """
+    Token bucket allowing ``per_minute`` acquisitions per minute, with bursts up to that size
+
+    The bucket is a row in the jobs database, updated under SQLite's write
+    lock, so every worker process calling the provider draws on one budget.
+    """
+
+    def __init__(self, db_path: str, provider: str, per_minute: float):
+        self.db_path = db_path
+        self.provider = provider
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.executescript(SCHEMA_SQL)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _take(self) -> float:
+        """Take a token if one is available; returns 0 when taken, else the seconds until one is"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM provider_rate_limits WHERE provider = ?",
+                               (self.provider,)).fetchone()
+            now = time.time()
+            tokens = self.capacity if row is None else min(self.capacity,
+                                                           row[0] + max(0.0, now - row[1]) * self.rate)
+            taken = tokens >= 1.0
+            conn.execute("""
+                INSERT INTO provider_rate_limits (provider, tokens, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (provider) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+            """, (self.provider, tokens - 1.0 if taken else tokens, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if taken else (1.0 - tokens) / self.rate
+
+    def acquire(self, stop: threading.Event = None) -> bool:
+        """Block until a token is available; False if ``stop`` was set while waiting"""
+        while True:
+            wait = self._take()
+            if wait <= 0.0:
+                return True
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class DrawingJobQueue:
+    """
+    Drawing analysis jobs persisted in a local SQLite database
+
+    Uploads are written to the data directory and recorded as queued jobs.
+    A dispatcher thread claims queued jobs and hands them to a process pool,
+    so several drawings are analyzed at once without blocking any Streamlit
+    script. Workers wait on the shared rate limit of the provider they are
+    about to call. Status and results stay in the database, so pages only
+    poll by job id and survive navigation and reruns.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, upload_dir: Optional[str] = None,
+                 max_workers: Optional[int] = None):
+        self.db_path = db_path or os.environ.get('KANBUD_JOBS_PATH') or data_path('drawing_jobs.db')
+        self.upload_dir = upload_dir or data_path('drawing_uploads')
+        self.max_workers = max_workers or int(os.environ.get('KANBUD_ANALYSIS_WORKERS', '4'))
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+        self._local = threading.local()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA_SQL)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Requeue orphaned jobs, drop expired results and start dispatching"""
+        if self._thread is not None:
+            return
+        self._recover()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._thread = threading.Thread(target=self._run, name='drawing-job-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _recover(self):
+        now = datetime.now()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE drawing_jobs SET status = 'queued', started_at = NULL "
+                "WHERE status = 'running' AND started_at < ?",
+                ((now - STALE_AFTER).isoformat(),)
+            )
+            conn.execute(
+                "DELETE FROM drawing_jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                ((now - RESULT_RETENTION).isoformat(),)
+            )
+
+    def enqueue(self, uploaded_file, project_context: Dict[str, Any], owner: Optional[str] = None) -> str:
+        """Store an upload and queue it for analysis; returns the job id"""
+        job_id = uuid.uuid4().hex
+        filename = os.path.basename(uploaded_file.name)
+        file_path = os.path.join(self.upload_dir, f"{job_id}_{_UNSAFE_FILENAME.sub('_', filename)}")
+
+        with open(file_path, 'wb') as f:
+            if hasattr(uploaded_file, 'getbuffer'):
+                with uploaded_file.getbuffer() as view:
+                    f.write(view)
+            else:
+                uploaded_file.seek(0)
+                shutil.copyfileobj(uploaded_file, f)
+                uploaded_file.seek(0)
+
+        kind = job_kind(filename)
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                INSERT INTO drawing_jobs (id, owner, filename, kind, provider, file_path,
+                                          project_context, status, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', ?)
+            """, (job_id, owner, filename, kind, _provider(kind), file_path,
+                  json.dumps(project_context, default=str), datetime.now().isoformat()))
+
+        self._wake.set()
+        return job_id
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                self._dispatch()
+            except Exception:
+                # Keep the dispatcher alive; the next wake-up retries
+                pass
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            with self._in_flight_lock:
+                if self._in_flight >= self.max_workers:
+                    return
+            job = self._claim_next()
+            if job is None:
+                return
+
+            try:
+                future = self._executor.submit(_analyze_job, job['file_path'], job['filename'], job['kind'],
+                                               json.loads(job['project_context']), self.db_path)
+            except BrokenProcessPool:
+                # A worker died and took the pool with it; start a fresh one and retry the job
+                self._requeue(job)
+                self._replace_executor()
+                continue
+            except BaseException:
+                self._requeue(job)
+                raise
+
+            with self._in_flight_lock:
+                self._in_flight += 1
+            future.add_done_callback(lambda done, job=job: self._finish(job, done))
+
+    def _replace_executor(self):
+        broken, self._executor = self._executor, ProcessPoolExecutor(max_workers=self.max_workers)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _requeue(self, job: sqlite3.Row):
+        """Return a claimed job to the queue without counting it as an attempt"""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE drawing_jobs SET status = 'queued', started_at = NULL WHERE id = ? AND status = 'running'",
+                (job['id'],)
+            )
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        """Mark the oldest queued job as running; other processes sharing the file never claim it twice"""
+        conn = self._connection()
+        while True:
+            row = conn.execute(
+                "SELECT * FROM drawing_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            with conn:
+                claimed = conn.execute(
+                    "UPDATE drawing_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+                    (datetime.now().isoformat(), row['id'])
+                ).rowcount
+            if claimed:
+                return row
+
+    def _finish(self, job: sqlite3.Row, future):
+        try:
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                result, error = None, str(e) or type(e).__name__
+
+            status = 'done' if error is None else 'failed'
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "UPDATE drawing_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (status, json.dumps(result, default=str) if result is not None else None, error,
+                     datetime.now().isoformat(), job['id'])
+                )
+            self._remove_upload(job['file_path'])
+        finally:
+            # Free the slot even if recording the result failed; _recover requeues the job later
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    @staticmethod
+    def _remove_upload(file_path: str):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+    def get_jobs(self, job_ids: List[str]) -> List[Dict[str, Any]]:
+        """Jobs in the order of ``job_ids``, with parsed results; unknown ids are skipped"""
+        if not job_ids:
+            return []
+        placeholders = ', '.join('?' * len(job_ids))
+        rows = self._connection().execute(
+            f"SELECT id, owner, filename, kind, status, result, error, created_at, started_at, finished_at "
+            f"FROM drawing_jobs WHERE id IN ({placeholders})",
+            list(job_ids)
+        ).fetchall()
+
+        jobs = {}
+        for row in rows:
+            job = dict(row)
+            job['result'] = json.loads(row['result']) if row['result'] else None
+            jobs[row['id']] = job
+        return [jobs[job_id] for job_id in job_ids if job_id in jobs]
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        jobs = self.get_jobs([job_id])
+        return jobs[0] if jobs else None
+
+    def stats(self) -> Dict[str, int]:
+        counts = dict(self._connection().execute(
+            "SELECT status, COUNT(*) FROM drawing_jobs GROUP BY status"
+        ).fetchall())
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+
+def jobs_finished(jobs: List[Dict[str, Any]]) -> bool:
+    return all(job['status'] in FINISHED_STATUSES for job in jobs)
+
+
+@st.cache_resource
+def get_drawing_job_queue() -> DrawingJobQueue:
+    """Process-wide drawing job queue with its dispatcher running"""
+    queue = DrawingJobQueue()
+    queue.start()
+    return queue
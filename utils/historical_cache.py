@@ -0,0 +1,237 @@
+"""
+Historical Data Cache for KAN-BUD Container Calculator
+Process-wide frame of historical projects, warmed in the background and refreshed incrementally
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+CATEGORICAL_COLUMNS = ['container_type', 'use_case', 'location']
+
+HISTORICAL_SELECT_COLUMNS = [
+    'id', 'project_date', 'container_type', 'use_case', 'location', 'actual_cost', 'estimated_cost',
+    'materials_cost', 'labor_cost', 'delivery_cost', 'modifications', 'project_duration_days',
+    'customer_satisfaction', 'created_at', 'updated_at'
+]
+
+NUMERIC_COLUMNS = ['actual_cost', 'estimated_cost', 'materials_cost', 'labor_cost', 'delivery_cost',
+                   'project_duration_days', 'customer_satisfaction']
+
+DATETIME_COLUMNS = ['project_date', 'created_at', 'updated_at']
+
+# Each refresh re-reads rows stamped this far before the newest updated_at it has seen,
+# so rows written by a transaction that committed after a later one are not skipped
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+
+def normalize_historical_frame(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
+    """
+    One normalized copy of the historical data: parsed dates in a sorted
+    DatetimeIndex, categorical text columns and precomputed month columns
+
+    With ``copy=False`` a frame nobody else holds is normalized in place,
+    and rows already in date order are not copied again by sorting.
+    """
+    frame = df.copy() if copy else df
+    frame['project_date'] = pd.to_datetime(frame['project_date'], errors='coerce')
+    if frame['project_date'].isna().any():
+        frame = frame.dropna(subset=['project_date'])
+    if not frame['project_date'].is_monotonic_increasing:
+        frame = frame.sort_values('project_date', kind='stable')
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in frame.columns:
+            frame[col] = frame[col].astype('category')
+
+    frame['month'] = frame['project_date'].dt.month
+    frame['year_month'] = frame['project_date'].dt.to_period('M')
+    frame.index = pd.DatetimeIndex(frame['project_date'], name='date')
+    return frame
+
+
+class HistoricalFrameCache:
+    """
+    historical_projects held once per process as a normalized DataFrame
+
+    The first load streams the table through a server-side cursor in chunks.
+    Later refreshes only fetch rows updated since shortly before the newest
+    updated_at seen (see WATERMARK_OVERLAP), keep those whose (id, updated_at)
+    is not in the frame yet and merge them by id; if the row count no longer
+    matches (e.g. rows were deleted) the frame is reloaded from scratch.
+    ``version`` increases on every change so consumers can tell when to drop
+    derived caches.
+    """
+
+    def __init__(self, engine, chunk_size: int = 20000, refresh_interval: float = 300.0):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.refresh_interval = refresh_interval
+        self.frame: Optional[pd.DataFrame] = None
+        self.version = 0
+        self.watermark = None
+        self.last_refresh = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Warm the cache in a daemon thread and keep refreshing it"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='kanbud-historical-cache', daemon=True)
+            self._thread.start()
+
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        return self._loaded.wait(timeout)
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_interval)
+
+    def refresh(self) -> bool:
+        """Fetch new and changed rows; returns True if the frame changed"""
+        with self._lock:
+            try:
+                changed = self._refresh()
+                self.last_error = None
+                self.last_refresh = datetime.now()
+                return changed
+            except Exception as e:
+                # Runs off the script thread, so keep the error for the Admin Panel instead of st.error
+                self.last_error = str(e)
+                return False
+            finally:
+                self._loaded.set()
+
+    def _refresh(self) -> bool:
+        with self.engine.connect() as conn:
+            row_count = conn.execute(text("SELECT COUNT(*) FROM historical_projects")).scalar()
+
+        if self.frame is None:
+            self._publish(self._stream(size_hint=row_count))
+            return True
+
+        since = self.watermark - WATERMARK_OVERLAP if self.watermark is not None else None
+        changed = self._unseen_rows(self._stream(since))
+        if changed.empty and row_count == len(self.frame):
+            return False
+
+        if not changed.empty:
+            kept = self.frame[~self.frame['id'].isin(changed['id'])]
+            combined = pd.concat([kept.reset_index(drop=True)[HISTORICAL_SELECT_COLUMNS], changed],
+                                 ignore_index=True)
+            if len(combined) == row_count:
+                self._publish(combined)
+                return True
+
+        # Rows were deleted (or written while this refresh ran); resync everything
+        self._publish(self._stream(size_hint=row_count))
+        return True
+
+    def _unseen_rows(self, recent: pd.DataFrame) -> pd.DataFrame:
+        """Rows whose (id, updated_at) is not in the frame yet: new rows and rows changed in place"""
+        if recent.empty:
+            return recent
+        known = pd.Series(self.frame['updated_at'].to_numpy(), index=self.frame['id'].to_numpy())
+        previous = known.reindex(recent['id'].to_numpy()).to_numpy()
+        unseen = pd.isna(previous) | (previous != recent['updated_at'].to_numpy())
+        return recent[unseen].reset_index(drop=True)
+
+    def _stream(self, since: Optional[datetime] = None, size_hint: int = 0) -> pd.DataFrame:
+        """
+        Read rows updated after ``since`` (all rows when None) over a server-side cursor
+
+        Each chunk is converted and copied into preallocated column arrays, so
+        the peak is the finished frame plus one chunk rather than every chunk
+        plus their concatenation.
+        """
+        if since is None:
+            # A full load comes back in date order, so normalizing it needs no sort
+            where_clause, order_by, params = "", "project_date, id", {}
+        else:
+            where_clause, order_by, params = "WHERE updated_at > :since", "updated_at, id", {'since': since}
+
+        query = f"""
+        SELECT {', '.join(HISTORICAL_SELECT_COLUMNS)}
+        FROM historical_projects
+        {where_clause}
+        ORDER BY {order_by}
+        """
+
+        columns: Dict[str, np.ndarray] = {}
+        filled = 0
+        with self.engine.connect() as conn:
+            streaming = conn.execution_options(stream_results=True, max_row_buffer=self.chunk_size)
+            for rows in streaming.execute(text(query), params).partitions(self.chunk_size):
+                end = filled + len(rows)
+                for col, values in _chunk_arrays(rows).items():
+                    buffer = columns.get(col)
+                    if buffer is None:
+                        buffer = np.empty(max(size_hint, end), dtype=values.dtype)
+                    elif len(buffer) < end:
+                        # More rows than the hint (written since the count); grow geometrically
+                        grown = np.empty(max(end, 2 * len(buffer)), dtype=buffer.dtype)
+                        grown[:filled] = buffer[:filled]
+                        buffer = grown
+                    buffer[filled:end] = values
+                    columns[col] = buffer
+                filled = end
+
+        if not filled:
+            return pd.DataFrame(columns=HISTORICAL_SELECT_COLUMNS)
+
+        frame = pd.DataFrame(index=pd.RangeIndex(filled))
+        for col in HISTORICAL_SELECT_COLUMNS:
+            frame[col] = columns.pop(col)[:filled]
+        return frame
+
+    def _publish(self, frame: pd.DataFrame):
+        latest = pd.to_datetime(frame['updated_at']).max() if not frame.empty else None
+        self.watermark = None if latest is None or pd.isna(latest) else latest.to_pydatetime()
+        self.frame = normalize_historical_frame(frame, copy=False)
+        self.version += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rows': len(self.frame) if self.frame is not None else 0,
+            'version': self.version,
+            'watermark': self.watermark,
+            'last_refresh': self.last_refresh,
+            'last_error': self.last_error
+        }
+
+
+def _chunk_arrays(rows) -> Dict[str, np.ndarray]:
+    """One fetched chunk as a fixed-dtype array per column"""
+    chunk = pd.DataFrame.from_records(rows, columns=HISTORICAL_SELECT_COLUMNS)
+    arrays = {}
+    for col in HISTORICAL_SELECT_COLUMNS:
+        if col == 'id':
+            arrays[col] = chunk[col].to_numpy(dtype=np.int64)
+        elif col in DATETIME_COLUMNS:
+            arrays[col] = pd.to_datetime(chunk[col], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        elif col in NUMERIC_COLUMNS:
+            arrays[col] = pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=float)
+        else:
+            arrays[col] = chunk[col].to_numpy(dtype=object)
+    return arrays
+
+
+@st.cache_resource
+def get_historical_frame_cache() -> Optional[HistoricalFrameCache]:
+    """Process-wide historical cache, warming in the background (None without Postgres)"""
+    from utils.database import get_database_manager
+    db = get_database_manager()
+    if not db.engine:
+        return None
+    cache = HistoricalFrameCache(db.engine)
+    cache.start()
+    return cache
@@ -5,31 +5,106 @@ Integrates 2-year historical calculation results for improved pricing accuracy
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable
 from datetime import datetime, timedelta
 import streamlit as st
-from utils.database import DatabaseManager
+from utils.database import DatabaseManager, get_database_manager
+from utils.historical_ingest import HistoricalUploadIngestor, HistoricalIngestError
+from utils.historical_cache import normalize_historical_frame, get_historical_frame_cache
+from utils.similar_projects import SimilarProjectIndex
+from utils.cost_correction import get_cost_correction_model
+from utils.trend_engine import TrendEngine, DEFAULT_SEGMENT_COLUMNS
+
+# Distinct (container_type, use_case) filters remembered per loaded frame
+MAX_CACHED_FILTERS = 256
+
+# Per-segment sums behind the accuracy metrics; sums pool exactly across segments
+ACCURACY_STAT_COLUMNS = ['n', 'sum_abs_error', 'sum_pct_error', 'within_10', 'within_20',
+                         'over', 'under', 'sum_ratio', 'sum_ratio_sq']
+
+# Seconds a first page load waits for the background warm-up before falling back
+CACHE_WARMUP_WAIT = 10
+
+
+def accuracy_metrics_frame(stats: pd.DataFrame) -> pd.DataFrame:
+    """Accuracy metrics from per-segment sums (MAE, MAPE, hit rates, bias, ratio mean/std)"""
+    n = stats['n'].astype(float)
+    ratio_mean = stats['sum_ratio'] / n
+    ratio_var = (stats['sum_ratio_sq'] / n - ratio_mean ** 2).clip(lower=0)
+    return pd.DataFrame({
+        'mae': stats['sum_abs_error'] / n,
+        'mape': stats['sum_pct_error'] / n,
+        'within_10_pct': stats['within_10'] / n * 100,
+        'within_20_pct': stats['within_20'] / n * 100,
+        'overestimate_pct': stats['over'] / n * 100,
+        'underestimate_pct': stats['under'] / n * 100,
+        'bias_pct': (stats['over'] - stats['under']) / n * 100,
+        'ratio_mean': ratio_mean,
+        'ratio_std': np.sqrt(ratio_var)
+    }, index=stats.index)
+
 
 class HistoricalDataService:
     """Service for handling historical project data and improving cost accuracy"""
     
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.historical_data = None
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database_manager()
+        self._historical_data = None
+        self._filter_cache = {}
+        self._accuracy_table = None
+        self._accuracy_segments = {}
+        self._similar_index = None
+        self._trend_engines = {}
+        self._cache = None
+        self._cache_version = None
         self.load_historical_data()
     
+    @property
+    def historical_data(self) -> Optional[pd.DataFrame]:
+        self._sync_from_cache()
+        return self._historical_data
+    
+    @historical_data.setter
+    def historical_data(self, df: Optional[pd.DataFrame]):
+        # Normalize once on load; every lookup afterwards reads this frame
+        self._historical_data = normalize_historical_frame(df) if df is not None else None
+        self._filter_cache = {}
+        self._accuracy_table = None
+        self._accuracy_segments = {}
+        self._similar_index = None
+        self._trend_engines = {}
+    
+    def _sync_from_cache(self):
+        """Pick up the shared frame whenever the background refresh published a new version"""
+        if self._cache is None:
+            return
+        version = self._cache.version
+        if version == self._cache_version:
+            return
+        frame = self._cache.frame
+        if frame is not None:
+            # Already normalized by the cache, so skip the setter
+            self._historical_data = frame
+            self._filter_cache = {}
+            self._accuracy_table = None
+            self._accuracy_segments = {}
+            self._similar_index = None
+            self._trend_engines = {}
+        self._cache_version = version
+    
     def load_historical_data(self):
-        """Load historical data from database or initialize if empty"""
+        """Load historical data from the shared database cache or initialize if empty"""
         try:
             if self.db and self.db.engine:
-                # Try to load existing historical data
-                from sqlalchemy import text
-                query = "SELECT COUNT(*) FROM historical_projects"
-                with self.db.engine.connect() as conn:
-                    result = conn.execute(text(query)).fetchone()
-                    if result[0] == 0:
-                        # If no data exists, create sample structure for data import
-                        self.initialize_sample_structure()
+                self._cache = get_historical_frame_cache()
+                if self._cache is not None:
+                    self._cache.wait_until_loaded(CACHE_WARMUP_WAIT)
+                    if self._cache.last_error and st.session_state.get('employee_logged_in', False):
+                        st.warning(f"Historical data initialization: {self._cache.last_error}")
+                    self._sync_from_cache()
+            if self._historical_data is None:
+                # If no data exists, create sample structure for data import
+                self.initialize_sample_structure()
         except Exception as e:
             # Only show database errors to employees/admins
             if st.session_state.get('employee_logged_in', False):
@@ -55,10 +130,12 @@ class HistoricalDataService:
         }
         self.historical_data = pd.DataFrame(sample_data)
     
-    def import_historical_projects(self, file_path: str = None, data: List[Dict] = None) -> bool:
+    def import_historical_projects(self, file_path: str = None, data: List[Dict] = None,
+                                   df: pd.DataFrame = None,
+                                   progress_callback: Optional[Callable[[int, Optional[int]], None]] = None) -> bool:
         """
         Import your 2-year historical calculation results
-        Accepts either file path (CSV/Excel) or direct data list
+        Accepts a file path (CSV/Excel), a DataFrame or a direct data list
         """
         try:
             if file_path:
@@ -70,6 +147,8 @@ class HistoricalDataService:
                 else:
                     st.error("Unsupported file format. Please use CSV or Excel.")
                     return False
+            elif df is not None:
+                df = df.copy()
             elif data:
                 df = pd.DataFrame(data)
             else:
@@ -89,11 +168,12 @@ class HistoricalDataService:
             
             # Save to database
             if self.db and self.db.engine:
-                data_records = df.to_dict('records')
-                success = self.db.insert_historical_data(data_records)
-                if success:
-                    st.success(f"Successfully imported {len(data_records)} historical projects!")
-                    self.historical_data = df
+                result = self.db.bulk_load_historical(df, progress_callback=progress_callback)
+                if result:
+                    st.success(f"Successfully imported {result['staged']} historical projects "
+                               f"({result['inserted']} new, {result['updated']} updated)!")
+                    # The shared frame picks up the imported rows alongside everything else
+                    self.refresh_from_database()
                     return True
             
             return False
@@ -102,6 +182,41 @@ class HistoricalDataService:
             st.error(f"Error importing historical data: {str(e)}")
             return False
     
+    def import_historical_upload(self, uploaded_file, filename: str, chunk_size: int = 20000,
+                                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+                                 ) -> Optional[Dict[str, Any]]:
+        """
+        Stream a CSV/Excel upload into the database chunk by chunk
+        Invalid rows are written to a rejected-rows file instead of failing the import
+        """
+        if not (self.db and self.db.engine):
+            st.error("Database not available for historical data import.")
+            return None
+        
+        ingestor = HistoricalUploadIngestor(uploaded_file, filename, chunk_size=chunk_size,
+                                            progress_callback=progress_callback)
+        try:
+            result = self.db.bulk_load_historical(ingestor.chunks(), chunk_size=chunk_size)
+        except HistoricalIngestError as e:
+            st.error(str(e))
+            return None
+        
+        if result is None:
+            return None
+        
+        summary = ingestor.summary()
+        summary.update(result)
+        self.refresh_from_database()
+        return summary
+    
+    def refresh_from_database(self) -> bool:
+        """Pull new and changed rows into the shared cache now instead of at the next interval"""
+        if self._cache is None:
+            return False
+        changed = self._cache.refresh()
+        self._sync_from_cache()
+        return changed
+    
     def clean_historical_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean and validate historical data"""
         
@@ -128,76 +243,132 @@ class HistoricalDataService:
         
         return df
     
-    def get_historical_accuracy_metrics(self, container_type: str = None, 
-                                      use_case: str = None) -> Dict[str, Any]:
-        """Calculate accuracy metrics from historical data"""
+    def get_accuracy_table(self) -> pd.DataFrame:
+        """
+        Estimate-accuracy sufficient statistics for every (container_type, use_case) segment
+        Built in one grouped pass over rows that have both an estimate and an
+        actual cost, and kept until the historical data changes
+        """
+        self._sync_from_cache()
+        if self._accuracy_table is not None:
+            return self._accuracy_table
         
         if not self.has_historical_data():
-            return {}
+            return pd.DataFrame(columns=ACCURACY_STAT_COLUMNS)
+        
+        data = self.historical_data
+        estimated = pd.to_numeric(data['estimated_cost'], errors='coerce')
+        actual = pd.to_numeric(data['actual_cost'], errors='coerce')
+        
+        # Pair estimate and actual from the same project; costs are positive
+        valid = (estimated > 0) & (actual > 0)
+        estimated = estimated[valid].to_numpy(dtype=float)
+        actual = actual[valid].to_numpy(dtype=float)
+        
+        error = estimated - actual
+        percentage_error = np.abs(error) / actual * 100
+        ratio = actual / estimated
+        
+        stats = pd.DataFrame({
+            'container_type': data['container_type'][valid].astype(str).to_numpy(),
+            'use_case': data['use_case'][valid].astype(str).to_numpy(),
+            'n': 1,
+            'sum_abs_error': np.abs(error),
+            'sum_pct_error': percentage_error,
+            'within_10': percentage_error <= 10,
+            'within_20': percentage_error <= 20,
+            'over': error > 0,
+            'under': error < 0,
+            'sum_ratio': ratio,
+            'sum_ratio_sq': ratio ** 2
+        })
+        table = stats.groupby(['container_type', 'use_case'], sort=True).sum().reset_index()
+        table = pd.concat([table, accuracy_metrics_frame(table)], axis=1)
+        
+        self._accuracy_table = table
+        return table
+    
+    def _segment_accuracy(self, container_type: str = None, use_case: str = None) -> Optional[pd.Series]:
+        """Pooled statistics over the segments matching the usual substring filters"""
+        table = self.get_accuracy_table()
+        if table.empty:
+            return None
         
-        historical_data = self.get_filtered_historical_data(container_type, use_case)
+        key = ((container_type or '').lower(), (use_case or '').lower())
+        if key in self._accuracy_segments:
+            return self._accuracy_segments[key]
         
-        if historical_data.empty:
-            return {}
-        
-        # Calculate accuracy metrics
-        estimated = historical_data['estimated_cost'].dropna()
-        actual = historical_data['actual_cost'].dropna()
+        mask = np.ones(len(table), dtype=bool)
+        if container_type:
+            mask &= table['container_type'].str.contains(container_type, case=False, regex=False).to_numpy()
+        if use_case:
+            mask &= table['use_case'].str.contains(use_case, case=False, regex=False).to_numpy()
+        
+        pooled = table.loc[mask, ACCURACY_STAT_COLUMNS].sum()
+        segment = None
+        if pooled['n'] > 0:
+            pooled = pooled.to_frame().T
+            segment = pd.concat([pooled, accuracy_metrics_frame(pooled)], axis=1).iloc[0]
+        
+        if len(self._accuracy_segments) >= MAX_CACHED_FILTERS:
+            self._accuracy_segments.clear()
+        self._accuracy_segments[key] = segment
+        return segment
+    
+    def get_historical_accuracy_metrics(self, container_type: str = None, 
+                                      use_case: str = None) -> Dict[str, Any]:
+        """Calculate accuracy metrics from historical data"""
         
-        if len(estimated) == 0 or len(actual) == 0:
+        segment = self._segment_accuracy(container_type, use_case)
+        if segment is None:
             return {}
         
-        # Align the data (same length)
-        min_length = min(len(estimated), len(actual))
-        estimated = estimated.head(min_length)
-        actual = actual.head(min_length)
-        
-        # Calculate metrics
-        percentage_errors = ((estimated - actual) / actual * 100).abs()
-        
-        metrics = {
-            'mean_absolute_error': float(np.mean(np.abs(estimated - actual))),
-            'mean_percentage_error': float(np.mean(percentage_errors)),
-            'accuracy_within_10_percent': float(np.mean(percentage_errors <= 10) * 100),
-            'accuracy_within_20_percent': float(np.mean(percentage_errors <= 20) * 100),
-            'overestimate_tendency': float(np.mean(estimated > actual) * 100),
-            'underestimate_tendency': float(np.mean(estimated < actual) * 100),
-            'sample_size': int(len(estimated)),
-            'confidence_score': min(1.0, max(0.3, len(estimated) / 50))  # More data = higher confidence
+        sample_size = int(segment['n'])
+        return {
+            'mean_absolute_error': float(segment['mae']),
+            'mean_percentage_error': float(segment['mape']),
+            'accuracy_within_10_percent': float(segment['within_10_pct']),
+            'accuracy_within_20_percent': float(segment['within_20_pct']),
+            'overestimate_tendency': float(segment['overestimate_pct']),
+            'underestimate_tendency': float(segment['underestimate_pct']),
+            'sample_size': sample_size,
+            'confidence_score': min(1.0, max(0.3, sample_size / 50))  # More data = higher confidence
         }
-        
-        return metrics
     
     def get_cost_adjustment_factor(self, container_type: str, use_case: str, 
-                                 base_estimate: float) -> Dict[str, Any]:
+                                 base_estimate: float, modifications: Dict[str, float] = None) -> Dict[str, Any]:
         """Get adjustment factor based on historical accuracy"""
         
-        historical_data = self.get_filtered_historical_data(container_type, use_case)
-        
-        if historical_data.empty or len(historical_data) < 3:
+        model = get_cost_correction_model()
+        if model is not None:
+            # The offline-trained model replaces the per-segment mean ratio once an artifact exists
+            factor = model.correction_factor(container_type, use_case, base_estimate, modifications)
+            margin = float(np.exp(1.96 * model.rmse))  # 95% interval of the log ratio
             return {
-                'adjustment_factor': 1.0,
-                'confidence': 0.3,
-                'reason': 'Insufficient historical data',
-                'recommended_range': {'min': base_estimate * 0.8, 'max': base_estimate * 1.2}
+                'adjustment_factor': factor,
+                'confidence': max(0.3, min(1.0, 1.0 - model.rmse)),
+                'reason': f'Cost correction model trained on {model.n_samples} historical projects',
+                'recommended_range': {'min': base_estimate * max(0.5, factor / margin),
+                                      'max': base_estimate * min(2.0, factor * margin)},
+                'historical_variance': model.rmse,
+                'data_points': model.n_samples,
+                'model_trained_at': model.trained_at
             }
         
-        # Calculate historical ratio of actual to estimated costs
-        estimated = historical_data['estimated_cost'].dropna()
-        actual = historical_data['actual_cost'].dropna()
+        segment = self._segment_accuracy(container_type, use_case)
         
-        if len(estimated) == 0 or len(actual) == 0:
+        if segment is None or segment['n'] < 3:
             return {
                 'adjustment_factor': 1.0,
                 'confidence': 0.3,
-                'reason': 'Missing cost data',
+                'reason': 'Insufficient historical data',
                 'recommended_range': {'min': base_estimate * 0.8, 'max': base_estimate * 1.2}
             }
         
-        # Calculate ratios
-        ratios = actual / estimated
-        mean_ratio = float(np.mean(ratios))
-        std_ratio = float(np.std(ratios))
+        # Historical ratio of actual to estimated costs
+        mean_ratio = float(segment['ratio_mean'])
+        std_ratio = float(segment['ratio_std'])
+        data_points = int(segment['n'])
         
         # Calculate confidence based on data consistency
         confidence = max(0.3, min(1.0, 1.0 - (std_ratio / mean_ratio) if mean_ratio > 0 else 0.3))
@@ -210,25 +381,80 @@ class HistoricalDataService:
         return {
             'adjustment_factor': mean_ratio,
             'confidence': confidence,
-            'reason': f'Based on {len(ratios)} similar historical projects',
+            'reason': f'Based on {data_points} similar historical projects',
             'recommended_range': {'min': min_estimate, 'max': max_estimate},
             'historical_variance': std_ratio,
-            'data_points': int(len(ratios))
+            'data_points': data_points
+        }
+    
+    def get_similar_projects(self, container_type: str, use_case: str, location: str = None,
+                             modifications: Dict[str, Any] = None, project_date: datetime = None,
+                             k: int = 10) -> Dict[str, Any]:
+        """
+        The k most similar historical projects and their actual/estimated cost ratios
+        The nearest-neighbour index is built on first use and kept until the data changes
+        """
+        self._sync_from_cache()
+        if not self.has_historical_data():
+            return {}
+        
+        if self._similar_index is None:
+            self._similar_index = SimilarProjectIndex(self.historical_data)
+        
+        similar = self._similar_index.query(container_type, use_case, location=location,
+                                            modifications=modifications, project_date=project_date, k=k)
+        if similar.empty:
+            return {}
+        
+        return {
+            'projects': similar,
+            **self._similar_index.similarity_summary(similar)
         }
     
+    def get_segment_trends(self, segment_columns: tuple = DEFAULT_SEGMENT_COLUMNS) -> pd.DataFrame:
+        """
+        Latest EWMA trend, volatility and changepoints for every segment
+        Computed once per version of the historical data
+        """
+        engine = self.get_trend_engine(segment_columns)
+        return engine.summary() if engine else pd.DataFrame()
+    
+    def get_trend_engine(self, segment_columns: tuple = DEFAULT_SEGMENT_COLUMNS) -> Optional[TrendEngine]:
+        """Monthly aggregates per segment, from the database rollups or the loaded projects"""
+        self._sync_from_cache()
+        segment_columns = tuple(segment_columns)
+        engine = self._trend_engines.get(segment_columns)
+        if engine is not None:
+            return engine
+        
+        rollups = self.get_historical_rollups()
+        if not rollups.empty:
+            monthly = TrendEngine.monthly_from_rollups(rollups, segment_columns)
+        elif self.has_historical_data():
+            monthly = TrendEngine.monthly_from_projects(self.historical_data, segment_columns)
+        else:
+            return None
+        
+        engine = TrendEngine(segment_columns)
+        engine.replace_monthly(monthly)
+        self._trend_engines[segment_columns] = engine
+        return engine
+    
     def get_seasonal_adjustments(self, project_month: int) -> Dict[str, float]:
         """Get seasonal cost adjustments based on historical data"""
         
-        if not self.has_historical_data():
+        rollups = self.get_historical_rollups()
+        if rollups.empty and not self.has_historical_data():
             return {}
         
         try:
-            # Extract month from historical data
-            historical_data = self.historical_data.copy()
-            historical_data['month'] = historical_data['project_date'].dt.month
-            
-            # Calculate average costs by month
-            monthly_costs = historical_data.groupby('month')['actual_cost'].mean()
+            if not rollups.empty:
+                # Combine the precomputed monthly sums across years
+                by_month = rollups.groupby(rollups['month'].dt.month)[['sum_actual', 'project_count']].sum()
+                monthly_costs = by_month['sum_actual'] / by_month['project_count']
+            else:
+                # Calculate average costs by the precomputed month column
+                monthly_costs = self.historical_data.groupby('month')['actual_cost'].mean()
             
             if len(monthly_costs) < 6:  # Need at least 6 months of data
                 return {}
@@ -251,14 +477,23 @@ class HistoricalDataService:
     def get_regional_cost_factors(self, project_location: str) -> Dict[str, float]:
         """Get regional cost adjustment factors"""
         
-        if not self.has_historical_data():
+        rollups = self.get_historical_rollups()
+        if rollups.empty and not self.has_historical_data():
             return {}
         
         try:
-            historical_data = self.historical_data.copy()
-            
-            # Group by location and calculate average costs
-            location_costs = historical_data.groupby('location')['actual_cost'].agg(['mean', 'count'])
+            if not rollups.empty:
+                located = rollups[rollups['location'] != '']
+                by_location = located.groupby('location')[['sum_actual', 'project_count']].sum()
+                location_costs = pd.DataFrame({
+                    'mean': by_location['sum_actual'] / by_location['project_count'],
+                    'count': by_location['project_count']
+                })
+            else:
+                # Group by location and calculate average costs
+                location_costs = self.historical_data.groupby('location', observed=True)['actual_cost'].agg(
+                    ['mean', 'count']
+                )
             
             if len(location_costs) < 2:  # Need at least 2 locations for comparison
                 return {}
@@ -292,16 +527,44 @@ class HistoricalDataService:
         if not self.has_historical_data():
             return pd.DataFrame()
         
-        data = self.historical_data.copy()
-        
-        if container_type:
-            data = data[data['container_type'].str.contains(container_type, case=False, na=False)]
-        
-        if use_case:
-            data = data[data['use_case'].str.contains(use_case, case=False, na=False)]
-        
+        key = ((container_type or '').lower(), (use_case or '').lower())
+        cached = self._filter_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        data = self.historical_data
+        if container_type or use_case:
+            mask = np.ones(len(data), dtype=bool)
+            if container_type:
+                mask &= self._category_mask('container_type', container_type)
+            if use_case:
+                mask &= self._category_mask('use_case', use_case)
+            data = data[mask]
+        
+        # Shared with later callers: treat the result as read-only
+        if len(self._filter_cache) >= MAX_CACHED_FILTERS:
+            self._filter_cache.clear()
+        self._filter_cache[key] = data
         return data
     
+    def _category_mask(self, column: str, text: str) -> np.ndarray:
+        """Case-insensitive substring match, evaluated once per distinct category"""
+        series = self.historical_data[column]
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return series.astype(str).str.contains(text, case=False, regex=False, na=False).to_numpy()
+        
+        categories = series.cat.categories.astype(str)
+        matching = categories.str.contains(text, case=False, regex=False)
+        codes = series.cat.codes.to_numpy()
+        # Code -1 marks a missing value, which never matches
+        return np.append(matching, False)[codes]
+    
+    def get_historical_rollups(self, months_back: int = None) -> pd.DataFrame:
+        """Pre-aggregated (container_type, use_case, month, location) rows from the database"""
+        if self.db and self.db.engine:
+            return self.db.get_historical_rollups(months_back=months_back)
+        return pd.DataFrame()
+    
     def has_historical_data(self) -> bool:
         """Check if historical data is available"""
         return (self.historical_data is not None and 
@@ -325,7 +588,9 @@ class HistoricalDataService:
                            '{"doors": 2, "hvac": true}',
                            '{"windows": 6, "electrical": true, "plumbing": true}'],
             'project_duration_days': [45, 30, 60],
-            'customer_satisfaction': [5, 4, 5]
+            'customer_satisfaction': [5, 4, 5],
+            # Optional: your project or quote number; rows sharing date, type, use case and location need one
+            'source_id': ['KB/2023/001', 'KB/2023/014', 'KB/2023/022']
         }
         
         return pd.DataFrame(template_data)
@@ -333,23 +598,26 @@ class HistoricalDataService:
     def analyze_cost_trends(self, months_back: int = 24) -> Dict[str, Any]:
         """Analyze cost trends from historical data"""
         
-        if not self.has_historical_data():
-            return {}
-        
-        cutoff_date = datetime.now() - timedelta(days=months_back * 30)
-        recent_data = self.historical_data[
-            self.historical_data['project_date'] >= cutoff_date
-        ].copy()
-        
-        if recent_data.empty:
-            return {}
-        
-        # Calculate trends
-        recent_data = recent_data.sort_values('project_date')
+        rollups = self.get_historical_rollups(months_back=months_back)
         
-        # Monthly cost trends
-        recent_data['year_month'] = recent_data['project_date'].dt.to_period('M')
-        monthly_trends = recent_data.groupby('year_month')['actual_cost'].mean()
+        if not rollups.empty:
+            # Monthly cost trends from the precomputed monthly sums
+            by_month = rollups.groupby('month')[['sum_actual', 'project_count']].sum().sort_index()
+            monthly_trends = by_month['sum_actual'] / by_month['project_count']
+        else:
+            if not self.has_historical_data():
+                return {}
+            
+            cutoff_date = datetime.now() - timedelta(days=months_back * 30)
+            
+            # The frame is sorted by its DatetimeIndex, so this is a slice
+            recent_data = self.historical_data.loc[cutoff_date:]
+            
+            if recent_data.empty:
+                return {}
+            
+            # Monthly cost trends
+            monthly_trends = recent_data.groupby('year_month')['actual_cost'].mean()
         
         if len(monthly_trends) < 3:
             return {}
@@ -365,4 +633,10 @@ class HistoricalDataService:
             'cost_volatility': float(monthly_trends.std()),
             'data_period': f'{months_back} months',
             'confidence': min(1.0, len(monthly_trends) / 12)
-        }
\ No newline at end of file
+        }
+
+
+@st.cache_resource
+def get_historical_data_service() -> HistoricalDataService:
+    """Process-wide historical data service"""
+    return HistoricalDataService()
@@ -0,0 +1,173 @@
+"""
+Historical Project Index for KAN-BUD Container Calculator
+Array-backed in-memory store with date and category indexes for historical pricing lookups
+"""
+
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+
+class HistoricalRecord:
+    """One historical project, with its date parsed once on insert"""
+
+    __slots__ = ('row', 'project_date', 'actual_cost', 'materials_cost', 'labor_cost', 'project_duration_days')
+
+    def __init__(self, row: int, project_date: datetime, project: Dict[str, Any]):
+        self.row = row
+        self.project_date = project_date
+        self.actual_cost = project.get('actual_cost')
+        self.materials_cost = project.get('materials_cost')
+        self.labor_cost = project.get('labor_cost')
+        self.project_duration_days = project.get('project_duration_days')
+
+
+def _parse_project_date(value: Any) -> Optional[datetime]:
+    """Accepts the same inputs the session store always did: datetimes and ISO strings"""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value
+    return None
+
+
+class HistoricalProjectIndex:
+    """
+    Historical projects indexed for the pricing aggregate
+
+    Records are kept in an array in insertion order. A global date index and
+    one date-sorted index per (container type, use case) pair are maintained
+    on insert, plus hash indexes from each normalized container type and use
+    case to its rows. An exact (case-insensitive) lookup goes straight to its
+    group; a substring search resolves the match against the few distinct
+    normalized values. Either way the cutoff date is binary-searched in each
+    matching group, so a lookup costs O(log n + k) instead of a scan of every
+    row.
+    """
+
+    def __init__(self):
+        self.records: List[HistoricalRecord] = []
+        self.date_index: List[Tuple[datetime, int]] = []
+        self.container_type_index: Dict[str, List[int]] = {}
+        self.use_case_index: Dict[str, List[int]] = {}
+        self._group_dates: Dict[Tuple[str, str], List[datetime]] = {}
+        self._group_rows: Dict[Tuple[str, str], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, project: Dict[str, Any]) -> bool:
+        """Index one project; projects without a usable date are not indexed"""
+        project_date = _parse_project_date(project.get('project_date'))
+        if project_date is None:
+            return False
+
+        row = len(self.records)
+        self.records.append(HistoricalRecord(row, project_date, project))
+
+        container_type = str(project.get('container_type', '')).lower()
+        use_case = str(project.get('use_case', '')).lower()
+        self.container_type_index.setdefault(container_type, []).append(row)
+        self.use_case_index.setdefault(use_case, []).append(row)
+
+        insort(self.date_index, (project_date, row))
+
+        key = (container_type, use_case)
+        dates = self._group_dates.setdefault(key, [])
+        rows = self._group_rows.setdefault(key, [])
+        position = bisect_left(dates, project_date)
+        dates.insert(position, project_date)
+        rows.insert(position, row)
+        return True
+
+    def add_many(self, projects: List[Dict[str, Any]]) -> int:
+        """Index a batch, sorting each index once instead of per insert"""
+        added = 0
+        touched = set()
+        for project in projects:
+            project_date = _parse_project_date(project.get('project_date'))
+            if project_date is None:
+                continue
+
+            row = len(self.records)
+            self.records.append(HistoricalRecord(row, project_date, project))
+
+            container_type = str(project.get('container_type', '')).lower()
+            use_case = str(project.get('use_case', '')).lower()
+            self.container_type_index.setdefault(container_type, []).append(row)
+            self.use_case_index.setdefault(use_case, []).append(row)
+            self.date_index.append((project_date, row))
+
+            key = (container_type, use_case)
+            self._group_dates.setdefault(key, []).append(project_date)
+            self._group_rows.setdefault(key, []).append(row)
+            touched.add(key)
+            added += 1
+
+        self.date_index.sort()
+        for key in touched:
+            pairs = sorted(zip(self._group_dates[key], self._group_rows[key]))
+            self._group_dates[key] = [date for date, _ in pairs]
+            self._group_rows[key] = [row for _, row in pairs]
+        return added
+
+    def rows_since(self, cutoff_date: datetime) -> List[int]:
+        """Rows dated on or after the cutoff, oldest first"""
+        start = bisect_left(self.date_index, (cutoff_date, -1))
+        return [row for _, row in self.date_index[start:]]
+
+    def find(self, container_type: str, use_case: str, cutoff_date: datetime,
+             exact: bool = True) -> List[HistoricalRecord]:
+        """
+        Projects dated on or after the cutoff with the given type and use case
+
+        Matching is exact and case-insensitive, as in the SQLite store; with
+        ``exact=False`` the type and use case only need to contain the given
+        text.
+        """
+        container_type = container_type.lower()
+        use_case = use_case.lower()
+
+        if exact:
+            keys = [(container_type, use_case)] if (container_type, use_case) in self._group_dates else []
+        else:
+            matching_types = {value for value in self.container_type_index if container_type in value}
+            matching_uses = {value for value in self.use_case_index if use_case in value}
+            keys = [key for key in self._group_dates if key[0] in matching_types and key[1] in matching_uses]
+
+        matches = []
+        for key in keys:
+            start = bisect_left(self._group_dates[key], cutoff_date)
+            rows = self._group_rows[key]
+            matches.extend(self.records[row] for row in rows[start:])
+        return matches
+
+    def pricing_summary(self, container_type: str, use_case: str, cutoff_date: datetime,
+                        exact: bool = True) -> Dict[str, Any]:
+        """Aggregate pricing statistics for the matching projects"""
+        relevant_projects = self.find(container_type, use_case, cutoff_date, exact)
+
+        if not relevant_projects:
+            return {}
+
+        costs = [p.actual_cost for p in relevant_projects if p.actual_cost]
+        materials = [p.materials_cost for p in relevant_projects if p.materials_cost]
+        labor = [p.labor_cost for p in relevant_projects if p.labor_cost]
+        durations = [p.project_duration_days for p in relevant_projects if p.project_duration_days]
+
+        if costs:
+            return {
+                'avg_cost': sum(costs) / len(costs),
+                'min_cost': min(costs),
+                'max_cost': max(costs),
+                'avg_materials': sum(materials) / len(materials) if materials else 0,
+                'avg_labor': sum(labor) / len(labor) if labor else 0,
+                'avg_duration': sum(durations) / len(durations) if durations else 0,
+                'project_count': len(relevant_projects),
+                'confidence': min(1.0, len(relevant_projects) / 10)
+            }
+
+        return {}
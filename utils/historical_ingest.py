@@ -0,0 +1,317 @@
+"""
+Historical Data Ingestion for KAN-BUD Container Calculator
+Streams CSV/Excel uploads in validated chunks with a rejected-rows file
+"""
+
+import csv
+import glob
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Iterator, Callable, BinaryIO
+
+import numpy as np
+import pandas as pd
+
+from utils.database import (HISTORICAL_COLUMNS, HISTORICAL_TEXT_LIMITS, HISTORICAL_DECIMAL_COLUMNS,
+                            HISTORICAL_DECIMAL_LIMIT, HISTORICAL_INTEGER_COLUMNS, HISTORICAL_INTEGER_LIMIT)
+from utils.local_paths import data_path
+
+REQUIRED_COLUMNS = ['project_date', 'container_type', 'use_case', 'actual_cost']
+
+TEXT_COLUMNS = ['container_type', 'use_case', 'location', 'modifications', 'source_id']
+
+NUMERIC_COLUMNS = ['actual_cost', 'estimated_cost', 'materials_cost',
+                   'labor_cost', 'delivery_cost', 'project_duration_days', 'customer_satisfaction']
+
+DEFAULT_CHUNK_SIZE = 20000
+
+REJECTED_FILE_PREFIX = 'historical_rejects_'
+
+# Rejected-rows files older than this are removed when the next upload starts
+REJECTED_FILE_RETENTION = timedelta(days=14)
+
+
+class HistoricalIngestError(Exception):
+    """Raised when an upload cannot be ingested at all (e.g. missing columns)"""
+
+
+class HistoricalUploadIngestor:
+    """
+    Reads a historical data upload chunk by chunk
+
+    Each chunk is parsed with fixed dtypes, cleaned and validated on its own,
+    and yielded as soon as it is ready, so at most one chunk of the upload is
+    held as a DataFrame at a time. Rows that fail validation are appended to a
+    rejected-rows CSV together with the reason, as are rows repeating the
+    project key (source_id, or the natural key without one) of an earlier row
+    in the file: two such rows cannot be told apart, and upserting both would
+    keep only one.
+    """
+
+    def __init__(self, source: BinaryIO, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 rejected_path: Optional[str] = None,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.source = source
+        self.filename = filename
+        self.chunk_size = chunk_size
+        if rejected_path is None:
+            remove_expired_rejects()
+            rejected_path = data_path(f"{REJECTED_FILE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.csv")
+        self.rejected_path = rejected_path
+        self.progress_callback = progress_callback
+        self.rows_read = 0
+        self.rows_accepted = 0
+        self.rows_rejected = 0
+        self._seen_keys = set()
+        self._total_bytes = self._source_size()
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        """Yield cleaned, valid chunks ready for the bulk loader"""
+
+        for raw_chunk in self._read_raw_chunks():
+            self.rows_read += len(raw_chunk)
+            clean, rejected = clean_historical_chunk(raw_chunk)
+
+            repeated = self._repeated_keys(clean)
+            if repeated.any():
+                duplicates = raw_chunk.loc[clean.index[repeated]].copy()
+                duplicates['reject_reason'] = np.where(
+                    clean['source_id'][repeated].notna(), 'duplicate source_id in file',
+                    'duplicate project key in file (add a source_id to import both)'
+                )
+                rejected = pd.concat([rejected, duplicates])
+                clean = clean[~repeated]
+
+            if not rejected.empty:
+                self._write_rejected(rejected)
+
+            self.rows_accepted += len(clean)
+            self._report_progress()
+
+            if not clean.empty:
+                yield clean
+
+    def _repeated_keys(self, clean: pd.DataFrame) -> np.ndarray:
+        """Mask of rows whose project key already appeared in this file"""
+        if clean.empty:
+            return np.zeros(0, dtype=bool)
+        # 64-bit hashes keep the seen-key set small for large uploads
+        hashes = pd.util.hash_pandas_object(project_keys(clean), index=False)
+        seen_before = np.fromiter((value in self._seen_keys for value in hashes.tolist()),
+                                  dtype=bool, count=len(hashes))
+        self._seen_keys.update(hashes.tolist())
+        return hashes.duplicated().to_numpy() | seen_before
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts for the finished (or partially consumed) upload"""
+        return {
+            'rows_read': self.rows_read,
+            'rows_accepted': self.rows_accepted,
+            'rows_rejected': self.rows_rejected,
+            'rejected_path': self.rejected_path if self.rows_rejected else None
+        }
+
+    def _read_raw_chunks(self) -> Iterator[pd.DataFrame]:
+        name = self.filename.lower()
+        if name.endswith('.csv'):
+            return self._read_csv_chunks()
+        if name.endswith('.xlsx'):
+            return self._read_xlsx_chunks()
+        if name.endswith('.xls'):
+            return self._read_xls_chunks()
+        raise HistoricalIngestError("Unsupported file format. Please use CSV or Excel.")
+
+    def _read_csv_chunks(self) -> Iterator[pd.DataFrame]:
+        self.source.seek(0)
+        header = pd.read_csv(self.source, nrows=0).columns
+        _check_required_columns(header)
+
+        self.source.seek(0)
+        reader = pd.read_csv(
+            self.source,
+            usecols=lambda column: column in HISTORICAL_COLUMNS,
+            dtype=str,
+            keep_default_na=True,
+            chunksize=self.chunk_size
+        )
+        with reader:
+            for chunk in reader:
+                yield chunk
+
+    def _read_xlsx_chunks(self) -> Iterator[pd.DataFrame]:
+        from openpyxl import load_workbook
+
+        self.source.seek(0)
+        workbook = load_workbook(self.source, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+            _check_required_columns(header)
+
+            keep = [index for index, column in enumerate(header) if column in HISTORICAL_COLUMNS]
+            columns = [header[index] for index in keep]
+
+            batch: List[List[Any]] = []
+            for row in rows:
+                batch.append([row[index] if index < len(row) else None for index in keep])
+                if len(batch) >= self.chunk_size:
+                    yield _excel_frame(batch, columns)
+                    batch = []
+            if batch:
+                yield _excel_frame(batch, columns)
+        finally:
+            workbook.close()
+
+    def _read_xls_chunks(self) -> Iterator[pd.DataFrame]:
+        # Legacy .xls has no streaming reader and is capped at 65k rows,
+        # so it is read once and then processed in chunks like the rest
+        self.source.seek(0)
+        sheet = pd.read_excel(self.source, dtype=str)
+        _check_required_columns(sheet.columns)
+        sheet = sheet[[column for column in sheet.columns if column in HISTORICAL_COLUMNS]]
+        for start in range(0, len(sheet), self.chunk_size):
+            yield sheet.iloc[start:start + self.chunk_size]
+
+    def _write_rejected(self, rejected: pd.DataFrame):
+        write_header = self.rows_rejected == 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.rejected_path)), exist_ok=True)
+        rejected.to_csv(self.rejected_path, mode='w' if write_header else 'a',
+                        header=write_header, index=False, quoting=csv.QUOTE_MINIMAL)
+        self.rows_rejected += len(rejected)
+
+    def _source_size(self) -> Optional[int]:
+        try:
+            position = self.source.tell()
+            self.source.seek(0, os.SEEK_END)
+            size = self.source.tell()
+            self.source.seek(position)
+            return size
+        except (AttributeError, OSError):
+            return None
+
+    def _report_progress(self):
+        if not self.progress_callback:
+            return
+
+        fraction = None
+        if self._total_bytes and self.filename.lower().endswith('.csv'):
+            try:
+                fraction = min(1.0, self.source.tell() / self._total_bytes)
+            except (AttributeError, OSError):
+                fraction = None
+
+        self.progress_callback({
+            'rows_read': self.rows_read,
+            'rows_accepted': self.rows_accepted,
+            'rows_rejected': self.rows_rejected,
+            'fraction': fraction
+        })
+
+
+def remove_expired_rejects(directory: Optional[str] = None,
+                           retention: timedelta = REJECTED_FILE_RETENTION) -> int:
+    """Delete rejected-rows files older than ``retention`` from the data directory; returns how many"""
+    directory = directory or os.path.dirname(data_path(REJECTED_FILE_PREFIX))
+    cutoff = (datetime.now() - retention).timestamp()
+    removed = 0
+    for path in glob.glob(os.path.join(directory, f"{REJECTED_FILE_PREFIX}*.csv")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _reject_json_constant(name: str):
+    raise ValueError(f"{name} is not valid JSON")
+
+
+def _is_valid_json(value: str) -> bool:
+    """Whether Postgres will accept the text as JSONB (no NaN/Infinity, no NUL characters)"""
+    if '\\u0000' in value:
+        return False
+    try:
+        json.loads(value, parse_constant=_reject_json_constant)
+    except ValueError:
+        return False
+    return True
+
+
+def _check_required_columns(columns) -> None:
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in list(columns)]
+    if missing_columns:
+        raise HistoricalIngestError(f"Missing required columns: {missing_columns}")
+
+
+def _excel_frame(rows: List[List[Any]], columns: List[str]) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=columns, dtype=object)
+    # Dates stay as datetimes, everything else is parsed from text like CSV input
+    for column in frame.columns:
+        if column != 'project_date':
+            frame[column] = frame[column].map(lambda value: None if value is None else str(value))
+    return frame
+
+
+def project_keys(clean: pd.DataFrame) -> pd.Series:
+    """The key each cleaned row is upserted on: its source_id, or its natural key without one"""
+    natural = ('key\x1f' + clean['project_date'].dt.strftime('%Y-%m-%d')
+               + '\x1f' + clean['container_type'] + '\x1f' + clean['use_case']
+               + '\x1f' + clean['location'].fillna(''))
+    return ('id\x1f' + clean['source_id']).fillna(natural).astype(str)
+
+
+def clean_historical_chunk(chunk: pd.DataFrame):
+    """
+    Clean one chunk and split it into valid rows and rejected rows
+    Rejected rows keep their original values plus a reject_reason column
+    """
+
+    chunk = chunk.reindex(columns=HISTORICAL_COLUMNS)
+    clean = pd.DataFrame(index=chunk.index)
+
+    clean['project_date'] = pd.to_datetime(chunk['project_date'], errors='coerce')
+    for col in TEXT_COLUMNS:
+        clean[col] = chunk[col].astype('string').str.strip()
+    # Loaded as NULL either way, but an empty source_id must not act as a key
+    clean['source_id'] = clean['source_id'].replace('', pd.NA)
+    for col in NUMERIC_COLUMNS:
+        clean[col] = pd.to_numeric(chunk[col], errors='coerce')
+
+    reasons = pd.Series('', index=chunk.index, dtype=object)
+
+    def flag(mask, reason):
+        reasons[mask] = reasons[mask] + reason + '; '
+
+    flag(clean['project_date'].isna(), 'invalid project_date')
+    flag(clean['container_type'].isna() | (clean['container_type'] == ''), 'missing container_type')
+    flag(clean['use_case'].isna() | (clean['use_case'] == ''), 'missing use_case')
+    flag(clean['actual_cost'].isna() | (clean['actual_cost'] <= 0), 'invalid actual_cost')
+
+    # Values the table cannot hold would abort the whole COPY, so they are rejected per row
+    for col, limit in HISTORICAL_TEXT_LIMITS.items():
+        flag(clean[col].str.len().fillna(0).astype(int) > limit, f"{col} longer than {limit} characters")
+    for col in HISTORICAL_DECIMAL_COLUMNS:
+        flag(clean[col].round(2).abs() >= HISTORICAL_DECIMAL_LIMIT, f"{col} out of range")
+    for col in HISTORICAL_INTEGER_COLUMNS:
+        flag(clean[col].round().abs() >= HISTORICAL_INTEGER_LIMIT, f"{col} out of range")
+
+    # Likewise a malformed modifications cell would abort the whole COPY, so it is rejected per row
+    modifications = clean['modifications'].dropna()
+    modifications = modifications[modifications != '']
+    invalid_json = ~modifications.map(_is_valid_json).astype(bool)
+    flag(invalid_json.reindex(chunk.index, fill_value=False), 'invalid modifications JSON')
+
+    valid = reasons == ''
+
+    rejected = chunk[~valid].copy()
+    rejected['reject_reason'] = reasons[~valid].str.rstrip('; ')
+
+    clean = clean[valid]
+    # Fill missing values with reasonable defaults
+    clean['estimated_cost'] = clean['estimated_cost'].fillna(clean['actual_cost'])
+    clean['customer_satisfaction'] = clean['customer_satisfaction'].fillna(4)  # Default good rating
+
+    return clean, rejected
@@ -0,0 +1,18 @@
+"""
+Local Data Paths for KAN-BUD Container Calculator
+Resolves where file-based stores keep their data when Postgres is unavailable
+"""
+
+import os
+
+
+def get_data_dir() -> str:
+    """Return the local data directory, creating it if needed"""
+    data_dir = os.environ.get('KANBUD_DATA_DIR', 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+def data_path(filename: str) -> str:
+    """Return the path of a file inside the local data directory"""
+    return os.path.join(get_data_dir(), filename)
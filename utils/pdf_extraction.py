@@ -0,0 +1,263 @@
+"""
+PDF Drawing Extraction for KAN-BUD Container Calculator
+Reads the text layer and vector paths of a PDF drawing locally, before any LLM is involved
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+
+from pypdf import PdfReader
+from pypdf.generic import ContentStream
+
+# Drawings are usually one or a few sheets; later pages are schedules and notes
+MAX_PAGES = 5
+
+# Pages whose content stream is larger than this are not scanned for vector statistics
+MAX_VECTOR_STREAM_BYTES = 8 * 1024 * 1024
+
+# Characters of raw text passed on to the LLM
+TEXT_EXCERPT_CHARS = 1500
+
+MAX_DIMENSIONS = 20
+
+_SCALE = re.compile(r'(?:skala|scale|ma(?:ß|ss)stab|\bM)\s*[:=]?\s*1\s*[:/]\s*(\d{1,4})\b', re.IGNORECASE)
+
+# Explicit dimension annotations: 2438 mm, 2,44 m, 900x2100
+_DIMENSION_MM = re.compile(r'(?<![\d.,])(\d{3,5})\s*mm\b', re.IGNORECASE)
+_DIMENSION_M = re.compile(r'(?<![\d.,])(\d{1,2}[.,]\d{1,3})\s*m\b')
+_DIMENSION_PAIR = re.compile(r'(?<![\d.,])(\d{3,5})\s*[x×]\s*(\d{3,5})(?![\d.,])')
+
+# Opening tags placed next to each symbol on a plan (O1/W1 windows, D1 doors)
+_WINDOW_TAG = re.compile(r'\b(?:OK|O|W)[-.]?\d{1,2}\b')
+_DOOR_TAG = re.compile(r'\b(?:DZ|DR|D)[-.]?\d{1,2}\b')
+
+# Explicit totals stated in a schedule, e.g. "okna: 4"
+_WINDOW_TOTAL = re.compile(r'(?:okn[oaie]\w*|windows?)\s*[:=]\s*(\d{1,2})\b', re.IGNORECASE)
+_DOOR_TOTAL = re.compile(r'(?:drzwi|doors?)\s*[:=]\s*(\d{1,2})\b', re.IGNORECASE)
+
+# Schedule rows carry a quantity, e.g. "O1 900x1200 2 szt." or "4 szt. okno"
+_ROW_QUANTITY = re.compile(r'\b(\d{1,2})\s*(?:szt|pcs|x)\b', re.IGNORECASE)
+_WINDOW_NOUN = re.compile(r'okn|window', re.IGNORECASE)
+_DOOR_NOUN = re.compile(r'drzwi|door', re.IGNORECASE)
+
+TITLE_BLOCK_FIELDS = {
+    'drawing_number': r'nr\.?\s*rys(?:unku)?\.?|drawing\s*no\.?|dwg\s*no\.?',
+    'project': r'projekt|project|inwestycja|obiekt',
+    'drawing': r'rysunek|drawing|tytu[łl]|title',
+    'date': r'data|date',
+    'author': r'projektant|opracowa[łl]|autor|drawn\s*by|designer',
+    'sheet': r'arkusz|sheet'
+}
+_TITLE_BLOCK = [(field, re.compile(rf'^\s*(?:{label})\s*[:.\-]?\s+(.+)$', re.IGNORECASE))
+                for field, label in TITLE_BLOCK_FIELDS.items()]
+
+INSTALLATION_KEYWORDS = {
+    'electrical': r'gniazd\w*|socket\w*|outlet\w*|o[śs]wietl\w*|lighting|lamp\w*|rozdzielni\w*|'
+                  r'w[łl][ąa]cznik\w*|switch\w*|400\s*V|230\s*V',
+    'plumbing': r'umywal\w*|washbasin|zlew\w*|sink|\bWC\b|toilet\w*|prysznic\w*|shower\w*|bojler\w*|boiler\w*|'
+                r'kanaliz\w*',
+    'hvac': r'klimatyz\w*|air\s*condition\w*|wentyl\w*|ventilat\w*|grzejnik\w*|radiator\w*|'
+            r'pomp\w*\s*ciep\w*|heat\s*pump|rekuperac\w*|\bHVAC\b'
+}
+_INSTALLATIONS = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in INSTALLATION_KEYWORDS.items()}
+
+_PATH_CONSTRUCTION = {b'm', b'l', b'c', b'v', b'y', b're', b'h'}
+_PATH_PAINTING = {b'S', b's', b'f', b'F', b'f*', b'B', b'B*', b'b', b'b*', b'n'}
+_CURVES = {b'c', b'v', b'y'}
+
+
+def is_pdf(upload) -> bool:
+    upload.seek(0)
+    header = upload.read(5)
+    upload.seek(0)
+    return header == b'%PDF-'
+
+
+def _schedule_line(line: str) -> bool:
+    return bool(_WINDOW_TOTAL.search(line) or _DOOR_TOTAL.search(line) or _ROW_QUANTITY.search(line))
+
+
+def _stated_quantity(total: re.Pattern, tag: re.Pattern, noun: re.Pattern,
+                     lines: List[str]) -> Tuple[Optional[int], bool]:
+    """
+    Openings stated in a schedule and whether the schedule agrees with itself
+
+    Row quantities are summed, counting each tag once so a schedule repeated
+    on another sheet is not added twice (O1 2 szt. + O2 1 szt. = 3). An
+    explicit total ("okna: 4") overrides the rows; when the rows or several
+    totals disagree with it the quantity is returned as inconsistent.
+    """
+    totals, rows = set(), {}
+    for line in lines:
+        if _title_block_line(line):
+            continue
+        stated = total.findall(line)
+        if stated:
+            totals.update(int(value) for value in stated)
+            continue
+        quantity = _ROW_QUANTITY.search(line)
+        if not quantity:
+            continue
+        tags = tag.findall(line)
+        if tags:
+            rows.setdefault(re.sub(r'[-.]', '', tags[0]).upper(), int(quantity.group(1)))
+        elif noun.search(line):
+            rows.setdefault(line.lower(), int(quantity.group(1)))
+
+    row_total = sum(rows.values()) if rows else None
+    if not totals:
+        return row_total, True
+    stated_total = max(totals)
+    return stated_total, len(totals) == 1 and row_total in (None, stated_total)
+
+
+def _title_block_line(line: str) -> bool:
+    return any(pattern.match(line) for _, pattern in _TITLE_BLOCK)
+
+
+def _distinct_tags(pattern: re.Pattern, lines: List[str]) -> List[str]:
+    """
+    Distinct opening tags found on the plan
+
+    Title block and schedule lines are skipped ("Sheet D1 of D2" is not a
+    door), and a tag repeated on the plan or in a schedule table counts once.
+    """
+    tags = set()
+    for line in lines:
+        if _title_block_line(line) or _schedule_line(line):
+            continue
+        tags.update(re.sub(r'[-.]', '', tag).upper() for tag in pattern.findall(line))
+    return sorted(tags)
+
+
+def _dimensions(text: str) -> List[int]:
+    """Dimension annotations in millimetres, most frequent first"""
+    values = [int(value) for value in _DIMENSION_MM.findall(text)]
+    values += [round(float(value.replace(',', '.')) * 1000) for value in _DIMENSION_M.findall(text)]
+    for width, height in _DIMENSION_PAIR.findall(text):
+        values += [int(width), int(height)]
+    return [value for value, _ in Counter(values).most_common(MAX_DIMENSIONS)]
+
+
+def _title_block(lines: List[str]) -> Dict[str, str]:
+    fields = {}
+    for line in lines:
+        for field, pattern in _TITLE_BLOCK:
+            if field in fields:
+                continue
+            match = pattern.match(line)
+            if match:
+                fields[field] = match.group(1).strip()[:80]
+                break
+    return fields
+
+
+def _vector_stats(page, reader: PdfReader) -> Dict[str, int]:
+    """
+    Path statistics from a page's content stream
+
+    Door swings are drawn as a quarter arc: a stroked path of one or two
+    Bezier curves and nothing else, counted as ``arc_paths``.
+    """
+    stats = {'paths': 0, 'lines': 0, 'curves': 0, 'rectangles': 0, 'arc_paths': 0}
+    contents = page.get_contents()
+    if contents is None:
+        return stats
+    if len(contents.get_data()) > MAX_VECTOR_STREAM_BYTES:
+        stats['skipped'] = 1
+        return stats
+
+    path: List[bytes] = []
+    for _, operator in ContentStream(contents, reader).operations:
+        if operator in _PATH_CONSTRUCTION:
+            path.append(operator)
+        elif operator in _PATH_PAINTING:
+            if path:
+                stats['paths'] += 1
+                stats['lines'] += path.count(b'l')
+                stats['rectangles'] += path.count(b're')
+                curves = sum(1 for op in path if op in _CURVES)
+                stats['curves'] += curves
+                if operator in (b'S', b's') and 1 <= curves <= 2 and len(path) == curves + 1:
+                    stats['arc_paths'] += 1
+            path = []
+    return stats
+
+
+def _installations(text: str) -> Dict[str, Dict[str, Any]]:
+    found = {}
+    for name, pattern in _INSTALLATIONS.items():
+        matches = [match.lower() for match in pattern.findall(text)]
+        found[name] = {'mentions': len(matches), 'elements': sorted(set(matches))[:8]}
+    return found
+
+
+def extract_drawing_summary(upload, max_pages: int = MAX_PAGES) -> Optional[Dict[str, Any]]:
+    """
+    Compact structured summary of a PDF drawing, or None when it cannot be parsed
+
+    The upload is read through its file interface, so pypdf only loads the
+    objects it needs.
+    """
+    try:
+        upload.seek(0)
+        reader = PdfReader(upload)
+        pages = reader.pages[:max_pages]
+
+        texts, vector = [], Counter()
+        for page in pages:
+            texts.append(page.extract_text() or '')
+            vector.update(_vector_stats(page, reader))
+    except Exception:
+        return None
+    finally:
+        upload.seek(0)
+
+    text = '\n'.join(texts)
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+    window_tags = _distinct_tags(_WINDOW_TAG, lines)
+    door_tags = _distinct_tags(_DOOR_TAG, lines)
+    windows, windows_consistent = _stated_quantity(_WINDOW_TOTAL, _WINDOW_TAG, _WINDOW_NOUN, lines)
+    doors, doors_consistent = _stated_quantity(_DOOR_TOTAL, _DOOR_TAG, _DOOR_NOUN, lines)
+    scale = _SCALE.search(text)
+
+    summary = {
+        'page_count': len(reader.pages),
+        'has_text_layer': len(text.strip()) > 20,
+        'scale': f"1:{scale.group(1)}" if scale else None,
+        'title_block': _title_block(lines),
+        'dimensions_mm': _dimensions(text),
+        'windows': windows,
+        'doors': doors,
+        'window_tags': window_tags,
+        'door_tags': door_tags,
+        'window_source': 'schedule' if windows is not None else ('tags' if window_tags else None),
+        'door_source': 'schedule' if doors is not None else ('tags' if door_tags else None),
+        'schedule_conflicts': [name for name, consistent in (('windows', windows_consistent),
+                                                             ('doors', doors_consistent)) if not consistent],
+        'installations': _installations(text),
+        'vector_stats': dict(vector),
+        'text_excerpt': '\n'.join(lines)[:TEXT_EXCERPT_CHARS]
+    }
+    summary['confident'] = is_confident(summary)
+    return summary
+
+
+def is_confident(summary: Dict[str, Any]) -> bool:
+    """
+    Enough was read from the drawing itself to price it without an LLM
+
+    Only quantities stated in a schedule count; tags on the plan give the
+    number of opening types, not of openings, and are passed on as hints.
+    A schedule whose rows and stated total disagree is not trusted.
+    """
+    return bool(
+        summary['has_text_layer']
+        and summary['window_source'] == 'schedule'
+        and summary['door_source'] == 'schedule'
+        and not summary.get('schedule_conflicts')
+        and (summary['scale'] or len(summary['dimensions_mm']) >= 2)
+    )
+
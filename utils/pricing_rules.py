@@ -0,0 +1,127 @@
+"""
+Pricing Rules for KAN-BUD Container Calculator
+Applies the Admin Panel operating costs, margins, discounts and seasonal adjustments
+"""
+
+from datetime import date
+from typing import Dict, Any, Optional
+
+# Admin Panel defaults; a section only changes prices once it has been saved
+OPERATING_COSTS = {
+    'workshop_hourly': 15.0,
+    'equipment_hourly': 25.0,
+    'transport_km': 1.2,
+    'overhead_percentage': 20.0
+}
+
+MATERIAL_MARGINS = {
+    'steel_structural': 25.0,
+    'insulation': 35.0,
+    'electrical': 30.0,
+    'plumbing': 28.0,
+    'windows_doors': 40.0,
+    'finishes': 45.0
+}
+
+SERVICE_MARGINS = {
+    'basic_modification': 20.0,
+    'complex_structural': 35.0,
+    'hvac_systems': 30.0,
+    'electrical_systems': 28.0,
+    'custom_design': 50.0,
+    'project_management': 25.0
+}
+
+VOLUME_DISCOUNTS = {
+    'small_project': 0.0,
+    'medium_project': 5.0,
+    'large_project': 10.0,
+    'enterprise_project': 15.0
+}
+
+SEASONAL_ADJUSTMENTS = {
+    'winter_surcharge': 5.0,
+    'summer_discount': 2.0,
+    'holiday_surcharge': 10.0
+}
+
+# Built-in pricing used while the matching section has never been saved
+BUILT_IN_OPERATING_RATE = 0.45
+BUILT_IN_PROFIT_RATE = 0.20
+
+# Volume discount tiers by project value in EUR: (setting, upper bound)
+VOLUME_DISCOUNT_TIERS = (
+    ('small_project', 50000),
+    ('medium_project', 200000),
+    ('large_project', 500000),
+    ('enterprise_project', float('inf'))
+)
+
+# Season -> (setting, sign); the holiday window takes precedence over winter
+SEASONAL_SETTINGS = {
+    'holiday': ('holiday_surcharge', 1),
+    'winter': ('winter_surcharge', 1),
+    'summer': ('summer_discount', -1)
+}
+
+
+def saved_section(pricing, name: str) -> Dict[str, Any]:
+    """Section saved in the pricing snapshot, empty when never saved"""
+    return pricing.section(name) if pricing is not None else {}
+
+
+def operating_rate(pricing, default: float = BUILT_IN_OPERATING_RATE) -> float:
+    """Overhead markup on materials and labor"""
+    operating = saved_section(pricing, 'operating_costs')
+    if 'overhead_percentage' in operating:
+        return operating['overhead_percentage'] / 100
+    return default
+
+
+def hourly_operating_cost(pricing) -> float:
+    """Workshop and equipment cost charged per labor hour"""
+    operating = saved_section(pricing, 'operating_costs')
+    return operating.get('workshop_hourly', 0.0) + operating.get('equipment_hourly', 0.0)
+
+
+def transport_rate(pricing, default: float) -> float:
+    """Delivery cost per extra kilometre"""
+    return saved_section(pricing, 'operating_costs').get('transport_km', default)
+
+
+def margin_rate(pricing, section: Optional[str], category: Optional[str]) -> float:
+    """Profit margin of a material or service category"""
+    margins = saved_section(pricing, section) if section else {}
+    if category in margins:
+        return margins[category] / 100
+    return BUILT_IN_PROFIT_RATE
+
+
+def volume_discount_rate(pricing, project_value: float) -> float:
+    """Discount for the project value's tier"""
+    discounts = saved_section(pricing, 'volume_discounts')
+    for tier, upper_bound in VOLUME_DISCOUNT_TIERS:
+        if project_value < upper_bound:
+            return discounts.get(tier, 0.0) / 100
+    return 0.0
+
+
+def season_for(on_date: Optional[date] = None) -> str:
+    """Pricing season of a date: holiday, winter, summer or '' off-season"""
+    on_date = on_date or date.today()
+    if (on_date.month == 12 and on_date.day >= 20) or (on_date.month == 1 and on_date.day <= 6):
+        return 'holiday'
+    if on_date.month in (12, 1, 2):
+        return 'winter'
+    if on_date.month in (6, 7, 8):
+        return 'summer'
+    return ''
+
+
+def seasonal_rate(pricing, on_date: Optional[date] = None) -> float:
+    """Signed seasonal adjustment: surcharges positive, discounts negative"""
+    season = season_for(on_date)
+    if season not in SEASONAL_SETTINGS:
+        return 0.0
+    setting, sign = SEASONAL_SETTINGS[season]
+    return sign * saved_section(pricing, 'seasonal_adjustments').get(setting, 0.0) / 100
@@ -0,0 +1,286 @@
+"""
+Pricing Settings Store for KAN-BUD Container Calculator
+Persists Admin Panel pricing settings as versioned copy-on-write snapshots
+"""
+
+import copy
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Callable
+
+import streamlit as st
+from sqlalchemy import text
+
+from utils.local_paths import data_path
+from utils.pricing_rules import season_for
+
+# Sections edited in the Admin Panel and persisted by the store; the calculators apply each once saved
+SETTINGS_SECTIONS = (
+    'labor_rates',
+    'operating_costs',
+    'material_margins',
+    'service_margins',
+    'volume_discounts',
+    'seasonal_adjustments'
+)
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively wrap dicts in read-only mappings"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Recursively convert read-only mappings back to plain dicts"""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+class PricingSettingsSnapshot:
+    """Immutable view of the pricing settings at a single version"""
+
+    def __init__(self, version: int, settings: Dict[str, Any], saved_at: Optional[str] = None):
+        self.version = version
+        self.settings = _freeze(copy.deepcopy(settings))
+        self.saved_at = saved_at
+
+    def section(self, name: str) -> Dict[str, Any]:
+        """Get a copy of one settings section (empty if never saved)"""
+        return _thaw(self.settings.get(name, MappingProxyType({})))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a plain, mutable copy of all settings"""
+        return _thaw(self.settings)
+
+
+class PricingSettingsStore:
+    """Versioned pricing settings backed by Postgres or a local JSON file
+
+    Every save writes a new version instead of mutating the old one, so a
+    snapshot handed out earlier stays valid for the quote that holds it.
+    Readers call ``current()``, which only reloads when the stored version
+    has moved since the last check.
+    """
+
+    def __init__(self, engine=None, file_path: Optional[str] = None,
+                 check_interval: float = 1.0):
+        self.engine = engine
+        self.file_path = file_path or os.environ.get('PRICING_SETTINGS_FILE') or data_path('pricing_settings.json')
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = PricingSettingsSnapshot(0, {})
+        self._stored_token = None
+        self._last_check = 0.0
+
+        if self.engine is not None:
+            self.initialize_table()
+
+    def initialize_table(self):
+        """Create the settings version table"""
+        tables_sql = """
+        CREATE TABLE IF NOT EXISTS pricing_settings (
+            version SERIAL PRIMARY KEY,
+            settings JSONB NOT NULL,
+            saved_by VARCHAR(100),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text(tables_sql))
+                conn.commit()
+        except Exception as e:
+            if st.session_state.get('employee_logged_in', False):
+                st.error(f"Failed to initialize pricing settings table: {str(e)}")
+            self.engine = None
+
+    def current(self) -> PricingSettingsSnapshot:
+        """Get the latest snapshot, reloading only when the stored version changed"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            self._last_check = now
+            try:
+                token = self._read_version_token()
+                if token != self._stored_token:
+                    self._snapshot = self._load_snapshot()
+                    self._stored_token = token
+            except Exception:
+                # Keep serving the last good snapshot if the store is unreachable
+                pass
+            return self._snapshot
+
+    def save(self, sections: Dict[str, Any], saved_by: str = None) -> Optional[PricingSettingsSnapshot]:
+        """Save updated sections as a new settings version"""
+
+        updates = {name: value for name, value in sections.items() if name in SETTINGS_SECTIONS}
+
+        with self._lock:
+            try:
+                if self.engine is not None:
+                    merged = self._load_snapshot().to_dict()
+                    merged.update(copy.deepcopy(updates))
+                    snapshot = self._save_to_database(merged, saved_by)
+                else:
+                    snapshot = self._save_to_file(updates)
+
+                self._snapshot = snapshot
+                self._stored_token = self._read_version_token()
+                self._last_check = time.monotonic()
+                return snapshot
+            except Exception as e:
+                if st.session_state.get('admin_logged_in', False):
+                    st.error(f"Failed to save pricing settings: {str(e)}")
+                return None
+
+    def _read_version_token(self):
+        """Cheap check identifying the stored version without loading it"""
+        if self.engine is not None:
+            with self.engine.connect() as conn:
+                return conn.execute(text("SELECT MAX(version) FROM pricing_settings")).scalar()
+
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_snapshot(self) -> PricingSettingsSnapshot:
+        """Load the latest stored version"""
+        if self.engine is not None:
+            query = """
+            SELECT version, settings, created_at
+            FROM pricing_settings
+            ORDER BY version DESC
+            LIMIT 1
+            """
+            with self.engine.connect() as conn:
+                row = conn.execute(text(query)).fetchone()
+            if not row:
+                return PricingSettingsSnapshot(0, {})
+            settings = row[1] if isinstance(row[1], dict) else json.loads(row[1])
+            return PricingSettingsSnapshot(int(row[0]), settings, row[2].isoformat() if row[2] else None)
+
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return PricingSettingsSnapshot(0, {})
+        return PricingSettingsSnapshot(int(stored.get('version', 0)),
+                                       stored.get('settings', {}),
+                                       stored.get('saved_at'))
+
+    def _save_to_database(self, settings: Dict[str, Any], saved_by: Optional[str]) -> PricingSettingsSnapshot:
+        query = """
+        INSERT INTO pricing_settings (settings, saved_by)
+        VALUES (CAST(:settings AS JSONB), :saved_by)
+        RETURNING version, created_at
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(text(query), {
+                'settings': json.dumps(settings),
+                'saved_by': saved_by
+            }).fetchone()
+            conn.commit()
+        return PricingSettingsSnapshot(int(row[0]), settings, row[1].isoformat() if row[1] else None)
+
+    def _save_to_file(self, updates: Dict[str, Any]) -> PricingSettingsSnapshot:
+        saved_at = datetime.now().isoformat()
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        os.makedirs(directory, exist_ok=True)
+
+        # The lock file serializes all processes sharing the settings file, so
+        # two saves never read the same version and both write version + 1
+        with open(self.file_path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                latest = self._load_snapshot()
+                version = latest.version + 1
+                settings = latest.to_dict()
+                settings.update(copy.deepcopy(updates))
+
+                # Write a new file and swap it in atomically so readers never see a partial write
+                fd, temp_path = tempfile.mkstemp(prefix='.pricing_settings_', dir=directory)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump({'version': version, 'saved_at': saved_at, 'settings': settings}, f, indent=2)
+                    os.replace(temp_path, self.file_path)
+                except Exception:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        return PricingSettingsSnapshot(version, settings, saved_at)
+
+
+class VersionedPriceCache:
+    """Cache of computed prices that is only valid for one settings version
+
+    Entries are also keyed by pricing season, since seasonal adjustments
+    move prices without a new settings version.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+
+    def get_or_compute(self, snapshot: PricingSettingsSnapshot, config: Dict[str, Any],
+                       compute: Callable[[], Any]) -> Any:
+        """Return the cached price for a configuration or compute and store it"""
+        key = json.dumps([season_for(), config], sort_keys=True, default=str)
+
+        with self._lock:
+            if self._version is None or snapshot.version > self._version:
+                # Settings moved on: everything priced at the old version is stale
+                self._entries.clear()
+                self._version = snapshot.version
+
+            if snapshot.version == self._version and key in self._entries:
+                self._entries.move_to_end(key)
+                return copy.deepcopy(self._entries[key])
+
+        result = compute()
+
+        with self._lock:
+            # Results computed against an older pinned snapshot are never cached
+            if snapshot.version == self._version:
+                self._entries[key] = copy.deepcopy(result)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return result
+
+    def clear(self):
+        """Drop all cached prices"""
+        with self._lock:
+            self._entries.clear()
+
+
+@st.cache_resource
+def get_pricing_settings_store() -> PricingSettingsStore:
+    """Process-wide pricing settings store"""
+    from utils.database import get_database_manager
+    db = get_database_manager()
+    return PricingSettingsStore(engine=db.engine)
+
+
+@st.cache_resource
+def get_price_cache() -> VersionedPriceCache:
+    """Process-wide price cache keyed by settings version"""
+    return VersionedPriceCache()
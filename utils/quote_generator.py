@@ -7,6 +7,71 @@ import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 import pandas as pd
+from utils.pricing_settings import get_pricing_settings_store
+from utils.quote_renderer import QuoteRenderer, render_quotes_batch
+from utils.quote_numbering import get_quote_number_allocator
+from utils.quote_templates import get_quote_template_store, compute_rates_hash
+from utils.cost_model import QuoteCostModel
+from utils.pricing_rules import season_for, transport_rate, VOLUME_DISCOUNT_TIERS
+
+# Static quote sections, built once instead of on every quote
+STANDARD_EXCLUSIONS = (
+    "Soil testing and geotechnical analysis",
+    "Environmental assessments or remediation",
+    "Landscaping and site restoration",
+    "Temporary utilities during construction",
+    "Security and temporary fencing",
+    "Changes in scope or design modifications",
+    "Unforeseen site conditions or subsurface issues"
+)
+
+SERVICE_EXCLUSIONS = (
+    ("permits", "Building permits and associated fees"),
+    ("site_prep", "Site preparation and excavation work"),
+    ("utilities", "Utility connections and hook-ups"),
+    ("delivery", "Transportation and delivery")
+)
+
+BASE_ASSUMPTIONS = (
+    "Site is accessible for delivery vehicles and equipment",
+    "Site has adequate space for construction activities",
+    "Standard soil conditions suitable for proposed foundation",
+    "No environmental hazards or contamination present",
+    "Customer will provide necessary site access and utilities",
+    "Work to be performed during standard business hours",
+    "Weather conditions will not significantly delay construction"
+)
+
+BASE_WARRANTY = (
+    ("workmanship", "1 year warranty on all installation and fabrication work"),
+    ("materials", "Manufacturer warranty on all materials and components"),
+    ("structural", "5 year warranty on structural modifications and reinforcements")
+)
+
+# Flat-rate additional services (delivery is priced by distance)
+SERVICE_RATES = {
+    "installation": 2500,  # Professional installation service
+    "permits": 1200,       # Permit assistance and fees
+    "site_prep": 3500,     # Basic site preparation
+    "utilities": 2800,     # Utility connections
+    "maintenance": 1500    # Annual maintenance package
+}
+
+# Payment plans as (key, percentage, due, description) rows
+PAYMENT_PLANS = {
+    "50_50": (
+        ("deposit", 50, "Upon contract signing", "Project initiation and material procurement"),
+        ("final", 50, "Upon project completion", "Final payment after inspection and approval")
+    ),
+    "30_40_30": (
+        ("deposit", 30, "Upon contract signing", "Project initiation"),
+        ("progress", 40, "At 50% completion", "Progress payment"),
+        ("final", 30, "Upon completion", "Final payment")
+    ),
+    "net_30": (
+        ("full_payment", 100, "Net 30 days from completion", "Full payment due within 30 days"),
+    )
+}
 
 class QuoteGenerator:
     """Professional quote and proposal generator"""
@@ -48,18 +113,29 @@ class QuoteGenerator:
             "Warranty: 1 year on workmanship, manufacturer warranty on materials"
         ]
     
-    def generate_quote(self, quote_data: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_quote(self, quote_data: Dict[str, Any], pricing=None) -> Dict[str, Any]:
         """Generate a comprehensive professional quote"""
         
+        # Pin the pricing settings for the whole quote so a concurrent Admin Panel
+        # save cannot change rates halfway through
+        if pricing is None:
+            pricing = get_pricing_settings_store().current()
+        
         # Generate quote number
         quote_number = self._generate_quote_number()
         
-        # Calculate detailed costs
-        cost_breakdown = self._calculate_detailed_costs(quote_data)
+        # Calculate detailed costs, reusing a template's breakdown while rates are unchanged
+        precomputed = quote_data.get("cost_breakdown")
+        if precomputed and quote_data.get("rates_hash") == self.get_rates_hash(pricing):
+            cost_breakdown = precomputed
+        else:
+            cost_breakdown = self._calculate_detailed_costs(quote_data, pricing)
         
         # Generate timeline
         timeline = self._generate_project_timeline(quote_data)
         
+        total_cost = cost_breakdown.get("total", 0)
+        
         # Prepare quote structure
         quote = {
             "quote_number": quote_number,
@@ -71,22 +147,21 @@ class QuoteGenerator:
             "cost_breakdown": cost_breakdown,
             "subtotal": cost_breakdown.get("subtotal", 0),
             "tax": cost_breakdown.get("tax", 0),
-            "total_cost": cost_breakdown.get("total", 0),
+            "total_cost": total_cost,
             "timeline": timeline,
             "terms_conditions": self._generate_terms_conditions(quote_data),
             "warranty": self._generate_warranty_terms(quote_data),
-            "payment_schedule": self._generate_payment_schedule(quote_data),
+            "payment_schedule": self._generate_payment_schedule(quote_data, total_cost),
             "exclusions": self._generate_exclusions(quote_data),
-            "assumptions": self._generate_assumptions(quote_data)
+            "assumptions": self._generate_assumptions(quote_data),
+            "pricing_version": pricing.version
         }
         
         return quote
     
     def _generate_quote_number(self) -> str:
         """Generate unique quote number"""
-        date_part = datetime.now().strftime("%Y%m")
-        time_part = datetime.now().strftime("%H%M")
-        return f"SCS-{date_part}-{time_part}"
+        return get_quote_number_allocator().next_number()
     
     def _calculate_validity_date(self, quote_data: Dict[str, Any]) -> str:
         """Calculate quote validity expiration date"""
@@ -105,141 +180,30 @@ class QuoteGenerator:
         valid_until = datetime.now() + timedelta(days=days)
         return valid_until.strftime("%Y-%m-%d")
     
-    def _calculate_detailed_costs(self, quote_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _calculate_detailed_costs(self, quote_data: Dict[str, Any], pricing=None) -> Dict[str, Any]:
         """Calculate detailed cost breakdown"""
-        
-        config = quote_data.get("container_config", {})
-        services = quote_data.get("services", {})
-        quote_params = quote_data.get("quote_params", {})
-        
-        # Base costs
-        base_costs = self._get_base_costs(config)
-        
-        # Service costs
-        service_costs = self._calculate_service_costs(services, config)
-        
-        # Apply adjustments
-        profit_margin = quote_params.get("profit_margin", 0.20)
-        contingency = quote_params.get("contingency", 0.10)
-        discount = quote_params.get("discount", 0.0)
-        
-        # Calculate breakdown
-        breakdown = {}
-        
-        # Container and base modifications
-        breakdown["container_base"] = {
-            "description": f"{config.get('base_type', 'Container')} with basic modifications",
-            "quantity": 1,
-            "unit_cost": base_costs["container_base"],
-            "total": base_costs["container_base"]
-        }
-        
-        # Structural modifications
-        if base_costs.get("structural_modifications", 0) > 0:
-            breakdown["structural_modifications"] = {
-                "description": "Structural reinforcements and modifications",
-                "quantity": 1,
-                "unit_cost": base_costs["structural_modifications"],
-                "total": base_costs["structural_modifications"]
-            }
-        
-        # Systems installation
-        systems_cost = (base_costs.get("electrical", 0) + 
-                       base_costs.get("plumbing", 0) + 
-                       base_costs.get("hvac", 0))
-        
-        if systems_cost > 0:
-            breakdown["systems_installation"] = {
-                "description": "Electrical, plumbing, and HVAC systems",
-                "quantity": 1,
-                "unit_cost": systems_cost,
-                "total": systems_cost
-            }
-        
-        # Insulation and finishes
-        finish_cost = base_costs.get("insulation", 0) + base_costs.get("finishes", 0)
-        if finish_cost > 0:
-            breakdown["finishes_interior"] = {
-                "description": "Insulation and interior finishes",
-                "quantity": 1,
-                "unit_cost": finish_cost,
-                "total": finish_cost
-            }
-        
-        # Labor costs
-        total_material_cost = sum(item["total"] for item in breakdown.values())
-        labor_cost = total_material_cost * 0.40  # 40% of materials
-        
-        breakdown["labor_costs"] = {
-            "description": "Professional installation and labor",
-            "quantity": 1,
-            "unit_cost": labor_cost,
-            "total": labor_cost
-        }
-        
-        # Service costs
-        if service_costs.get("delivery", 0) > 0:
-            breakdown["delivery_logistics"] = {
-                "description": f"Delivery within {services.get('delivery_distance', 50)} miles",
-                "quantity": 1,
-                "unit_cost": service_costs["delivery"],
-                "total": service_costs["delivery"]
-            }
-        
-        if service_costs.get("permits", 0) > 0:
-            breakdown["permits_fees"] = {
-                "description": "Permit assistance and fees",
-                "quantity": 1,
-                "unit_cost": service_costs["permits"],
-                "total": service_costs["permits"]
-            }
-        
-        if service_costs.get("site_prep", 0) > 0:
-            breakdown["site_preparation"] = {
-                "description": "Site preparation and foundation work",
-                "quantity": 1,
-                "unit_cost": service_costs["site_prep"],
-                "total": service_costs["site_prep"]
-            }
-        
-        # Calculate subtotal
-        subtotal = sum(item["total"] for item in breakdown.values())
-        
-        # Apply profit margin
-        subtotal_with_profit = subtotal * (1 + profit_margin)
-        
-        # Apply contingency
-        contingency_amount = subtotal_with_profit * contingency
-        breakdown["contingency"] = {
-            "description": f"Contingency ({contingency*100:.0f}%)",
-            "quantity": 1,
-            "unit_cost": contingency_amount,
-            "total": contingency_amount
-        }
-        
-        # Calculate new subtotal
-        subtotal_final = subtotal_with_profit + contingency_amount
-        
-        # Apply discount
-        discount_amount = subtotal_final * discount
-        if discount_amount > 0:
-            breakdown["discount"] = {
-                "description": f"Discount ({discount*100:.0f}%)",
-                "quantity": 1,
-                "unit_cost": -discount_amount,
-                "total": -discount_amount
-            }
-            subtotal_final -= discount_amount
-        
-        # No tax calculation for B2B customers - VAT handled in invoicing
-        
-        return {
-            "breakdown": breakdown,
-            "subtotal": subtotal_final,
-            "tax": 0.0,  # VAT not included in B2B pricing
-            "total": subtotal_final,
-            "vat_note": "VAT will be added according to applicable tax regulations at invoicing"
-        }
+        return self.build_cost_model(quote_data, pricing).breakdown()
+    
+    def build_cost_model(self, quote_data: Dict[str, Any], pricing=None) -> QuoteCostModel:
+        """Build the incremental line-item cost model for a quote, priced with the given settings snapshot"""
+        if pricing is None:
+            pricing = get_pricing_settings_store().current()
+        return QuoteCostModel(self, quote_data, pricing)
+    
+    def refresh_quote_costs(self, quote: Dict[str, Any], cost_model: QuoteCostModel,
+                            quote_data: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Update a generated quote's cost fields from an edited cost model"""
+        
+        cost_breakdown = cost_model.breakdown()
+        total_cost = cost_breakdown["total"]
+        
+        updated = dict(quote)
+        updated["cost_breakdown"] = cost_breakdown
+        updated["subtotal"] = cost_breakdown["subtotal"]
+        updated["tax"] = cost_breakdown["tax"]
+        updated["total_cost"] = total_cost
+        updated["payment_schedule"] = self._generate_payment_schedule(quote_data or {}, total_cost)
+        return updated
     
     def _get_base_costs(self, config: Dict[str, Any]) -> Dict[str, float]:
         """Calculate base costs for container and modifications"""
@@ -317,40 +281,32 @@ class QuoteGenerator:
         
         return costs
     
-    def _calculate_service_costs(self, services: Dict[str, Any], 
-                               config: Dict[str, Any]) -> Dict[str, float]:
-        """Calculate costs for additional services"""
+    def _service_cost(self, service: str, services: Dict[str, Any], pricing=None) -> float:
+        """Calculate the cost of a single additional service"""
         
-        costs = {}
+        if not services.get(service, False):
+            return 0
         
         # Delivery
-        if services.get("delivery", False):
+        if service == "delivery":
             distance = services.get("delivery_distance", 50)
             base_delivery = 800
             if distance > 50:
-                costs["delivery"] = base_delivery + (distance - 50) * 8  # $8 per mile over 50
-            else:
-                costs["delivery"] = base_delivery
+                # $8 per mile over 50 unless a transport rate was saved in the Admin Panel
+                return base_delivery + (distance - 50) * transport_rate(pricing, 8)
+            return base_delivery
         
-        # Installation
-        if services.get("installation", False):
-            costs["installation"] = 2500  # Professional installation service
-        
-        # Permits
-        if services.get("permits", False):
-            costs["permits"] = 1200  # Permit assistance and fees
-        
-        # Site preparation
-        if services.get("site_prep", False):
-            costs["site_prep"] = 3500  # Basic site preparation
+        return SERVICE_RATES.get(service, 0)
+    
+    def _calculate_service_costs(self, services: Dict[str, Any], 
+                               config: Dict[str, Any]) -> Dict[str, float]:
+        """Calculate costs for additional services"""
         
-        # Utilities
-        if services.get("utilities", False):
-            costs["utilities"] = 2800  # Utility connections
+        costs = {}
         
-        # Maintenance package
-        if services.get("maintenance", False):
-            costs["maintenance"] = 1500  # Annual maintenance package
+        for service in ("delivery",) + tuple(SERVICE_RATES):
+            if services.get(service, False):
+                costs[service] = self._service_cost(service, services)
         
         return costs
     
@@ -480,11 +436,7 @@ class QuoteGenerator:
         
         services = quote_data.get("services", {})
         
-        warranty = {
-            "workmanship": "1 year warranty on all installation and fabrication work",
-            "materials": "Manufacturer warranty on all materials and components",
-            "structural": "5 year warranty on structural modifications and reinforcements"
-        }
+        warranty = dict(BASE_WARRANTY)
         
         if services.get("warranty", False):
             warranty_period = services.get("warranty_period", "2 years")
@@ -492,88 +444,43 @@ class QuoteGenerator:
         
         return warranty
     
-    def _generate_payment_schedule(self, quote_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_payment_schedule(self, quote_data: Dict[str, Any],
+                                   total_cost: float = None) -> Dict[str, Any]:
         """Generate detailed payment schedule"""
         
         quote_params = quote_data.get("quote_params", {})
         payment_terms = quote_params.get("payment_terms", "50% deposit, 50% completion")
-        total_cost = quote_data.get("cost_breakdown", {}).get("total", 0)
-        
-        schedule = {}
+        if total_cost is None:
+            total_cost = quote_data.get("cost_breakdown", {}).get("total", 0)
         
         if "50%" in payment_terms and "deposit" in payment_terms:
-            schedule["deposit"] = {
-                "percentage": 50,
-                "amount": total_cost * 0.5,
-                "due": "Upon contract signing",
-                "description": "Project initiation and material procurement"
-            }
-            schedule["final"] = {
-                "percentage": 50,
-                "amount": total_cost * 0.5,
-                "due": "Upon project completion",
-                "description": "Final payment after inspection and approval"
-            }
-        
+            plan = PAYMENT_PLANS["50_50"]
         elif "30%" in payment_terms:
-            schedule["deposit"] = {
-                "percentage": 30,
-                "amount": total_cost * 0.3,
-                "due": "Upon contract signing",
-                "description": "Project initiation"
-            }
-            schedule["progress"] = {
-                "percentage": 40,
-                "amount": total_cost * 0.4,
-                "due": "At 50% completion",
-                "description": "Progress payment"
-            }
-            schedule["final"] = {
-                "percentage": 30,
-                "amount": total_cost * 0.3,
-                "due": "Upon completion",
-                "description": "Final payment"
-            }
-        
+            plan = PAYMENT_PLANS["30_40_30"]
         elif "Net 30" in payment_terms:
-            schedule["full_payment"] = {
-                "percentage": 100,
-                "amount": total_cost,
-                "due": "Net 30 days from completion",
-                "description": "Full payment due within 30 days"
-            }
+            plan = PAYMENT_PLANS["net_30"]
+        else:
+            plan = ()
         
-        return schedule
+        return {
+            key: {
+                "percentage": percentage,
+                "amount": total_cost * percentage / 100,
+                "due": due,
+                "description": description
+            }
+            for key, percentage, due, description in plan
+        }
     
     def _generate_exclusions(self, quote_data: Dict[str, Any]) -> List[str]:
         """Generate list of exclusions"""
         
         services = quote_data.get("services", {})
         
-        exclusions = []
-        
-        if not services.get("permits", False):
-            exclusions.append("Building permits and associated fees")
-        
-        if not services.get("site_prep", False):
-            exclusions.append("Site preparation and excavation work")
-        
-        if not services.get("utilities", False):
-            exclusions.append("Utility connections and hook-ups")
-        
-        if not services.get("delivery", False):
-            exclusions.append("Transportation and delivery")
+        exclusions = [text for service, text in SERVICE_EXCLUSIONS if not services.get(service, False)]
         
         # Standard exclusions
-        exclusions.extend([
-            "Soil testing and geotechnical analysis",
-            "Environmental assessments or remediation",
-            "Landscaping and site restoration",
-            "Temporary utilities during construction",
-            "Security and temporary fencing",
-            "Changes in scope or design modifications",
-            "Unforeseen site conditions or subsurface issues"
-        ])
+        exclusions.extend(STANDARD_EXCLUSIONS)
         
         return exclusions
     
@@ -583,15 +490,7 @@ class QuoteGenerator:
         config = quote_data.get("container_config", {})
         project = quote_data.get("project", {})
         
-        assumptions = [
-            "Site is accessible for delivery vehicles and equipment",
-            "Site has adequate space for construction activities",
-            "Standard soil conditions suitable for proposed foundation",
-            "No environmental hazards or contamination present",
-            "Customer will provide necessary site access and utilities",
-            "Work to be performed during standard business hours",
-            "Weather conditions will not significantly delay construction"
-        ]
+        assumptions = list(BASE_ASSUMPTIONS)
         
         # Use case specific assumptions
         use_case = config.get("use_case", "")
@@ -607,20 +506,71 @@ class QuoteGenerator:
         
         return assumptions
     
-    def export_quote_pdf(self, quote: Dict[str, Any]) -> str:
-        """Export quote to PDF format (placeholder for future implementation)"""
-        # This would integrate with a PDF generation library
-        # For now, return a success message
-        return f"Quote {quote.get('quote_number', 'N/A')} ready for PDF export"
+    def export_quote_pdf(self, quote: Dict[str, Any], language: str = 'en') -> bytes:
+        """Export quote to PDF format"""
+        return QuoteRenderer(self.company_info, language).to_pdf(quote)
+    
+    def export_quote_html(self, quote: Dict[str, Any], language: str = 'en') -> str:
+        """Export quote to HTML format"""
+        return QuoteRenderer(self.company_info, language).to_html(quote)
+    
+    def export_quotes_batch(self, quotes: List[Dict[str, Any]], output_dir: str,
+                            fmt: str = 'pdf', language: str = 'en',
+                            max_workers: Optional[int] = None) -> List[str]:
+        """Render many generated quotes to files in parallel (e.g. one per customer in a campaign)"""
+        return render_quotes_batch(quotes, output_dir, fmt=fmt, language=language,
+                                   company_info=self.company_info, max_workers=max_workers)
+    
+    def get_rates_hash(self, pricing=None) -> str:
+        """Fingerprint of all rates that feed this generator's cost breakdown"""
+        if pricing is None:
+            pricing = get_pricing_settings_store().current()
+        return compute_rates_hash(
+            pricing,
+            pricing_functions=(self._get_base_costs, self._service_cost,
+                               QuoteCostModel.totals, QuoteCostModel._build_material_items),
+            extra_rates={"base_rates": self.base_rates, "service_rates": SERVICE_RATES,
+                         "volume_discount_tiers": VOLUME_DISCOUNT_TIERS, "season": season_for()}
+        )
     
     def save_quote_template(self, quote_data: Dict[str, Any], template_name: str) -> bool:
         """Save quote configuration as template"""
-        # This would save to a database or file system
-        # For now, return success
-        return True
+        
+        template_data = {
+            key: value for key, value in quote_data.items()
+            if key not in ("cost_breakdown", "rates_hash")
+        }
+        pricing = get_pricing_settings_store().current()
+        cost_breakdown = self._calculate_detailed_costs(template_data, pricing)
+        
+        return get_quote_template_store().save_template(
+            template_name, template_data, cost_breakdown, self.get_rates_hash(pricing)
+        )
     
     def load_quote_template(self, template_name: str) -> Dict[str, Any]:
-        """Load quote template"""
-        # This would load from saved templates
-        # For now, return empty template
-        return {}
+        """Load quote template, repricing it only if rates moved since it was saved"""
+        
+        store = get_quote_template_store()
+        template = store.load_template(template_name)
+        if not template:
+            return {}
+        
+        quote_data = template["quote_data"]
+        pricing = get_pricing_settings_store().current()
+        rates_hash = self.get_rates_hash(pricing)
+        cost_breakdown = template["cost_breakdown"]
+        
+        if not cost_breakdown or template["rates_hash"] != rates_hash:
+            cost_breakdown = self._calculate_detailed_costs(quote_data, pricing)
+            store.update_cost_breakdown(template_name, cost_breakdown, rates_hash)
+        
+        quote_data["cost_breakdown"] = cost_breakdown
+        quote_data["rates_hash"] = rates_hash
+        return quote_data
+    
+    def list_quote_templates(self, customer_name: str = None,
+                             container_type: str = None) -> List[Dict[str, Any]]:
+        """List saved templates, optionally filtered by customer or container type"""
+        return get_quote_template_store().find_templates(
+            customer_name=customer_name, container_type=container_type
+        )
@@ -0,0 +1,132 @@
+"""
+Quote Number Allocator for KAN-BUD Container Calculator
+Hands out collision-free quote numbers in per-worker blocks
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Optional
+
+import streamlit as st
+from sqlalchemy import text
+
+from utils.local_paths import data_path
+
+
+class QuoteNumberAllocator:
+    """Allocates quote numbers of the form PREFIX-YYYYMM-NNNNNN
+
+    Each worker reserves a block of numbers from a per-month counter (a row
+    in Postgres, or a locked counter file in local mode) and hands them out
+    from memory, so only one round trip is needed per block. Counters restart
+    every month and only ever increase within it.
+    """
+
+    def __init__(self, engine=None, counter_path: Optional[str] = None,
+                 block_size: int = 50, prefix: str = 'SCS'):
+        self.engine = engine
+        self.counter_path = counter_path or data_path('quote_number_counters.json')
+        self.block_size = block_size
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._period = None
+        self._next_value = 0
+        self._block_end = -1
+
+        if self.engine is not None:
+            self.initialize_table()
+
+    def initialize_table(self):
+        """Create the per-month counter table"""
+        tables_sql = """
+        CREATE TABLE IF NOT EXISTS quote_number_counters (
+            period CHAR(6) PRIMARY KEY,
+            last_value BIGINT NOT NULL
+        );
+        """
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text(tables_sql))
+                conn.commit()
+        except Exception as e:
+            if st.session_state.get('employee_logged_in', False):
+                st.error(f"Failed to initialize quote number counters: {str(e)}")
+            self.engine = None
+
+    def next_number(self, now: Optional[datetime] = None) -> str:
+        """Get the next unique quote number"""
+        period = (now or datetime.now()).strftime("%Y%m")
+
+        with self._lock:
+            if period != self._period or self._next_value > self._block_end:
+                first_value = self._reserve_block(period)
+                self._period = period
+                self._next_value = first_value
+                self._block_end = first_value + self.block_size - 1
+
+            value = self._next_value
+            self._next_value += 1
+
+        return f"{self.prefix}-{period}-{value:06d}"
+
+    def _reserve_block(self, period: str) -> int:
+        """Atomically reserve the next block for a month and return its first value"""
+        if self.engine is not None:
+            last_value = self._reserve_in_database(period)
+        else:
+            last_value = self._reserve_in_file(period)
+        return last_value - self.block_size + 1
+
+    def _reserve_in_database(self, period: str) -> int:
+        query = """
+        INSERT INTO quote_number_counters (period, last_value)
+        VALUES (:period, :block_size)
+        ON CONFLICT (period) DO UPDATE
+        SET last_value = quote_number_counters.last_value + EXCLUDED.last_value
+        RETURNING last_value
+        """
+        with self.engine.connect() as conn:
+            last_value = conn.execute(text(query), {
+                'period': period,
+                'block_size': self.block_size
+            }).scalar()
+            conn.commit()
+        return int(last_value)
+
+    def _reserve_in_file(self, period: str) -> int:
+        directory = os.path.dirname(os.path.abspath(self.counter_path))
+        os.makedirs(directory, exist_ok=True)
+
+        # The lock file serializes all processes sharing the counter file
+        with open(self.counter_path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.counter_path, 'r', encoding='utf-8') as f:
+                        counters = json.load(f)
+                except FileNotFoundError:
+                    counters = {}
+
+                last_value = int(counters.get(period, 0)) + self.block_size
+                counters[period] = last_value
+
+                fd, temp_path = tempfile.mkstemp(prefix='.quote_counters_', dir=directory)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(counters, f)
+                os.replace(temp_path, self.counter_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        return last_value
+
+
+@st.cache_resource
+def get_quote_number_allocator() -> QuoteNumberAllocator:
+    """Process-wide quote number allocator"""
+    from utils.database import get_database_manager
+    db = get_database_manager()
+    return QuoteNumberAllocator(engine=db.engine)
@@ -0,0 +1,454 @@
+"""
+Quote Rendering Pipeline for KAN-BUD Container Calculator
+Renders generated quotes to HTML and PDF from precompiled per-language templates
+"""
+
+import html
+import io
+import os
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from string import Template
+from typing import Dict, List, Any, Iterable, Iterator, Optional, BinaryIO, TextIO
+
+# Labels used on rendered quotes; missing keys fall back to English
+QUOTE_LABELS = {
+    'en': {
+        'title': 'Quote',
+        'date': 'Date',
+        'valid_until': 'Valid until',
+        'customer': 'Customer',
+        'project': 'Project',
+        'location': 'Location',
+        'cost_breakdown': 'Cost Breakdown',
+        'item': 'Item',
+        'description': 'Description',
+        'quantity': 'Qty',
+        'unit_cost': 'Unit cost',
+        'total': 'Total',
+        'subtotal': 'Subtotal',
+        'tax': 'Tax',
+        'grand_total': 'Total (excl. VAT)',
+        'timeline': 'Project Timeline',
+        'payment_schedule': 'Payment Schedule',
+        'terms': 'Terms & Conditions',
+        'warranty': 'Warranty',
+        'exclusions': 'Exclusions',
+        'assumptions': 'Assumptions'
+    },
+    'pl': {
+        'title': 'Oferta',
+        'date': 'Data',
+        'valid_until': 'Ważna do',
+        'customer': 'Klient',
+        'project': 'Projekt',
+        'location': 'Lokalizacja',
+        'cost_breakdown': 'Zestawienie kosztów',
+        'item': 'Pozycja',
+        'description': 'Opis',
+        'quantity': 'Ilość',
+        'unit_cost': 'Cena jedn.',
+        'total': 'Razem',
+        'subtotal': 'Suma częściowa',
+        'tax': 'Podatek',
+        'grand_total': 'Razem (netto)',
+        'timeline': 'Harmonogram projektu',
+        'payment_schedule': 'Harmonogram płatności',
+        'terms': 'Warunki',
+        'warranty': 'Gwarancja',
+        'exclusions': 'Wyłączenia',
+        'assumptions': 'Założenia'
+    },
+    'de': {
+        'title': 'Angebot',
+        'date': 'Datum',
+        'valid_until': 'Gültig bis',
+        'customer': 'Kunde',
+        'project': 'Projekt',
+        'location': 'Standort',
+        'cost_breakdown': 'Kostenaufstellung',
+        'item': 'Position',
+        'description': 'Beschreibung',
+        'quantity': 'Menge',
+        'unit_cost': 'Einzelpreis',
+        'total': 'Gesamt',
+        'subtotal': 'Zwischensumme',
+        'tax': 'Steuer',
+        'grand_total': 'Gesamt (netto)',
+        'timeline': 'Projektzeitplan',
+        'payment_schedule': 'Zahlungsplan',
+        'terms': 'Bedingungen',
+        'warranty': 'Garantie',
+        'exclusions': 'Ausschlüsse',
+        'assumptions': 'Annahmen'
+    }
+}
+
+# Layout fragments; ${label_*} placeholders are filled once per language at
+# compile time, the remaining ${...} placeholders once per quote
+_HTML_HEADER = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>${label_title} ${quote_number}</title>
+<style>
+body{font-family:Helvetica,Arial,sans-serif;color:#222;margin:32px}
+h1{margin-bottom:4px}h2{border-bottom:1px solid #ccc;padding-bottom:4px;margin-top:28px}
+table{border-collapse:collapse;width:100%}th,td{padding:6px 8px;border-bottom:1px solid #eee;text-align:left}
+td.num,th.num{text-align:right}.total{font-weight:bold;font-size:1.1em}
+</style></head><body>
+<h1>${company_name}</h1>
+<p>${company_address} &middot; ${company_phone} &middot; ${company_email}</p>
+<h2>${label_title} #${quote_number}</h2>
+<p>${label_date}: ${date}<br>${label_valid_until}: ${valid_until}</p>
+<p><strong>${label_customer}:</strong> ${customer}<br>
+<strong>${label_project}:</strong> ${project}<br>
+<strong>${label_location}:</strong> ${location}</p>
+<h2>${label_cost_breakdown}</h2>
+<table><tr><th>${label_item}</th><th>${label_description}</th><th class="num">${label_quantity}</th>
+<th class="num">${label_unit_cost}</th><th class="num">${label_total}</th></tr>
+"""
+
+_HTML_ROW = """<tr><td>${item}</td><td>${description}</td><td class="num">${quantity}</td>
+<td class="num">${unit_cost}</td><td class="num">${total}</td></tr>
+"""
+
+_HTML_TOTALS = """</table>
+<p>${label_subtotal}: ${subtotal}<br>${label_tax}: ${tax}</p>
+<p class="total">${label_grand_total}: ${total_cost}</p>
+"""
+
+_HTML_SECTION = """<h2>${title}</h2>
+<ul>
+"""
+
+_HTML_LIST_ITEM = """<li>${text}</li>
+"""
+
+_HTML_SECTION_END = """</ul>
+"""
+
+_HTML_FOOTER = """</body></html>
+"""
+
+
+def _compile(fragment: str, labels: Dict[str, str]) -> Template:
+    """Fill the language labels into a layout fragment"""
+    label_values = {f'label_{key}': html.escape(value) for key, value in labels.items()}
+    return Template(Template(fragment).safe_substitute(label_values))
+
+
+def _money(value: Any) -> str:
+    try:
+        return f"€{float(value):,.2f}"
+    except (TypeError, ValueError):
+        return "€0.00"
+
+
+class CompiledQuoteTemplate:
+    """Quote layout with the labels of one language already filled in"""
+
+    def __init__(self, language: str):
+        self.language = language if language in QUOTE_LABELS else 'en'
+        self.labels = {**QUOTE_LABELS['en'], **QUOTE_LABELS.get(self.language, {})}
+
+        self.html_header = _compile(_HTML_HEADER, self.labels)
+        self.html_row = _compile(_HTML_ROW, self.labels)
+        self.html_totals = _compile(_HTML_TOTALS, self.labels)
+        self.html_section = _compile(_HTML_SECTION, self.labels)
+        self.html_list_item = _compile(_HTML_LIST_ITEM, self.labels)
+        self.html_section_end = _HTML_SECTION_END
+        self.html_footer = _HTML_FOOTER
+
+    def sections(self, quote: Dict[str, Any]) -> Iterator[tuple]:
+        """Yield (title, lines) for the text sections of a quote"""
+
+        timeline = quote.get('timeline', {})
+        if timeline:
+            yield self.labels['timeline'], [
+                f"{phase.replace('_', ' ').title()}: {details.get('duration', '')} - {details.get('description', '')}"
+                for phase, details in timeline.items()
+            ]
+
+        schedule = quote.get('payment_schedule', {})
+        if schedule:
+            yield self.labels['payment_schedule'], [
+                f"{payment.get('percentage', 0)}% ({_money(payment.get('amount', 0))}) - {payment.get('due', '')}"
+                for payment in schedule.values()
+            ]
+
+        for key, label in (('terms_conditions', 'terms'), ('exclusions', 'exclusions'),
+                           ('assumptions', 'assumptions')):
+            lines = quote.get(key, [])
+            if lines:
+                yield self.labels[label], list(lines)
+
+        warranty = quote.get('warranty', {})
+        if warranty:
+            yield self.labels['warranty'], list(warranty.values())
+
+    def header_values(self, quote: Dict[str, Any], company_info: Dict[str, str]) -> Dict[str, str]:
+        customer = quote.get('customer', {})
+        project = quote.get('project', {})
+        customer_text = customer.get('name', '')
+        if customer.get('company'):
+            customer_text = f"{customer_text} ({customer['company']})"
+
+        return {
+            'quote_number': quote.get('quote_number', 'N/A'),
+            'date': quote.get('date', ''),
+            'valid_until': quote.get('valid_until', ''),
+            'customer': customer_text,
+            'project': project.get('name', ''),
+            'location': project.get('location', ''),
+            'company_name': company_info.get('name', ''),
+            'company_address': company_info.get('address', ''),
+            'company_phone': company_info.get('phone', ''),
+            'company_email': company_info.get('email', '')
+        }
+
+
+@lru_cache(maxsize=None)
+def get_compiled_template(language: str = 'en') -> CompiledQuoteTemplate:
+    """Compile each language's template once per process"""
+    return CompiledQuoteTemplate(language)
+
+
+def _breakdown_items(quote: Dict[str, Any]) -> Iterator[tuple]:
+    breakdown = quote.get('cost_breakdown', {}).get('breakdown', {})
+    for item, details in breakdown.items():
+        yield item.replace('_', ' ').title(), details
+
+
+class QuoteRenderer:
+    """Streams quotes to HTML or PDF using compiled templates"""
+
+    def __init__(self, company_info: Dict[str, str] = None, language: str = 'en'):
+        self.company_info = company_info or {}
+        self.language = language
+
+    def render_html(self, quote: Dict[str, Any], out: TextIO):
+        """Write a quote as HTML to a text stream, fragment by fragment"""
+
+        template = get_compiled_template(self.language)
+        escape = html.escape
+
+        header = template.header_values(quote, self.company_info)
+        out.write(template.html_header.substitute({key: escape(str(value)) for key, value in header.items()}))
+
+        for item, details in _breakdown_items(quote):
+            out.write(template.html_row.substitute(
+                item=escape(item),
+                description=escape(str(details.get('description', ''))),
+                quantity=details.get('quantity', 1),
+                unit_cost=_money(details.get('unit_cost', 0)),
+                total=_money(details.get('total', 0))
+            ))
+
+        out.write(template.html_totals.substitute(
+            subtotal=_money(quote.get('subtotal', 0)),
+            tax=_money(quote.get('tax', 0)),
+            total_cost=_money(quote.get('total_cost', 0))
+        ))
+
+        for title, lines in template.sections(quote):
+            out.write(template.html_section.substitute(title=escape(title)))
+            for line in lines:
+                out.write(template.html_list_item.substitute(text=escape(str(line))))
+            out.write(template.html_section_end)
+
+        out.write(template.html_footer)
+
+    def render_pdf(self, quote: Dict[str, Any], out: BinaryIO):
+        """Write a quote as PDF to a binary stream, one page at a time"""
+        writer = _PdfStreamWriter(out)
+        writer.write_lines(self._text_lines(quote))
+        writer.close()
+
+    def to_html(self, quote: Dict[str, Any]) -> str:
+        buffer = io.StringIO()
+        self.render_html(quote, buffer)
+        return buffer.getvalue()
+
+    def to_pdf(self, quote: Dict[str, Any]) -> bytes:
+        buffer = io.BytesIO()
+        self.render_pdf(quote, buffer)
+        return buffer.getvalue()
+
+    def _text_lines(self, quote: Dict[str, Any]) -> Iterator[tuple]:
+        """Yield (style, text) lines for the plain-text PDF layout"""
+
+        template = get_compiled_template(self.language)
+        labels = template.labels
+        header = template.header_values(quote, self.company_info)
+
+        yield 'title', header['company_name']
+        yield 'small', f"{header['company_address']}  {header['company_phone']}  {header['company_email']}"
+        yield 'blank', ''
+        yield 'heading', f"{labels['title']} #{header['quote_number']}"
+        yield 'text', f"{labels['date']}: {header['date']}    {labels['valid_until']}: {header['valid_until']}"
+        yield 'text', f"{labels['customer']}: {header['customer']}"
+        yield 'text', f"{labels['project']}: {header['project']}    {labels['location']}: {header['location']}"
+        yield 'blank', ''
+
+        yield 'heading', labels['cost_breakdown']
+        for item, details in _breakdown_items(quote):
+            yield 'text', f"{item}: {_money(details.get('total', 0))}"
+            if details.get('description'):
+                yield 'small', f"    {details['description']}"
+        yield 'blank', ''
+        yield 'text', f"{labels['subtotal']}: {_money(quote.get('subtotal', 0))}"
+        yield 'text', f"{labels['tax']}: {_money(quote.get('tax', 0))}"
+        yield 'heading', f"{labels['grand_total']}: {_money(quote.get('total_cost', 0))}"
+
+        for title, lines in template.sections(quote):
+            yield 'blank', ''
+            yield 'heading', title
+            for line in lines:
+                for wrapped in _wrap(f"- {line}", 95):
+                    yield 'small', wrapped
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    words = text.split()
+    lines, current = [], ''
+    for word in words:
+        if current and len(current) + len(word) + 1 > width:
+            lines.append(current)
+            current = '  ' + word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines or ['']
+
+
+def _pdf_text(text: str) -> bytes:
+    """Encode text for a WinAnsi Type1 font, transliterating what it cannot show"""
+    text = text.replace('ł', 'l').replace('Ł', 'L')
+    encoded = bytearray()
+    for char in text:
+        try:
+            encoded += char.encode('cp1252')
+        except UnicodeEncodeError:
+            base = unicodedata.normalize('NFKD', char).encode('ascii', 'ignore')
+            encoded += base or b'?'
+    return bytes(encoded).replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class _PdfStreamWriter:
+    """Minimal text-only PDF writer that emits pages as soon as they fill up"""
+
+    PAGE_WIDTH = 595   # A4 in points
+    PAGE_HEIGHT = 842
+    MARGIN = 50
+    STYLES = {
+        'title': (b'F2', 16, 22),
+        'heading': (b'F2', 12, 18),
+        'text': (b'F1', 10, 14),
+        'small': (b'F1', 9, 12),
+        'blank': (b'F1', 10, 8)
+    }
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.offsets = {}
+        self.position = 0
+        self.page_ids = []
+        self.next_id = 5  # 1 catalog, 2 page tree, 3-4 fonts
+
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._object(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        self._object(4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+
+    def _write(self, data: bytes):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, object_id: int, body: bytes):
+        self.offsets[object_id] = self.position
+        self._write(b'%d 0 obj\n' % object_id + body + b'\nendobj\n')
+
+    def write_lines(self, lines: Iterable[tuple]):
+        commands = []
+        y = self.PAGE_HEIGHT - self.MARGIN
+
+        for style, line in lines:
+            font, size, leading = self.STYLES.get(style, self.STYLES['text'])
+            if y - leading < self.MARGIN:
+                self._emit_page(commands)
+                commands = []
+                y = self.PAGE_HEIGHT - self.MARGIN
+            y -= leading
+            if line:
+                commands.append(b'BT /%s %d Tf %d %d Td (%s) Tj ET' % (font, size, self.MARGIN, y, _pdf_text(line)))
+
+        if commands or not self.page_ids:
+            self._emit_page(commands)
+
+    def _emit_page(self, commands: List[bytes]):
+        content = b'\n'.join(commands)
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+
+        self._object(content_id, b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        self._object(page_id, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+        ) % (self.PAGE_WIDTH, self.PAGE_HEIGHT, content_id))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self.page_ids)
+        self._object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.page_ids)))
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+        xref_position = self.position
+        object_count = self.next_id
+        xref = [b'xref\n0 %d\n' % object_count, b'0000000000 65535 f \n']
+        for object_id in range(1, object_count):
+            xref.append(b'%010d 00000 n \n' % self.offsets[object_id])
+        self._write(b''.join(xref))
+        self._write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (object_count, xref_position))
+
+
+def _warm_worker(language: str):
+    """Compile templates once when a batch worker process starts"""
+    get_compiled_template(language)
+
+
+def _render_to_file(job: tuple) -> str:
+    quote, output_path, fmt, language, company_info = job
+    renderer = QuoteRenderer(company_info, language)
+    if fmt == 'html':
+        with open(output_path, 'w', encoding='utf-8') as f:
+            renderer.render_html(quote, f)
+    else:
+        with open(output_path, 'wb') as f:
+            renderer.render_pdf(quote, f)
+    return output_path
+
+
+def render_quotes_batch(quotes: List[Dict[str, Any]], output_dir: str, fmt: str = 'pdf',
+                        language: str = 'en', company_info: Dict[str, str] = None,
+                        max_workers: Optional[int] = None) -> List[str]:
+    """
+    Render many quotes to files across a process pool
+    Returns the written file paths in the same order as the quotes
+    """
+    if fmt not in ('pdf', 'html'):
+        raise ValueError(f"Unsupported quote format: {fmt}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [
+        (quote, os.path.join(output_dir, f"{quote.get('quote_number', f'quote-{index}')}.{fmt}"),
+         fmt, language, company_info or {})
+        for index, quote in enumerate(quotes)
+    ]
+    if not jobs:
+        return []
+
+    workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    chunksize = max(1, len(jobs) // (workers * 4))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker,
+                             initargs=(language,)) as executor:
+        return list(executor.map(_render_to_file, jobs, chunksize=chunksize))
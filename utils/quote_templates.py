@@ -0,0 +1,252 @@
+"""
+Quote Template Store for KAN-BUD Container Calculator
+Persists reusable quote setups with a precomputed cost breakdown
+"""
+
+import hashlib
+import json
+import os
+import types
+from typing import Dict, List, Any, Optional
+
+import streamlit as st
+from sqlalchemy import create_engine, text
+
+from utils import calculations
+from utils.local_paths import data_path
+
+POSTGRES_TEMPLATES_SQL = """
+CREATE TABLE IF NOT EXISTS quote_templates (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(200) UNIQUE NOT NULL,
+    customer_name VARCHAR(200),
+    container_type VARCHAR(100),
+    quote_data JSONB NOT NULL,
+    cost_breakdown JSONB,
+    rates_hash CHAR(64),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_quote_templates_customer ON quote_templates(customer_name);
+CREATE INDEX IF NOT EXISTS idx_quote_templates_container ON quote_templates(container_type);
+"""
+
+SQLITE_TEMPLATES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS quote_templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        customer_name TEXT,
+        container_type TEXT,
+        quote_data TEXT NOT NULL,
+        cost_breakdown TEXT,
+        rates_hash TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_quote_templates_customer ON quote_templates(customer_name)",
+    "CREATE INDEX IF NOT EXISTS idx_quote_templates_container ON quote_templates(container_type)"
+]
+
+
+def _code_fingerprint(code: types.CodeType) -> List[str]:
+    """Literal constants of a function, including nested comprehensions"""
+    parts = []
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            parts.extend(_code_fingerprint(const))
+        else:
+            parts.append(repr(const))
+    return parts
+
+
+_PRICING_FUNCTIONS = (
+    calculations.calculate_container_cost,
+    calculations.calculate_labor_hours,
+    calculations.calculate_labor_cost,
+    calculations.calculate_delivery_cost,
+    calculations.StructuralCalculations.calculate_base_costs
+)
+
+
+def compute_rates_hash(pricing=None, pricing_functions=(), extra_rates: Dict[str, Any] = None) -> str:
+    """
+    Hash every input that can move a price: the rate literals in the pricing
+    functions, the module-level rate tables and the Admin Panel settings
+    """
+    digest = hashlib.sha256()
+
+    for function in _PRICING_FUNCTIONS + tuple(pricing_functions):
+        code = getattr(function, '__code__', None)
+        if code is not None:
+            digest.update('|'.join(_code_fingerprint(code)).encode('utf-8'))
+
+    rate_tables = {
+        'base_costs': calculations.BASE_COSTS,
+        'use_case_multipliers': calculations.USE_CASE_MULTIPLIERS,
+        'finish_costs': calculations.FINISH_COSTS,
+        'extra': extra_rates or {},
+        'settings': pricing.to_dict() if pricing is not None else {}
+    }
+    digest.update(json.dumps(rate_tables, sort_keys=True, default=str).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def _load_json(value: Any) -> Any:
+    if value is None or isinstance(value, (dict, list)):
+        return value
+    return json.loads(value)
+
+
+class QuoteTemplateStore:
+    """Quote templates in Postgres, with a local SQLite fallback"""
+
+    def __init__(self, engine=None, sqlite_path: Optional[str] = None):
+        if engine is None:
+            sqlite_path = sqlite_path or os.environ.get('QUOTE_TEMPLATES_DB') or data_path('quote_templates.db')
+            engine = create_engine(f"sqlite:///{sqlite_path}")
+        self.engine = engine
+        self.initialize_tables()
+
+    def initialize_tables(self):
+        """Create the templates table and its lookup indexes"""
+        try:
+            with self.engine.connect() as conn:
+                if self.engine.dialect.name == 'postgresql':
+                    conn.execute(text(POSTGRES_TEMPLATES_SQL))
+                else:
+                    for statement in SQLITE_TEMPLATES_SQL:
+                        conn.execute(text(statement))
+                conn.commit()
+        except Exception as e:
+            if st.session_state.get('employee_logged_in', False):
+                st.error(f"Failed to initialize quote templates: {str(e)}")
+
+    def save_template(self, name: str, quote_data: Dict[str, Any],
+                      cost_breakdown: Dict[str, Any], rates_hash: str) -> bool:
+        """Insert or replace a template by name"""
+
+        query = """
+        INSERT INTO quote_templates
+            (name, customer_name, container_type, quote_data, cost_breakdown, rates_hash)
+        VALUES (:name, :customer_name, :container_type, :quote_data, :cost_breakdown, :rates_hash)
+        ON CONFLICT (name) DO UPDATE SET
+            customer_name = excluded.customer_name,
+            container_type = excluded.container_type,
+            quote_data = excluded.quote_data,
+            cost_breakdown = excluded.cost_breakdown,
+            rates_hash = excluded.rates_hash,
+            updated_at = CURRENT_TIMESTAMP
+        """
+
+        config = quote_data.get('container_config', {})
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text(query), {
+                    'name': name,
+                    'customer_name': quote_data.get('customer', {}).get('name'),
+                    'container_type': config.get('base_type') or config.get('container_type'),
+                    'quote_data': json.dumps(quote_data, default=str),
+                    'cost_breakdown': json.dumps(cost_breakdown, default=str),
+                    'rates_hash': rates_hash
+                })
+                conn.commit()
+            return True
+        except Exception as e:
+            st.error(f"Failed to save quote template: {str(e)}")
+            return False
+
+    def load_template(self, name: str) -> Optional[Dict[str, Any]]:
+        """Load a template with its stored cost breakdown"""
+
+        query = """
+        SELECT name, customer_name, container_type, quote_data, cost_breakdown, rates_hash
+        FROM quote_templates
+        WHERE name = :name
+        """
+
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(text(query), {'name': name}).fetchone()
+        except Exception as e:
+            st.error(f"Failed to load quote template: {str(e)}")
+            return None
+
+        if not row:
+            return None
+
+        return {
+            'name': row[0],
+            'customer_name': row[1],
+            'container_type': row[2],
+            'quote_data': _load_json(row[3]) or {},
+            'cost_breakdown': _load_json(row[4]),
+            'rates_hash': row[5]
+        }
+
+    def update_cost_breakdown(self, name: str, cost_breakdown: Dict[str, Any], rates_hash: str) -> bool:
+        """Store a refreshed cost breakdown after rates moved"""
+
+        query = """
+        UPDATE quote_templates
+        SET cost_breakdown = :cost_breakdown, rates_hash = :rates_hash, updated_at = CURRENT_TIMESTAMP
+        WHERE name = :name
+        """
+
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text(query), {
+                    'name': name,
+                    'cost_breakdown': json.dumps(cost_breakdown, default=str),
+                    'rates_hash': rates_hash
+                })
+                conn.commit()
+            return True
+        except Exception:
+            return False
+
+    def find_templates(self, name: str = None, customer_name: str = None,
+                       container_type: str = None) -> List[Dict[str, Any]]:
+        """List templates, optionally filtered by name prefix, customer or container type"""
+
+        conditions = []
+        params = {}
+        if name:
+            conditions.append("name LIKE :name")
+            params['name'] = f"{name}%"
+        if customer_name:
+            conditions.append("customer_name = :customer_name")
+            params['customer_name'] = customer_name
+        if container_type:
+            conditions.append("container_type = :container_type")
+            params['container_type'] = container_type
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+        SELECT name, customer_name, container_type, updated_at
+        FROM quote_templates
+        {where_clause}
+        ORDER BY name
+        """
+
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(query), params).fetchall()
+        except Exception as e:
+            st.error(f"Failed to list quote templates: {str(e)}")
+            return []
+
+        return [
+            {'name': row[0], 'customer_name': row[1], 'container_type': row[2], 'updated_at': row[3]}
+            for row in rows
+        ]
+
+
+@st.cache_resource
+def get_quote_template_store() -> QuoteTemplateStore:
+    """Process-wide quote template store"""
+    from utils.database import get_database_manager
+    db = get_database_manager()
+    return QuoteTemplateStore(engine=db.engine)
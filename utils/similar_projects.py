@@ -0,0 +1,291 @@
+"""
+Similar Project Search for KAN-BUD Container Calculator
+Nearest-neighbour lookup of comparable historical projects over a NumPy KD-tree
+"""
+
+import json
+import re
+from datetime import datetime
+from typing import Dict, List, Any
+
+import numpy as np
+import pandas as pd
+
+# Points per leaf; leaves are scanned with one vectorized distance computation
+LEAF_SIZE = 64
+
+# Most frequent categories / modification keys kept as features, the rest share one bucket
+MAX_CATEGORIES = 12
+MAX_MODIFICATION_KEYS = 8
+
+# Relative importance of each feature group in the distance
+FEATURE_WEIGHTS = {
+    'size_ft': 1.5,
+    'high_cube': 1.0,
+    'use_case': 2.0,
+    'location': 0.75,
+    'modifications': 0.5,
+    'date': 0.75
+}
+
+_SIZE_PATTERN = re.compile(r'(\d+)\s*(?:ft|\')', re.IGNORECASE)
+
+
+def container_size_ft(container_type: Any) -> float:
+    """Container length in feet from names like '40ft High Cube'; NaN when unknown"""
+    match = _SIZE_PATTERN.search(str(container_type or ''))
+    return float(match.group(1)) if match else np.nan
+
+
+def is_high_cube(container_type: Any) -> float:
+    text = str(container_type or '').lower()
+    return 1.0 if 'high cube' in text or 'hc' in text.split() else 0.0
+
+
+def _days(dates: np.ndarray) -> np.ndarray:
+    return dates.astype('datetime64[D]').astype(float)
+
+
+def parse_modifications(value: Any) -> Dict[str, float]:
+    """Modification counts from the stored JSON (dict or string); flags count as 1"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return {}
+    if not isinstance(value, dict):
+        return {}
+
+    counts = {}
+    for key, item in value.items():
+        if isinstance(item, bool):
+            counts[key] = 1.0 if item else 0.0
+        elif isinstance(item, (int, float)):
+            counts[key] = float(item)
+        elif isinstance(item, (list, dict)):
+            counts[key] = float(len(item))
+        elif item:
+            counts[key] = 1.0
+    return counts
+
+
+class KDTree:
+    """
+    Static KD-tree over an (n, d) float array
+
+    Nodes live in flat arrays. Each internal node splits on the dimension with
+    the widest spread at the median; leaves hold up to LEAF_SIZE points. A
+    query descends to the nearest leaf first and prunes every subtree whose
+    cell is farther than the current k-th best distance.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = LEAF_SIZE):
+        self.points = np.ascontiguousarray(points, dtype=float)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(self.points))
+
+        self.split_dim: List[int] = []
+        self.split_value: List[float] = []
+        self.children: List[List[int]] = []
+        self.bounds: List[tuple] = []
+
+        if len(self.points):
+            self._build()
+
+    def _new_node(self, start: int, end: int) -> int:
+        self.split_dim.append(-1)
+        self.split_value.append(0.0)
+        self.children.append([-1, -1])
+        self.bounds.append((start, end))
+        return len(self.bounds) - 1
+
+    def _build(self):
+        stack = [self._new_node(0, len(self.points))]
+        while stack:
+            node = stack.pop()
+            start, end = self.bounds[node]
+            if end - start <= self.leaf_size:
+                continue
+
+            idx = self.order[start:end]
+            block = self.points[idx]
+            spread = block.max(axis=0) - block.min(axis=0)
+            dim = int(np.argmax(spread))
+            if spread[dim] == 0:
+                continue  # All points identical: keep as one leaf
+
+            middle = (end - start) // 2
+            partition = np.argpartition(block[:, dim], middle)
+            self.order[start:end] = idx[partition]
+
+            self.split_dim[node] = dim
+            self.split_value[node] = float(self.points[self.order[start + middle], dim])
+            left = self._new_node(start, start + middle)
+            right = self._new_node(start + middle, end)
+            self.children[node] = [left, right]
+            stack.extend((left, right))
+
+    def query(self, point: np.ndarray, k: int = 10) -> tuple:
+        """(distances, row positions) of the k nearest points, nearest first"""
+        if not len(self.points):
+            return np.array([]), np.array([], dtype=int)
+
+        point = np.asarray(point, dtype=float)
+        k = min(k, len(self.points))
+        best_distances = np.full(k, np.inf)  # squared distances
+        best_rows = np.full(k, -1)
+        worst = np.inf
+
+        # Each entry carries the squared distance to the node's cell and the
+        # per-dimension offsets behind it, so pruning uses the whole cell
+        stack = [(0, 0.0, np.zeros(len(point)))]
+        while stack:
+            node, cell_distance, offsets = stack.pop()
+            if cell_distance > worst:
+                continue
+
+            dim = self.split_dim[node]
+            if dim < 0:
+                start, end = self.bounds[node]
+                rows = self.order[start:end]
+                distances = ((self.points[rows] - point) ** 2).sum(axis=1)
+                closer = distances < worst
+                if closer.any():
+                    candidates = np.concatenate((best_distances, distances[closer]))
+                    candidate_rows = np.concatenate((best_rows, rows[closer]))
+                    keep = np.argpartition(candidates, k - 1)[:k]
+                    best_distances, best_rows = candidates[keep], candidate_rows[keep]
+                    worst = best_distances.max()
+                continue
+
+            diff = point[dim] - self.split_value[node]
+            near, far = self.children[node] if diff < 0 else self.children[node][::-1]
+            far_offsets = offsets.copy()
+            far_offsets[dim] = diff
+            # Push the far side first so the near side is searched first
+            stack.append((far, cell_distance - offsets[dim] ** 2 + diff * diff, far_offsets))
+            stack.append((near, cell_distance, offsets))
+
+        ranked = np.argsort(best_distances, kind='stable')
+        return np.sqrt(best_distances[ranked]), best_rows[ranked]
+
+
+class SimilarProjectIndex:
+    """
+    Historical projects as weighted feature vectors with a KD-tree for k-NN search
+
+    Features: container length and high-cube flag, one-hot use case and
+    location (most frequent values), counts of the most common modifications
+    parsed once from the JSON column, and the project date. Numeric features
+    are standardized so each group's weight is comparable.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame.reset_index(drop=True)
+
+        self.use_cases = self._top_values(self.frame['use_case'])
+        self.locations = self._top_values(self.frame['location']) if 'location' in self.frame.columns else []
+
+        modifications = (self.frame['modifications'].map(parse_modifications)
+                         if 'modifications' in self.frame.columns
+                         else pd.Series([{}] * len(self.frame)))
+        key_counts = pd.Series([key for mods in modifications for key in mods]).value_counts()
+        self.modification_keys = list(key_counts.index[:MAX_MODIFICATION_KEYS])
+
+        numeric = pd.DataFrame({
+            'size_ft': self.frame['container_type'].map(container_size_ft),
+            'date': _days(pd.to_datetime(self.frame['project_date']).to_numpy())
+        })
+        for key in self.modification_keys:
+            numeric[f'mod_{key}'] = modifications.map(lambda mods: mods.get(key, 0.0))
+
+        self.means = numeric.mean().fillna(0.0).to_numpy()
+        self.scales = numeric.std(ddof=0).replace(0, 1.0).fillna(1.0).to_numpy()
+
+        actual = pd.to_numeric(self.frame['actual_cost'], errors='coerce')
+        estimated = pd.to_numeric(self.frame['estimated_cost'], errors='coerce')
+        self.cost_ratio = (actual / estimated.where(estimated > 0)).to_numpy()
+
+        self.tree = KDTree(self._encode(
+            numeric.to_numpy(dtype=float),
+            self.frame['container_type'].map(is_high_cube).to_numpy(),
+            self.frame['use_case'].astype(str).str.lower().to_numpy(),
+            self.frame['location'].astype(str).str.lower().to_numpy()
+            if 'location' in self.frame.columns else np.array([''] * len(self.frame))
+        ))
+
+    @staticmethod
+    def _top_values(series: pd.Series) -> List[str]:
+        counts = series.dropna().astype(str).str.lower().value_counts()
+        return list(counts.index[:MAX_CATEGORIES])
+
+    @staticmethod
+    def _one_hot(values: np.ndarray, categories: List[str]) -> np.ndarray:
+        return (values[:, None] == np.array(categories, dtype=object)[None, :]).astype(float)
+
+    def _encode(self, numeric: np.ndarray, high_cube: np.ndarray,
+                use_cases: np.ndarray, locations: np.ndarray) -> np.ndarray:
+        """Weighted feature matrix; numeric columns are size_ft, date, then modification counts"""
+        # Unknown sizes/dates sit at the mean, i.e. they neither attract nor repel
+        scaled = np.nan_to_num((numeric - self.means) / self.scales)
+
+        # Spread the modification weight over its columns so many keys don't dominate
+        mod_weight = FEATURE_WEIGHTS['modifications'] / np.sqrt(max(1, len(self.modification_keys)))
+
+        parts = [
+            scaled[:, :1] * FEATURE_WEIGHTS['size_ft'],
+            high_cube[:, None] * FEATURE_WEIGHTS['high_cube'],
+            self._one_hot(use_cases, self.use_cases) * FEATURE_WEIGHTS['use_case'],
+            self._one_hot(locations, self.locations) * FEATURE_WEIGHTS['location'],
+            scaled[:, 2:] * mod_weight,
+            scaled[:, 1:2] * FEATURE_WEIGHTS['date']
+        ]
+        return np.hstack(parts)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def query(self, container_type: str, use_case: str, location: str = None,
+              modifications: Dict[str, Any] = None, project_date: datetime = None,
+              k: int = 10) -> pd.DataFrame:
+        """The k most similar historical projects with their distance and actual/estimated ratio"""
+        if not len(self.frame):
+            return pd.DataFrame()
+
+        project_date = project_date or datetime.now()
+        mods = parse_modifications(modifications or {})
+        numeric = np.array([[
+            container_size_ft(container_type),
+            _days(np.array([pd.Timestamp(project_date).to_datetime64()]))[0],
+            *[mods.get(key, 0.0) for key in self.modification_keys]
+        ]])
+
+        point = self._encode(
+            numeric,
+            np.array([is_high_cube(container_type)]),
+            np.array([str(use_case or '').lower()], dtype=object),
+            np.array([str(location or '').lower()], dtype=object)
+        )[0]
+
+        distances, rows = self.tree.query(point, k)
+        similar = self.frame.iloc[rows].copy()
+        similar['distance'] = distances
+        similar['cost_ratio'] = self.cost_ratio[rows]
+        return similar
+
+    def similarity_summary(self, similar: pd.DataFrame) -> Dict[str, Any]:
+        """Distance-weighted actual/estimated ratio over a query result"""
+        ratios = similar['cost_ratio'].to_numpy(dtype=float) if not similar.empty else np.array([])
+        valid = ~np.isnan(ratios)
+        if not valid.any():
+            return {}
+
+        weights = 1.0 / (1.0 + similar['distance'].to_numpy(dtype=float)[valid])
+        ratios = ratios[valid]
+        mean_ratio = float(np.average(ratios, weights=weights))
+        return {
+            'weighted_cost_ratio': mean_ratio,
+            'ratio_std': float(np.sqrt(np.average((ratios - mean_ratio) ** 2, weights=weights))),
+            'neighbours': int(valid.sum()),
+            'mean_distance': float(similar['distance'].mean())
+        }
@@ -3,6 +3,7 @@ Simple Storage System for KAN-BUD Container Calculator
 Works without external database dependencies using session state
 """
 
+import os
 import streamlit as st
 import pandas as pd
 import json
@@ -13,6 +14,8 @@ import streamlit as st
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from utils.historical_index import HistoricalProjectIndex
+
 class SimpleStorageManager:
     """Simple storage manager using Streamlit session state"""
     
@@ -27,6 +30,16 @@ class SimpleStorageManager:
                 'material_prices': {},
                 'settings': {}
             }
+        
+        # Index the historical projects once per session (also covers sessions created before the index existed)
+        if 'historical_index' not in st.session_state.storage_data:
+            index = HistoricalProjectIndex()
+            index.add_many(st.session_state.storage_data['historical_projects'])
+            st.session_state.storage_data['historical_index'] = index
+    
+    @property
+    def historical_index(self) -> HistoricalProjectIndex:
+        return st.session_state.storage_data['historical_index']
     
     def save_user_project(self, user_id: str, project_name: str, 
                          config: Dict[str, Any], estimate: Dict[str, Any] = None,
@@ -92,53 +105,23 @@ class SimpleStorageManager:
         }
         
         st.session_state.storage_data['historical_projects'].append(project)
+        self.historical_index.add(project)
         return True
     
     def get_historical_pricing_data(self, container_type: str, use_case: str, 
                                   months_back: int = 24) -> Dict[str, Any]:
         """Get historical pricing data for more accurate estimates"""
         
+        # Exact (case-insensitive) match, the same semantics as SQLiteStorageManager
         cutoff_date = datetime.now() - timedelta(days=months_back * 30)
+        return self.historical_index.pricing_summary(container_type, use_case, cutoff_date)
+    
+    def search_historical_pricing_data(self, container_type: str, use_case: str,
+                                       months_back: int = 24) -> Dict[str, Any]:
+        """Pricing data for types and use cases containing the given text"""
         
-        # Filter historical data
-        relevant_projects = []
-        for project in st.session_state.storage_data['historical_projects']:
-            project_date = project.get('project_date')
-            if isinstance(project_date, str):
-                try:
-                    project_date = datetime.fromisoformat(project_date)
-                except:
-                    continue
-            elif not isinstance(project_date, datetime):
-                continue
-            
-            if (project_date >= cutoff_date and 
-                container_type.lower() in project.get('container_type', '').lower() and
-                use_case.lower() in project.get('use_case', '').lower()):
-                relevant_projects.append(project)
-        
-        if not relevant_projects:
-            return {}
-        
-        # Calculate metrics
-        costs = [p.get('actual_cost', 0) for p in relevant_projects if p.get('actual_cost')]
-        materials = [p.get('materials_cost', 0) for p in relevant_projects if p.get('materials_cost')]
-        labor = [p.get('labor_cost', 0) for p in relevant_projects if p.get('labor_cost')]
-        durations = [p.get('project_duration_days', 0) for p in relevant_projects if p.get('project_duration_days')]
-        
-        if costs:
-            return {
-                'avg_cost': sum(costs) / len(costs),
-                'min_cost': min(costs),
-                'max_cost': max(costs),
-                'avg_materials': sum(materials) / len(materials) if materials else 0,
-                'avg_labor': sum(labor) / len(labor) if labor else 0,
-                'avg_duration': sum(durations) / len(durations) if durations else 0,
-                'project_count': len(relevant_projects),
-                'confidence': min(1.0, len(relevant_projects) / 10)
-            }
-        
-        return {}
+        cutoff_date = datetime.now() - timedelta(days=months_back * 30)
+        return self.historical_index.pricing_summary(container_type, use_case, cutoff_date, exact=False)
     
     def get_current_material_prices(self) -> Dict[str, float]:
         """Get current material prices"""
@@ -155,12 +138,22 @@ class SimpleStorageManager:
     def clear_historical_data(self):
         """Clear all historical data"""
         st.session_state.storage_data['historical_projects'] = []
+        st.session_state.storage_data['historical_index'] = HistoricalProjectIndex()
     
     def import_historical_data(self, data: List[Dict[str, Any]]) -> bool:
         """Import historical data from list"""
         try:
+            imported_at = datetime.now()
+            historical_projects = st.session_state.storage_data['historical_projects']
+            projects = []
             for project in data:
-                self.add_historical_project(project)
+                projects.append({
+                    'id': len(historical_projects) + len(projects) + 1,
+                    'imported_at': imported_at,
+                    **project
+                })
+            historical_projects.extend(projects)
+            self.historical_index.add_many(projects)
             return True
         except Exception as e:
             # Only show storage errors to employees/admins
@@ -175,4 +168,19 @@ class SimpleStorageManager:
             'user_projects': len(st.session_state.storage_data.get('user_projects', [])),
             'customers': len(st.session_state.storage_data.get('customers', [])),
             'quotes': len(st.session_state.storage_data.get('quotes', []))
-        }
\ No newline at end of file
+        }
+
+
+def get_local_storage():
+    """
+    Storage used when no Postgres is configured
+    Persistent SQLite by default; KANBUD_LOCAL_STORAGE=session keeps the per-session store
+    """
+    if os.environ.get('KANBUD_LOCAL_STORAGE', 'sqlite') == 'session':
+        return SimpleStorageManager()
+    
+    try:
+        from utils.sqlite_storage import get_sqlite_storage_manager
+        return get_sqlite_storage_manager()
+    except Exception:
+        return SimpleStorageManager()
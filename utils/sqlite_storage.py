@@ -0,0 +1,337 @@
+"""
+SQLite Storage for KAN-BUD Container Calculator
+Persistent local storage with the SimpleStorageManager interface, shared across sessions and processes
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+import streamlit as st
+
+from utils.local_paths import data_path
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS historical_projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_date TEXT,
+    container_type TEXT,
+    container_type_lc TEXT,
+    use_case TEXT,
+    use_case_lc TEXT,
+    location TEXT,
+    actual_cost REAL,
+    estimated_cost REAL,
+    materials_cost REAL,
+    labor_cost REAL,
+    delivery_cost REAL,
+    project_duration_days REAL,
+    data TEXT NOT NULL,
+    imported_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_historical_projects_date ON historical_projects(project_date);
+CREATE INDEX IF NOT EXISTS idx_historical_projects_type_use_date
+    ON historical_projects(container_type_lc, use_case_lc, project_date);
+
+CREATE TABLE IF NOT EXISTS user_projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    project_name TEXT NOT NULL,
+    container_config TEXT NOT NULL,
+    cost_estimate TEXT,
+    technical_analysis TEXT,
+    status TEXT DEFAULT 'draft',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_user_projects_user_created ON user_projects(user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    email TEXT,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_customers_email ON customers(email);
+
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    quote_number TEXT,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quotes_number ON quotes(quote_number);
+
+CREATE TABLE IF NOT EXISTS material_prices (
+    material_name TEXT PRIMARY KEY,
+    price REAL NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+def _to_json(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value == value else None  # pandas NaT never equals itself
+    if hasattr(value, 'isoformat'):
+        # date or pandas Timestamp
+        value = value.isoformat()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number  # NaN
+
+
+class SQLiteStorageManager:
+    """
+    Storage manager backed by a local SQLite database in WAL mode
+
+    Same methods as SimpleStorageManager, but the data lives in one file
+    shared by every session and worker process. WAL lets readers proceed
+    while a writer commits, IDs come from AUTOINCREMENT, and lookups use
+    indexes instead of scanning lists. Historical pricing matches type and
+    use case exactly; search_historical_pricing_data keeps the substring match.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.environ.get('KANBUD_SQLITE_PATH') or data_path('kanbud_storage.db')
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA_SQL)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, query: str, params) -> int:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(query, params)
+        return cursor.lastrowid
+
+    def save_user_project(self, user_id: str, project_name: str,
+                          config: Dict[str, Any], estimate: Dict[str, Any] = None,
+                          analysis: Dict[str, Any] = None) -> Optional[int]:
+        """Save user project configuration and results"""
+
+        now = datetime.now().isoformat()
+        return self._insert("""
+            INSERT INTO user_projects (user_id, project_name, container_config, cost_estimate,
+                                       technical_analysis, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, 'draft', ?, ?)
+        """, (user_id, project_name, _to_json(config), _to_json(estimate or {}),
+              _to_json(analysis or {}), now, now))
+
+    def get_user_projects(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get all projects for a user"""
+
+        rows = self._connection().execute("""
+            SELECT id, user_id, project_name, container_config, cost_estimate, technical_analysis,
+                   status, created_at, updated_at
+            FROM user_projects
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+        """, (user_id,)).fetchall()
+
+        return [{
+            'id': row['id'],
+            'user_id': row['user_id'],
+            'project_name': row['project_name'],
+            'container_config': json.loads(row['container_config']),
+            'cost_estimate': json.loads(row['cost_estimate'] or '{}'),
+            'technical_analysis': json.loads(row['technical_analysis'] or '{}'),
+            'status': row['status'],
+            'created_at': datetime.fromisoformat(row['created_at']),
+            'updated_at': datetime.fromisoformat(row['updated_at'])
+        } for row in rows]
+
+    def save_customer(self, customer_data: Dict[str, Any]) -> Optional[int]:
+        """Save customer information"""
+
+        return self._insert(
+            "INSERT INTO customers (name, email, data, created_at) VALUES (?, ?, ?, ?)",
+            (customer_data.get('name'), customer_data.get('email'), _to_json(customer_data),
+             datetime.now().isoformat())
+        )
+
+    def save_quote(self, quote_data: Dict[str, Any]) -> bool:
+        """Save generated quote"""
+
+        self._insert(
+            "INSERT INTO quotes (quote_number, data, created_at) VALUES (?, ?, ?)",
+            (quote_data.get('quote_number'), _to_json(quote_data), datetime.now().isoformat())
+        )
+        return True
+
+    def add_historical_project(self, project_data: Dict[str, Any]) -> bool:
+        """Add historical project data"""
+        return self.import_historical_data([project_data])
+
+    def get_historical_pricing_data(self, container_type: str, use_case: str,
+                                    months_back: int = 24) -> Dict[str, Any]:
+        """Get historical pricing data for more accurate estimates"""
+
+        # Exact (case-insensitive) match, answered from the (type, use case, date) index
+        return self._pricing_summary("""
+            container_type_lc = ? AND use_case_lc = ? AND project_date >= ?
+        """, (container_type.lower(), use_case.lower(), self._cutoff(months_back)))
+
+    def search_historical_pricing_data(self, container_type: str, use_case: str,
+                                       months_back: int = 24) -> Dict[str, Any]:
+        """
+        Pricing data for types and use cases containing the given text
+
+        The substring match cannot use the (type, use case, date) index; only
+        the date index narrows the rows, so this scans the whole period.
+        """
+        return self._pricing_summary("""
+            project_date >= ? AND instr(container_type_lc, ?) > 0 AND instr(use_case_lc, ?) > 0
+        """, (self._cutoff(months_back), container_type.lower(), use_case.lower()))
+
+    @staticmethod
+    def _cutoff(months_back: int) -> str:
+        return (datetime.now() - timedelta(days=months_back * 30)).isoformat()
+
+    def _pricing_summary(self, where_clause: str, params) -> Dict[str, Any]:
+        row = self._connection().execute(f"""
+            SELECT
+                AVG(CASE WHEN actual_cost THEN actual_cost END),
+                MIN(CASE WHEN actual_cost THEN actual_cost END),
+                MAX(CASE WHEN actual_cost THEN actual_cost END),
+                AVG(CASE WHEN materials_cost THEN materials_cost END),
+                AVG(CASE WHEN labor_cost THEN labor_cost END),
+                AVG(CASE WHEN project_duration_days THEN project_duration_days END),
+                COUNT(*),
+                COUNT(CASE WHEN actual_cost THEN 1 END)
+            FROM historical_projects
+            WHERE {where_clause}
+        """, params).fetchone()
+
+        if not row or not row[7]:
+            return {}
+
+        return {
+            'avg_cost': row[0],
+            'min_cost': row[1],
+            'max_cost': row[2],
+            'avg_materials': row[3] or 0,
+            'avg_labor': row[4] or 0,
+            'avg_duration': row[5] or 0,
+            'project_count': row[6],
+            'confidence': min(1.0, row[6] / 10)
+        }
+
+    def get_current_material_prices(self) -> Dict[str, float]:
+        """Get current material prices"""
+        rows = self._connection().execute("SELECT material_name, price FROM material_prices").fetchall()
+        return {row['material_name']: row['price'] for row in rows}
+
+    def update_material_price(self, material: str, price: float):
+        """Update material price"""
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                INSERT INTO material_prices (material_name, price, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (material_name) DO UPDATE SET price = excluded.price, updated_at = excluded.updated_at
+            """, (material, price, datetime.now().isoformat()))
+
+    def get_all_historical_projects(self) -> List[Dict[str, Any]]:
+        """Get all historical projects"""
+        rows = self._connection().execute(
+            "SELECT id, data, imported_at FROM historical_projects ORDER BY id"
+        ).fetchall()
+        return [{
+            'id': row['id'],
+            'imported_at': datetime.fromisoformat(row['imported_at']),
+            **json.loads(row['data'])
+        } for row in rows]
+
+    def clear_historical_data(self):
+        """Clear all historical data"""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM historical_projects")
+
+    def import_historical_data(self, data: List[Dict[str, Any]]) -> bool:
+        """Import historical data from list in a single transaction"""
+
+        imported_at = datetime.now().isoformat()
+
+        def rows():
+            for project in data:
+                project_date = _parse_datetime(project.get('project_date'))
+                container_type = str(project.get('container_type') or '')
+                use_case = str(project.get('use_case') or '')
+                yield (
+                    project_date.isoformat() if project_date else None,
+                    container_type, container_type.lower(),
+                    use_case, use_case.lower(),
+                    project.get('location'),
+                    _to_float(project.get('actual_cost')),
+                    _to_float(project.get('estimated_cost')),
+                    _to_float(project.get('materials_cost')),
+                    _to_float(project.get('labor_cost')),
+                    _to_float(project.get('delivery_cost')),
+                    _to_float(project.get('project_duration_days')),
+                    _to_json(project),
+                    imported_at
+                )
+
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany("""
+                    INSERT INTO historical_projects (
+                        project_date, container_type, container_type_lc, use_case, use_case_lc, location,
+                        actual_cost, estimated_cost, materials_cost, labor_cost, delivery_cost,
+                        project_duration_days, data, imported_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows())
+            return True
+        except Exception as e:
+            # Only show storage errors to employees/admins
+            if st.session_state.get('employee_logged_in', False):
+                st.error(f"Error importing data: {str(e)}")
+            return False
+
+    def get_storage_stats(self) -> Dict[str, int]:
+        """Get storage statistics"""
+        conn = self._connection()
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ('historical_projects', 'user_projects', 'customers', 'quotes')
+        }
+
+
+@st.cache_resource
+def get_sqlite_storage_manager() -> SQLiteStorageManager:
+    """Process-wide SQLite storage manager"""
+    return SQLiteStorageManager()
@@ -0,0 +1,176 @@
+"""
+Cost Trend Engine for KAN-BUD Container Calculator
+Per-segment monthly cost trends: EWMA, volatility and changepoints computed in one vectorized pass
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SEGMENT_COLUMNS = ('container_type', 'use_case')
+
+# EWMA span and rolling window, in months
+DEFAULT_SPAN = 6
+DEFAULT_WINDOW = 6
+
+# A month whose cost change is this many rolling deviations off the recent changes is flagged
+CHANGEPOINT_THRESHOLD = 3.0
+
+# EWMA moves smaller than this (percent per month) are reported as flat
+FLAT_TREND_PCT = 0.1
+
+# Months of data a segment needs before its trend is reported
+MIN_MONTHS = 3
+
+
+class TrendEngine:
+    """
+    Monthly cost aggregates per segment and the trends derived from them
+
+    Aggregates are kept as sums and counts per (segment, month), so new data
+    is folded in with ``add_monthly`` without revisiting history. Trend
+    statistics for every segment are computed together with grouped window
+    operations and cached until the aggregates change.
+    """
+
+    def __init__(self, segment_columns: Sequence[str] = DEFAULT_SEGMENT_COLUMNS,
+                 span: int = DEFAULT_SPAN, window: int = DEFAULT_WINDOW,
+                 changepoint_threshold: float = CHANGEPOINT_THRESHOLD):
+        self.segment_columns = list(segment_columns)
+        self.span = span
+        self.window = window
+        self.changepoint_threshold = changepoint_threshold
+        self.monthly = pd.DataFrame(
+            columns=['sum_actual', 'project_count'],
+            index=pd.MultiIndex.from_arrays([[]] * (len(self.segment_columns) + 1),
+                                            names=self.segment_columns + ['month'])
+        )
+        self.version = 0
+        self._series: Optional[pd.DataFrame] = None
+        self._summary: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def monthly_from_projects(cls, frame: pd.DataFrame,
+                              segment_columns: Sequence[str] = DEFAULT_SEGMENT_COLUMNS) -> pd.DataFrame:
+        """Monthly sums and counts of actual cost from project rows"""
+        costs = pd.to_numeric(frame['actual_cost'], errors='coerce')
+        rows = frame.loc[costs.notna(), list(segment_columns)].astype(str)
+        rows['month'] = pd.to_datetime(frame.loc[costs.notna(), 'project_date']).dt.to_period('M').dt.to_timestamp()
+        rows['sum_actual'] = costs[costs.notna()]
+        rows['project_count'] = 1
+        return rows.groupby(list(segment_columns) + ['month'])[['sum_actual', 'project_count']].sum()
+
+    @classmethod
+    def monthly_from_rollups(cls, rollups: pd.DataFrame,
+                             segment_columns: Sequence[str] = DEFAULT_SEGMENT_COLUMNS) -> pd.DataFrame:
+        """Monthly sums and counts from historical_rollups rows (already aggregated in the database)"""
+        rows = rollups[list(segment_columns) + ['month', 'sum_actual', 'project_count']].copy()
+        rows['month'] = pd.to_datetime(rows['month']).dt.to_period('M').dt.to_timestamp()
+        rows['sum_actual'] = pd.to_numeric(rows['sum_actual'], errors='coerce').fillna(0.0)
+        return rows.groupby(list(segment_columns) + ['month'])[['sum_actual', 'project_count']].sum()
+
+    def replace_monthly(self, monthly: pd.DataFrame):
+        self.monthly = monthly[['sum_actual', 'project_count']].astype(float).sort_index()
+        self._invalidate()
+
+    def add_monthly(self, monthly: pd.DataFrame):
+        """Fold in the monthly sums of newly added projects"""
+        if monthly.empty:
+            return
+        combined = self.monthly.add(monthly[['sum_actual', 'project_count']].astype(float), fill_value=0.0)
+        self.monthly = combined.sort_index()
+        self._invalidate()
+
+    def _invalidate(self):
+        self.version += 1
+        self._series = None
+        self._summary = None
+
+    def series(self) -> pd.DataFrame:
+        """Per (segment, month): average cost, EWMA, volatility and changepoint flag"""
+        if self._series is not None:
+            return self._series
+
+        monthly = self.monthly[self.monthly['project_count'] > 0]
+        if monthly.empty:
+            self._series = pd.DataFrame()
+            return self._series
+
+        segments = self.segment_columns
+        series = pd.DataFrame({'avg_cost': monthly['sum_actual'] / monthly['project_count'],
+                               'project_count': monthly['project_count']})
+        by_segment = series['avg_cost'].groupby(level=segments, sort=False)
+
+        ewma = by_segment.ewm(span=self.span, adjust=False).mean()
+        series['ewma'] = ewma.droplevel(list(range(len(segments))))
+
+        change = by_segment.pct_change()
+        volatility = change.groupby(level=segments, sort=False).rolling(self.window, min_periods=2).std()
+        series['volatility'] = volatility.droplevel(list(range(len(segments))))
+
+        # A month-over-month change far outside the recent spread of changes;
+        # a steady trend has steady changes and is not flagged. The spread is
+        # only trusted over a full window of earlier changes, so the first
+        # months of a segment are never flagged off two or three points
+        recent = change.groupby(level=segments, sort=False).shift(1).groupby(level=segments, sort=False)
+        recent_mean = recent.rolling(self.window, min_periods=self.window).mean()
+        recent_std = recent.rolling(self.window, min_periods=self.window).std()
+        recent_mean = recent_mean.droplevel(list(range(len(segments))))
+        recent_std = recent_std.droplevel(list(range(len(segments))))
+        series['z_score'] = (change - recent_mean) / recent_std.replace(0, np.nan)
+        series['changepoint'] = series['z_score'].abs() > self.changepoint_threshold
+
+        self._series = series
+        return series
+
+    def summary(self) -> pd.DataFrame:
+        """One row per segment with the latest trend figures"""
+        if self._summary is not None:
+            return self._summary
+
+        series = self.series()
+        if series.empty:
+            self._summary = pd.DataFrame()
+            return self._summary
+
+        segments = self.segment_columns
+        grouped = series.groupby(level=segments, sort=True)
+        latest = grouped.tail(1).reset_index(level='month')
+        previous_ewma = grouped['ewma'].nth(-2).reset_index(level='month', drop=True)
+
+        flagged = series[series['changepoint']].reset_index(level='month')
+        last_changepoint = flagged.groupby(level=segments)['month'].max() if not flagged.empty else None
+
+        summary = pd.DataFrame({
+            'months': grouped.size(),
+            'projects': grouped['project_count'].sum(),
+            'latest_month': latest['month'],
+            'latest_avg_cost': latest['avg_cost'],
+            'ewma': latest['ewma'],
+            'monthly_trend_pct': (latest['ewma'] / previous_ewma - 1) * 100,
+            'volatility_pct': latest['volatility'] * 100,
+            'changepoints': grouped['changepoint'].sum(),
+            'last_changepoint': last_changepoint
+        })
+        summary = summary[summary['months'] >= MIN_MONTHS].copy()
+        trend = summary['monthly_trend_pct']
+        summary['trend_direction'] = np.select(
+            [~np.isfinite(trend), trend.abs() < FLAT_TREND_PCT, trend > 0],
+            ['unknown', 'flat', 'increasing'],
+            default='decreasing'
+        )
+
+        self._summary = summary.reset_index()
+        return self._summary
+
+    def segment_series(self, **segment: str) -> pd.DataFrame:
+        """Monthly trend rows for one segment, e.g. segment_series(container_type=..., use_case=...)"""
+        series = self.series()
+        if series.empty:
+            return series
+        key = tuple(segment[column] for column in self.segment_columns)
+        try:
+            return series.xs(key, level=self.segment_columns)
+        except KeyError:
+            return pd.DataFrame()